@@ -0,0 +1,93 @@
+"""
+@brief Микробенчмарк стоимости доступа к атрибутам доменных классов
+@details Сравнивает прежнюю схему (перехват каждого чтения через __getattribute__
+с try/except) с текущей (__getattr__, вызываемый только при промахе) на двух путях:
+цепочка client.passport.visa.country и проверка визы Tour.check_visa.
+Запуск из каталога lab2: python benchmarks/attribute_access.py
+"""
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.docs.passport import Passport
+from models.docs.visa import Visa
+from models.people.person import Person
+from models.travel.geography import Country, City
+from models.travel.tour import Tour
+from services.bank_account import BankAccount
+from services.events import NullSink, set_event_sink
+
+
+def _legacy_getattribute(self, name):
+    """
+    @brief Прежняя реализация перехвата доступа к атрибутам
+    """
+    try:
+        return object.__getattribute__(self, name)
+    except AttributeError:
+        raise
+
+
+class LegacyVisa(Visa):
+    """@brief Виза с прежним перехватом каждого чтения атрибута"""
+    __getattribute__ = _legacy_getattribute
+
+
+class LegacyPassport(Passport):
+    """@brief Паспорт с прежним перехватом каждого чтения атрибута"""
+    __getattribute__ = _legacy_getattribute
+
+
+class LegacyPerson(Person):
+    """@brief Клиент с прежним перехватом каждого чтения атрибута"""
+    __getattribute__ = _legacy_getattribute
+
+
+def make_client(person_cls, passport_cls, visa_cls) -> Person:
+    """
+    @brief Создаёт клиента с действующей визой во Францию
+    @return Объект Person (или его наследник)
+    """
+    today = date.today()
+    visa = visa_cls("V1", "France", today - timedelta(days=1), today + timedelta(days=365), 5)
+    passport = passport_cls("P1", "Alice", "Smith", today + timedelta(days=3650))
+    passport.set_visa(visa)
+    return person_cls(passport, BankAccount(10000.0, "BENCH"))
+
+
+def per_call_ns(statement, number: int) -> float:
+    """
+    @brief Измеряет среднее время одного вызова
+    @return Наносекунды на вызов (лучшее из пяти повторов)
+    """
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e9
+
+
+def main(number: int = 200000):
+    """
+    @brief Запускает замеры и печатает таблицу результатов
+    @param number Количество вызовов в одном повторе
+    """
+    set_event_sink(NullSink())
+    city = City("Paris", Country("France", "FR"))
+    tour = Tour(1000.0, date.today() + timedelta(days=10), date.today() + timedelta(days=20), city)
+    clients = {
+        "before": make_client(LegacyPerson, LegacyPassport, LegacyVisa),
+        "after": make_client(Person, Passport, Visa),
+    }
+
+    print(f"{'path':<32}{'before, ns':>12}{'after, ns':>12}{'speedup':>10}")
+    for label, statement in (
+        ("client.passport.visa.country", lambda client: lambda: client.passport.visa.country),
+        ("Tour.check_visa(client)", lambda client: lambda: tour.check_visa(client)),
+    ):
+        before = per_call_ns(statement(clients["before"]), number)
+        after = per_call_ns(statement(clients["after"]), number)
+        print(f"{label:<32}{before:>12.1f}{after:>12.1f}{before / after:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+@brief Бенчмарк потребления памяти массовыми доменными объектами
+@details Для каждого класса с __slots__ создаётся партия объектов и партия объектов
+его копии без __slots__ (с обычным __dict__ экземпляра); прирост выделенной памяти
+по tracemalloc делится на размер партии.
+Запуск из каталога lab2: python benchmarks/memory.py
+"""
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import date, datetime, timedelta
+from types import MemberDescriptorType
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.docs.passport import Passport
+from models.docs.visa import Visa
+from models.people.person import Person
+from models.travel.booking import Booking
+from models.travel.geography import Country, City
+from services.bank_account import BankAccount, Transaction
+from services.events import NullSink, set_event_sink
+
+
+def with_dict(cls):
+    """
+    @brief Создаёт копию класса, хранящую атрибуты в __dict__
+    @param cls Класс с __slots__ (прямой наследник object)
+    @return Класс с теми же методами, но без __slots__
+    """
+    namespace = {name: value for name, value in vars(cls).items()
+                 if name != "__slots__" and not isinstance(value, MemberDescriptorType)}
+    return type(f"Dict{cls.__name__}", cls.__bases__, namespace)
+
+
+def bytes_per_object(factory, count: int) -> float:
+    """
+    @brief Измеряет среднее число байт на объект
+    @param factory Функция factory(i), создающая один объект
+    @param count Размер партии
+    @return Байт на объект (по приросту памяти tracemalloc)
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def main(count: int = 20000):
+    """
+    @brief Запускает замеры и печатает таблицу результатов
+    @param count Количество объектов в одной партии
+    """
+    set_event_sink(NullSink())
+    today = date.today()
+    now = datetime.now()
+    country = Country("France", "FR")
+    city = City("Paris", country)
+    visa = Visa("V1", "France", today - timedelta(days=1), today + timedelta(days=365), 5)
+    passport = Passport("P1", "Alice", "Smith", today + timedelta(days=3650))
+    account = BankAccount(100.0, "BENCH")
+    payer = BankAccount(float(count) * 100, "PAYER")
+    client = Person(passport, account)
+
+    cases = (
+        (Person, lambda cls: lambda i: cls(passport, account)),
+        (Passport, lambda cls: lambda i: cls(i, "Alice", "Smith", today)),
+        (Visa, lambda cls: lambda i: cls(i, "France", today, today + timedelta(days=1), 5)),
+        (BankAccount, lambda cls: lambda i: cls(100.0, i)),
+        (Booking, lambda cls: lambda i: cls(client, now)),
+        (Transaction, lambda cls: lambda i: cls(payer, account, 10.0)),
+        (City, lambda cls: lambda i: cls(i, country)),
+    )
+
+    print(f"{'class':<14}{'__dict__, B':>14}{'__slots__, B':>14}{'ratio':>8}")
+    for cls, make in cases:
+        before = bytes_per_object(make(with_dict(cls)), count)
+        after = bytes_per_object(make(cls), count)
+        print(f"{cls.__name__:<14}{before:>14.1f}{after:>14.1f}{before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+@brief Бенчмарк сохранения и загрузки снимка агентства
+@details Строит агентство с заданным числом туров (перелёт, отель и страховка в каждом)
+и столько же клиентов с визами, сохраняет его в AgencySnapshot и загружает обратно.
+Запуск из каталога lab2: python benchmarks/snapshot.py [количество туров]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.docs.passport import Passport
+from models.docs.visa import Visa
+from models.people.person import Person
+from models.travel.accomodation import Hotel
+from models.travel.geography import Country, City
+from models.travel.snapshot import AgencySnapshot
+from models.travel.tour import Tour
+from models.travel.tourist_agency import TouristAgency
+from models.travel.transport import Flight
+from services.bank_account import BankAccount
+from services.events import NullSink, set_event_sink
+from services.services import Insurance
+
+
+def build(count: int):
+    """
+    @brief Строит агентство и клиентов для замера
+    @param count Количество туров и клиентов
+    @return Кортеж (агентство, клиенты)
+    """
+    france = Country("France", "FR")
+    cities = [City(f"City{number}", france) for number in range(100)]
+    hotels = BankAccount(0.0, "HOTELS")
+    agency = TouristAgency("Benchmark", BankAccount(0.0, "AGENCY"))
+    tours = []
+    for number in range(count):
+        city = cities[number % len(cities)]
+        start = date(2030, 1, 1) + timedelta(days=number % 300)
+        flight = Flight(cities[0], city, datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 12), 100.0,
+                        f"BF{number}", 1, seats=150)
+        hotel = Hotel(start, start + timedelta(days=5), city, 50.0, hotels, 3)
+        tours.append(Tour(500.0, start, start + timedelta(days=5), city, 0.05, [hotel], [flight],
+                          [Insurance("basic", 20.0)]))
+    agency.add_tours(tours)
+    clients = []
+    for number in range(count):
+        passport = Passport(f"BP{number}", "Client", str(number), date(2040, 1, 1))
+        passport.set_visa(Visa(f"BV{number}", "France", date(2026, 1, 1), date(2035, 1, 1), 2))
+        clients.append(Person(passport, BankAccount(1000.0, f"BC{number}")))
+    return agency, clients
+
+
+def main(count: int = 100000):
+    """
+    @brief Выводит размер снимка и время сохранения и загрузки
+    @param count Количество туров и клиентов
+    """
+    set_event_sink(NullSink())
+    agency, clients = build(count)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "agency.snap")
+        started = time.perf_counter()
+        size = AgencySnapshot.save(path, agency, clients)
+        saved = time.perf_counter()
+        with AgencySnapshot(path) as snapshot:
+            restored, restored_clients = snapshot.restore()
+        loaded = time.perf_counter()
+    print(f"{count} tours, {len(restored_clients)} clients, {size / 2 ** 20:.1f} MiB")
+    print(f"save {saved - started:.2f} s, load {loaded - saved:.2f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -1,6 +1,8 @@
 from .visa import Visa
+from .visa_index import VisaIndex
 from datetime import date
 from typing import Optional
+from services.events import emit
 
 class PassportIsExpired(Exception):
     """
@@ -19,13 +21,16 @@ class Passport:
     и привязанную визу. Проверяет валидность срока действия при создании.
     """
 
+    __slots__ = ("visa", "__passport_num", "passport_expiration_date", "name", "surname")
+
     def __init__(
         self,
         passport_num: str,
         name: str,
         surname: str,
         passport_expiration_date: date,
-        visa: Optional[Visa] = None
+        visa: Optional[Visa] = None,
+        index: Optional[VisaIndex] = None
     ):
         """
         @brief Конструктор паспорта
@@ -34,6 +39,7 @@ class Passport:
         @param surname Фамилия владельца паспорта
         @param passport_expiration_date Дата окончания срока действия паспорта
         @param visa Опциональная виза, привязанная к паспорту
+        @param index Индекс виз, в котором регистрируется виза (по умолчанию виза не индексируется)
         @exception PassportIsExpired Если дата окончания раньше текущей даты
         """
         self.visa = visa
@@ -43,24 +49,72 @@ class Passport:
         self.surname = surname
         if passport_expiration_date < date.today():
             raise PassportIsExpired()
+        if visa is not None and index is not None:
+            index.attach(self, visa)
+
+    @classmethod
+    def restore(
+        cls,
+        passport_num: str,
+        name: str,
+        surname: str,
+        passport_expiration_date: date,
+        visa: Optional[Visa] = None,
+        index: Optional[VisaIndex] = None
+    ) -> 'Passport':
+        """
+        @brief Восстанавливает сохранённый паспорт без проверки срока действия
+        @details Используется загрузчиком снимка агентства: паспорт мог истечь после
+        сохранения, а конструктор сравнивает дату окончания с сегодняшним днём.
+        @param passport_num Номер паспорта
+        @param name Имя владельца паспорта
+        @param surname Фамилия владельца паспорта
+        @param passport_expiration_date Дата окончания срока действия паспорта
+        @param visa Опциональная виза, привязанная к паспорту
+        @param index Индекс виз, в котором регистрируется виза (по умолчанию виза не индексируется)
+        @return Объект Passport
+        """
+        passport = cls.__new__(cls)
+        passport.visa = None
+        passport.__passport_num = passport_num
+        passport.passport_expiration_date = passport_expiration_date
+        passport.name = name
+        passport.surname = surname
+        if visa is not None:
+            passport.set_visa(visa, index)
+        return passport
+
+    def get_passport_num(self) -> str:
+        """
+        @brief Возвращает номер паспорта
+        @return Номер паспорта в виде строки
+        """
+        return self.__passport_num
 
-    def set_visa(self, visa: Visa):
+    def set_visa(self, visa: Visa, index: Optional[VisaIndex] = None):
         """
         @brief Привязывает визу к паспорту
         @param visa Объект Visa, который будет привязан к паспорту
-        @note Заменяет предыдущую визу, если она существовала
+        @param index Индекс виз, в котором регистрируется виза (None — индекс прежней визы, если она
+        была проиндексирована, иначе виза не индексируется)
+        @note Заменяет предыдущую визу, если она существовала (и в индексе тоже).
+        Индекс хранит паспорт, пока его виза не снята через set_visa(None) или VisaIndex.detach()
         """
+        previous = self.visa
         self.visa = visa
+        if index is None and previous is not None:
+            index = previous.index
+        if index is not None:
+            index.attach(self, visa)
 
-    def __getattribute__(self, name):
+    def __getattr__(self, name):
         """
-        @brief Переопределённый метод доступа к атрибутам
-        @details Логирует попытки доступа к несуществующим атрибутам.
+        @brief Обработка обращения к несуществующему атрибуту
+        @details Вызывается интерпретатором только при промахе, поэтому обычное
+        чтение атрибутов не проходит через Python-обёртку.
         @param name Имя запрашиваемого атрибута
-        @exception AttributeError Если атрибут не найден
+        @exception AttributeError Всегда (атрибут не найден)
+        @note Отправляет событие attribute_missing (services.events)
         """
-        try:
-            return super().__getattribute__(name)
-        except AttributeError:
-            print("Attribute not found")
-            raise
\ No newline at end of file
+        emit("attribute_missing", name=name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
\ No newline at end of file
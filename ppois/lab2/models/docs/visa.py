@@ -1,4 +1,5 @@
 from datetime import date
+from services.events import emit
 
 class VisaExpiredDate(Exception):
     """
@@ -51,6 +52,9 @@ class Visa:
     Поддерживает проверку валидности и использование въездов.
     """
 
+    __slots__ = ("visa_number", "country", "issue_date", "expiration_date", "entry_count", "used_entries", "is_active",
+                 "index")
+
     def __init__(self, visa_number: str, country: str, issue_date: date, expiration_date: date,
                  entry_count: int = 1):
         """
@@ -74,6 +78,7 @@ class Visa:
         self.entry_count = entry_count
         self.used_entries = 0
         self.is_active = True
+        self.index = None
 
     def is_expired(self) -> bool:
         """
@@ -98,32 +103,41 @@ class Visa:
             return 0
         return int((self.expiration_date - date.today()).days)
 
+    def __reindex(self):
+        """
+        @brief Сообщает индексу виз об изменении состояния
+        @note Ничего не делает, если виза не привязана к индексу (VisaIndex.attach)
+        """
+        if self.index is not None:
+            self.index.refresh(self)
+
     def activate(self):
-        """@brief Активирует визу (устанавливает is_active = True)"""
+        """@brief Активирует визу (устанавливает is_active = True) и обновляет индекс виз"""
         self.is_active = True
+        self.__reindex()
 
     def deactivate(self):
-        """@brief Деактивирует визу (устанавливает is_active = False)"""
+        """@brief Деактивирует визу (устанавливает is_active = False) и обновляет индекс виз"""
         self.is_active = False
+        self.__reindex()
 
-    def __getattribute__(self, name):
+    def __getattr__(self, name):
         """
-        @brief Переопределённый метод доступа к атрибутам
-        @details Логирует попытки доступа к несуществующим атрибутам.
+        @brief Обработка обращения к несуществующему атрибуту
+        @details Вызывается интерпретатором только при промахе, поэтому обычное
+        чтение атрибутов не проходит через Python-обёртку.
         @param name Имя запрашиваемого атрибута
-        @exception AttributeError Если атрибут не найден
+        @exception AttributeError Всегда (атрибут не найден)
+        @note Отправляет событие attribute_missing (services.events)
         """
-        try:
-            return super().__getattribute__(name)
-        except AttributeError:
-            print(f"attribute {name} not found")
-            raise
+        emit("attribute_missing", name=name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
     def use_entry(self) -> None:
         """
         @brief Использует один въезд по визе
         @details Увеличивает счётчик использованных въездов.
-        Если въезды исчерпаны — деактивирует визу.
+        Если въезды исчерпаны — деактивирует визу. Индекс виз обновляется.
         @exception VisaNotAvailable Если виза недоступна (неактивна/просрочена/нет въездов)
         @exception VisaExpiredDate Если виза просрочена (дополнительная проверка)
         @exception VisaNoEnabledEntries Если все въезды уже использованы
@@ -139,6 +153,8 @@ class Visa:
 
         if self.used_entries >= self.entry_count:
             self.deactivate()
+        else:
+            self.__reindex()
 
     def get_expiration_date(self) -> date:
         """
@@ -0,0 +1,167 @@
+from bisect import bisect_left
+from datetime import date
+from itertools import count
+from threading import RLock
+from typing import Dict, List, Optional, Tuple
+
+
+class VisaIndex:
+    """
+    @brief Обратный индекс «страна — владельцы действующих виз»
+    @details Для каждой страны хранит визы, отсортированные по дате окончания срока,
+    поэтому вопрос «у кого есть виза во Францию до конца августа» решается одним
+    бинарным поиском и перечислением хвоста, без обхода всех клиентов.
+    В индексе лежат только пригодные визы (активные и с оставшимися въездами);
+    просроченность проверяется при запросе границей по дате. Индекс обновляется
+    самими объектами: Passport.set_visa(visa, index) привязывает визу к владельцу, а
+    Visa.use_entry(), activate() и deactivate() вызывают refresh().
+    Владельцем визы считается паспорт, к которому она привязана.
+    Индексирование явное: индекс хранит сильные ссылки на паспорта, поэтому общего
+    индекса по умолчанию нет — владелец индекса сам решает, кого в нём держать,
+    и снимает ненужных владельцев через detach() или attach(holder, None).
+    """
+
+    def __init__(self):
+        """
+        @brief Конструктор пустого индекса
+        """
+        self.__lock = RLock()
+        self.__sequence = count()
+        self.__keys: Dict[str, List[Tuple[date, int]]] = {}
+        self.__visas: Dict[str, List] = {}
+        self.__holders: Dict[int, object] = {}
+        self.__visa_of: Dict[int, object] = {}
+        self.__entries: Dict[int, Tuple[str, Tuple[date, int]]] = {}
+
+    def __remove(self, visa):
+        """
+        @brief Убирает визу из отсортированных списков страны (под блокировкой)
+        @param visa Объект Visa
+        """
+        entry = self.__entries.pop(id(visa), None)
+        if entry is None:
+            return
+        country, key = entry
+        keys = self.__keys[country]
+        position = bisect_left(keys, key)
+        del keys[position]
+        del self.__visas[country][position]
+
+    def attach(self, holder, visa):
+        """
+        @brief Привязывает визу к владельцу
+        @details Предыдущая виза владельца и прежняя привязка этой визы снимаются.
+        @param holder Владелец визы (Passport)
+        @param visa Объект Visa или None (только снять привязку)
+        """
+        with self.__lock:
+            previous = self.__visa_of.pop(id(holder), None)
+            if previous is not None:
+                self.detach(previous)
+            if visa is None:
+                return
+            if id(visa) in self.__holders:
+                self.detach(visa)
+            self.__holders[id(visa)] = holder
+            self.__visa_of[id(holder)] = visa
+            visa.index = self
+            self.refresh(visa)
+
+    def detach(self, visa):
+        """
+        @brief Удаляет визу из индекса
+        @param visa Объект Visa (если визы нет в индексе — ничего не происходит)
+        """
+        with self.__lock:
+            self.__remove(visa)
+            holder = self.__holders.pop(id(visa), None)
+            if holder is not None and self.__visa_of.get(id(holder)) is visa:
+                del self.__visa_of[id(holder)]
+            if visa.index is self:
+                visa.index = None
+
+    def refresh(self, visa):
+        """
+        @brief Переиндексирует визу после изменения её состояния
+        @details Виза остаётся в индексе, пока она активна и у неё есть въезды.
+        @param visa Объект Visa, привязанный через attach()
+        """
+        with self.__lock:
+            if id(visa) not in self.__holders:
+                return
+            self.__remove(visa)
+            if not visa.is_active or visa.used_entries >= visa.entry_count:
+                return
+            key = (visa.expiration_date, next(self.__sequence))
+            keys = self.__keys.setdefault(visa.country, [])
+            position = bisect_left(keys, key)
+            keys.insert(position, key)
+            self.__visas.setdefault(visa.country, []).insert(position, visa)
+            self.__entries[id(visa)] = (visa.country, key)
+
+    def __first(self, country: str, valid_through: date, today: Optional[date]) -> int:
+        """
+        @brief Находит первую визу страны, действующую до нужной даты (под блокировкой)
+        @param country Страна визы
+        @param valid_through Дата, до которой виза должна действовать
+        @param today Текущая дата (None — date.today())
+        @return Позиция в отсортированном списке страны
+        """
+        bound = max(valid_through, today or date.today())
+        return bisect_left(self.__keys.get(country, []), (bound, -1))
+
+    def count(self, country: str, valid_through: date, today: Optional[date] = None) -> int:
+        """
+        @brief Подсчитывает владельцев действующих виз страны за O(log n)
+        @param country Страна визы (например, "France")
+        @param valid_through Дата, до которой виза должна действовать
+        @param today Текущая дата (по умолчанию date.today())
+        @return Количество пригодных виз
+        """
+        with self.__lock:
+            return len(self.__keys.get(country, [])) - self.__first(country, valid_through, today)
+
+    def holders(self, country: str, valid_through: date, valid_from: Optional[date] = None,
+                today: Optional[date] = None) -> List:
+        """
+        @brief Находит владельцев действующих виз страны
+        @details Граница по дате окончания находится бинарным поиском; условие по дате
+        выдачи проверяется только для виз из найденного диапазона.
+        @param country Страна визы (например, "France")
+        @param valid_through Дата, до которой виза должна действовать
+        @param valid_from Дата, с которой виза должна действовать (None — без проверки)
+        @param today Текущая дата (по умолчанию date.today())
+        @return Список паспортов в порядке окончания срока виз
+        """
+        with self.__lock:
+            visas = self.__visas.get(country, [])
+            first = self.__first(country, valid_through, today)
+            return [self.__holders[id(visa)] for visa in visas[first:]
+                    if valid_from is None or visa.issue_date <= valid_from]
+
+    def holders_for(self, tour, today: Optional[date] = None) -> List:
+        """
+        @brief Находит владельцев виз, совместимых с туром (для адресных предложений)
+        @param tour Объект Tour
+        @param today Текущая дата (по умолчанию date.today())
+        @return Список паспортов, для которых Tour.check_visa() прошла бы успешно
+        """
+        return self.holders(tour.destination.country.name, tour.end_date, tour.start_date, today)
+
+    def visa_of(self, holder):
+        """
+        @brief Возвращает пригодную визу владельца
+        @param holder Владелец (Passport)
+        @return Объект Visa или None, если визы нет или она неактивна/исчерпана
+        """
+        with self.__lock:
+            visa = self.__visa_of.get(id(holder))
+            return visa if visa is not None and id(visa) in self.__entries else None
+
+    def __len__(self) -> int:
+        """
+        @brief Количество пригодных виз в индексе
+        @return Число виз
+        """
+        return len(self.__entries)
+
@@ -4,6 +4,8 @@ from models.travel.booking import Booking
 from models.people.person import Person
 from models.travel.tour import Tour
 from services.bank_account import BankAccount, Transaction, NotEnoughMoney
+from services.ids import next_id
+from services.events import emit
 
 
 class Address:
@@ -59,7 +61,7 @@ class Invoice:
         @param booking Бронирование, к которому привязан счёт.
         @return Строка ID.
         """
-        return f"INV_{booking.booking_id}_{int(datetime.now().timestamp())}"
+        return f"INV_{booking.booking_id}_{next_id()}"
 
     def mark_paid(self):
         """
@@ -73,7 +75,7 @@ class Invoice:
         @details В реальной системе — по email; здесь — вывод в лог.
         @param recipient Получатель счёта.
         """
-        print(f"Invoice {self.invoice_id} sent to {recipient.passport.name}")
+        emit("invoice_sent", invoice_id=self.invoice_id, recipient=recipient.passport.name)
 
 
 class Payment:
@@ -89,7 +91,7 @@ class Payment:
         @param payer Аккаунт плательщика.
         @param receiver Аккаунт получателя.
         """
-        self.payment_id = f"PAY_{invoice.invoice_id}_{int(datetime.now().timestamp())}"
+        self.payment_id = f"PAY_{invoice.invoice_id}_{next_id()}"
         self.invoice = invoice
         self.payer = payer
         self.receiver = receiver
@@ -105,13 +107,34 @@ class Payment:
         """
         try:
             Transaction(self.payer, self.receiver, self.amount)
-            self.paid_date = datetime.now()
-            self.invoice.mark_paid()
-            print(f"Payment {self.payment_id} processed for {self.amount}")
-            return True
         except NotEnoughMoney:
-            print("Payment failed: not enough money")
+            emit("payment_failed", payment_id=self.payment_id)
             return False
+        self.__mark_processed()
+        return True
+
+    async def process_async(self) -> bool:
+        """
+        @brief Асинхронно проводит платёж.
+        @details Перевод выполняется через Transaction.create_async: ожидание блокировок
+        счетов не блокирует цикл событий.
+        @return True если успешно, иначе False.
+        """
+        try:
+            await Transaction.create_async(self.payer, self.receiver, self.amount)
+        except NotEnoughMoney:
+            emit("payment_failed", payment_id=self.payment_id)
+            return False
+        self.__mark_processed()
+        return True
+
+    def __mark_processed(self):
+        """
+        @brief Отмечает платёж и связанный счёт оплаченными.
+        """
+        self.paid_date = datetime.now()
+        self.invoice.mark_paid()
+        emit("payment_processed", payment_id=self.payment_id, amount=self.amount)
 
 
 class Order:
@@ -126,7 +149,7 @@ class Order:
         @param person Покупатель.
         @param tour Выбранный тур.
         """
-        self.order_id = f"ORDER_{person.passport.name}_{int(datetime.now().timestamp())}"
+        self.order_id = f"ORDER_{person.passport.name}_{next_id()}"
         self.person = person
         self.tour = tour
         self.created_at = datetime.now()
@@ -145,7 +168,7 @@ class Order:
             issuer_account=self.person.bank_account,
             amount=self.tour.price
         )
-        print(f"Order {self.order_id} placed, invoice {invoice.invoice_id} created")
+        emit("order_placed", order_id=self.order_id, invoice_id=invoice.invoice_id)
         return invoice
 
     def cancel(self) -> None:
@@ -154,7 +177,7 @@ class Order:
         @note Статус устанавливается в cancelled.
         """
         self.status = "cancelled"
-        print(f"Order {self.order_id} cancelled")
+        emit("order_cancelled", order_id=self.order_id)
 
 
 class Review:
@@ -171,7 +194,7 @@ class Review:
         @param rating Оценка 1–5.
         @param comment Текст комментария.
         """
-        self.review_id = f"REV_{author.passport.name}_{int(datetime.now().timestamp())}"
+        self.review_id = f"REV_{author.passport.name}_{next_id()}"
         self.author = author
         self.target = target
         self.rating = rating
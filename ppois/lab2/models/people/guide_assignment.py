@@ -0,0 +1,196 @@
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional
+from models.travel.geography import City
+from models.travel.tour import Tour
+from .staff import Guide
+
+
+class GuideAssignmentOptimizer:
+    """
+    @brief Пакетное назначение гидов на туры
+    @details Гид подходит туру, если он работает в городе назначения, владеет требуемым
+    языком и свободен в дни тура. Туры делятся на окна — группы, не пересекающиеся
+    по дням друг с другом, поэтому назначения в разных окнах друг другу не мешают.
+    Окно разбивается на клики: берётся тур с самым ранним окончанием, и в его клику
+    попадают все ещё не распределённые туры, начавшиеся до этого окончания (у них есть
+    общий день, поэтому гид проводит не больше одного тура клики). Клики обрабатываются
+    в порядке окончания; для каждой строится двудольный граф «тур — гид» и находится
+    максимальное паросочетание (алгоритм Хопкрофта — Карпа), а найденные пары фиксируются
+    в календарях гидов до перехода к следующей клике.
+    @note Точного полиномиального алгоритма для пересекающихся туров с ограничениями
+    на гидов нет (задача NP-трудна), поэтому гарантируется оценка по окну: если туры
+    окна имеют общий день (одна клика), покрытие максимально; иначе покрыто не меньше
+    OPT / (k + 1) туров окна, где OPT — наибольшее возможное покрытие, а k — наибольшее
+    число попарно непересекающихся туров окна, пересекающихся с одним туром. Тур без
+    гида остаётся таким, только если все подходящие ему гиды заняты пересекающимися турами
+    """
+
+    def __init__(self, guides: Iterable[Guide]):
+        """
+        @brief Конструктор оптимизатора
+        @param guides Гиды, между которыми распределяются туры
+        """
+        self.__by_city: Dict[City, List[Guide]] = {}
+        for guide in guides:
+            self.__by_city.setdefault(guide.city, []).append(guide)
+
+    def __candidates(self, tour: Tour, language: Optional[str]) -> List[Guide]:
+        """
+        @brief Возвращает гидов, способных провести тур
+        @param tour Тур
+        @param language Требуемый язык или None
+        @return Список подходящих гидов
+        """
+        return [guide for guide in self.__by_city.get(tour.destination, [])
+                if (language is None or language in guide.languages) and guide.is_free_for(tour)]
+
+    @staticmethod
+    def __max_matching(edges: List[List[int]], right_count: int) -> List[int]:
+        """
+        @brief Максимальное паросочетание в двудольном графе (Хопкрофт — Карп)
+        @param edges Для каждой левой вершины — список смежных правых вершин
+        @param right_count Количество правых вершин
+        @return Для каждой левой вершины номер правой пары или -1
+        """
+        unmatched = -1
+        match_left = [unmatched] * len(edges)
+        match_right = [unmatched] * right_count
+        while True:
+            distance = [unmatched] * len(edges)
+            queue = deque(left for left in range(len(edges)) if match_left[left] == unmatched)
+            for left in queue:
+                distance[left] = 0
+            found = False
+            while queue:
+                left = queue.popleft()
+                for right in edges[left]:
+                    paired = match_right[right]
+                    if paired == unmatched:
+                        found = True
+                    elif distance[paired] == unmatched:
+                        distance[paired] = distance[left] + 1
+                        queue.append(paired)
+            if not found:
+                return match_left
+
+            for left in range(len(edges)):
+                if match_left[left] == unmatched:
+                    GuideAssignmentOptimizer.__augment(left, edges, distance, match_left, match_right)
+
+    @staticmethod
+    def __augment(start: int, edges: List[List[int]], distance: List[int],
+                  match_left: List[int], match_right: List[int]) -> bool:
+        """
+        @brief Ищет увеличивающий путь по слоям BFS (итеративный поиск в глубину)
+        @param start Свободная левая вершина
+        @param edges Списки смежности левых вершин
+        @param distance Слои левых вершин; тупиковые вершины помечаются -1
+        @param match_left Пары левых вершин (изменяются при успехе)
+        @param match_right Пары правых вершин (изменяются при успехе)
+        @return True, если путь найден и паросочетание увеличено
+        """
+        stack = [(start, iter(edges[start]))]
+        path = []
+        while stack:
+            left, neighbours = stack[-1]
+            for right in neighbours:
+                paired = match_right[right]
+                if paired == -1:
+                    path.append((left, right))
+                    for path_left, path_right in path:
+                        match_left[path_left] = path_right
+                        match_right[path_right] = path_left
+                    return True
+                if distance[paired] == distance[left] + 1:
+                    path.append((left, right))
+                    stack.append((paired, iter(edges[paired])))
+                    break
+            else:
+                distance[left] = -1
+                stack.pop()
+                if path:
+                    path.pop()
+        return False
+
+    @staticmethod
+    def __windows(tours: Iterable[Tour]) -> Iterator[List[Tour]]:
+        """
+        @brief Делит туры на окна, не пересекающиеся по дням друг с другом
+        @param tours Туры
+        @return Итератор окон (списков туров в порядке начала)
+        """
+        window: List[Tour] = []
+        window_end = None
+        for tour in sorted(tours, key=lambda tour: tour.start_date):
+            start, end = Guide.tour_window(tour)
+            if window and start >= window_end:
+                yield window
+                window = []
+            window_end = end if not window else max(window_end, end)
+            window.append(tour)
+        if window:
+            yield window
+
+    @staticmethod
+    def __cliques(window: List[Tour]) -> Iterator[List[Tour]]:
+        """
+        @brief Разбивает окно на клики туров с общим днём
+        @details Наименьшее покрытие интервалов кликами: клику открывает тур с самым ранним
+        окончанием, в неё входят все оставшиеся туры, начавшиеся раньше этого окончания.
+        @param window Туры окна в порядке начала
+        @return Итератор клик (туры каждой клики — в порядке окончания)
+        """
+        by_end = sorted(window, key=lambda tour: tour.end_date)
+        grouped = set()
+        position = 0
+        for first in by_end:
+            if id(first) in grouped:
+                continue
+            boundary = Guide.tour_window(first)[1]
+            clique = []
+            while position < len(window) and window[position].start_date < boundary:
+                clique.append(window[position])
+                grouped.add(id(window[position]))
+                position += 1
+            clique.sort(key=lambda tour: tour.end_date)
+            yield clique
+
+    def __assign_clique(self, clique: List[Tour], languages: Dict[Tour, str], assigned: Dict[Tour, Guide]):
+        """
+        @brief Назначает гидов на туры клики по максимальному паросочетанию
+        @param clique Туры с общим днём (в порядке окончания: раньше заканчивающиеся
+        туры получают гидов первыми)
+        @param languages Требуемый язык для отдельных туров
+        @param assigned Словарь назначений (дополняется)
+        """
+        guides: List[Guide] = []
+        positions: Dict[int, int] = {}
+        edges: List[List[int]] = []
+        for tour in clique:
+            row = []
+            for guide in self.__candidates(tour, languages.get(tour)):
+                if id(guide) not in positions:
+                    positions[id(guide)] = len(guides)
+                    guides.append(guide)
+                row.append(positions[id(guide)])
+            edges.append(row)
+        for tour, right in zip(clique, self.__max_matching(edges, len(guides))):
+            if right >= 0:
+                guides[right].go_to_tour(tour)
+                assigned[tour] = guides[right]
+
+    def assign(self, tours: Iterable[Tour], languages: Optional[Dict[Tour, str]] = None) -> Dict[Tour, Guide]:
+        """
+        @brief Назначает гидов на туры максимальными паросочетаниями по кликам окон
+        @param tours Туры, которым нужен гид
+        @param languages Требуемый язык для отдельных туров (по умолчанию — любой)
+        @return Словарь {тур: назначенный гид} (туры без гида в него не попадают)
+        @note Назначения фиксируются через Guide.go_to_tour(); оценку покрытия
+        см. в описании класса
+        """
+        languages = languages or {}
+        assigned: Dict[Tour, Guide] = {}
+        for window in self.__windows(tours):
+            for clique in self.__cliques(window):
+                self.__assign_clique(clique, languages, assigned)
+        return assigned
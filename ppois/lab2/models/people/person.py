@@ -1,5 +1,6 @@
 from models.docs.passport import Passport
 from services.bank_account import BankAccount
+from services.events import emit
 
 class ContactInfo:
     """
@@ -30,6 +31,8 @@ class Person:
     Используется для моделирования взаимодействия с туристическими услугами.
     """
 
+    __slots__ = ("bank_account", "passport", "__mood", "contact_info")
+
     def __init__(self, passport: Passport, bank_account: BankAccount, mood: int = 15):
         """
         @brief Конструктор класса Person
@@ -42,19 +45,25 @@ class Person:
         self.__mood = mood
         self.contact_info = None
 
-    def __getattribute__(self, name):
+    def __getattr__(self, name):
         """
-        @brief Переопределённый метод доступа к атрибутам
-        @details Логирует попытки доступа к несуществующим атрибутам.
+        @brief Обработка обращения к несуществующему атрибуту
+        @details Вызывается интерпретатором только при промахе, поэтому обычное
+        чтение атрибутов не проходит через Python-обёртку.
         @param name Имя запрашиваемого атрибута
-        @exception AttributeError Если атрибут не найден
+        @exception AttributeError Всегда (атрибут не найден)
+        @note Отправляет событие attribute_missing (services.events)
         """
-        try:
-            return super().__getattribute__(name)
-        except AttributeError:
-            print(f"attribute {name} not found")
-            raise
+        emit("attribute_missing", name=name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
     
+    def get_mood(self) -> int:
+        """
+        @brief Возвращает текущее настроение человека
+        @return Значение настроения
+        """
+        return self.__mood
+
     def set_contact_info(self, contact_info: ContactInfo):
         """
         @brief Устанавливает контактную информацию для человека
@@ -71,11 +80,11 @@ class Person:
              - mood > 20: "you feel very well"
         """
         if self.__mood <= 10:
-            print("you are now sad, go make some activities")
+            emit("mood_sad", mood=self.__mood)
         elif 10 < self.__mood <= 20:
-            print("you feel yourself fine")
+            emit("mood_fine", mood=self.__mood)
         else:
-            print("you feel very well")
+            emit("mood_great", mood=self.__mood)
 
     def change_mood(self, mood_value: int):
         """
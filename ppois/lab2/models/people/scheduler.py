@@ -0,0 +1,231 @@
+from datetime import datetime
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+from models.travel.geography import City
+from .staff import Employee, Guide, Manager, TravelAgent
+
+
+class NoEligibleEmployee(Exception):
+    """
+    @brief Исключение: нет подходящего сотрудника
+    @details Выбрасывается, если в нужной роли нет ни одного сотрудника, который
+    работает в указанное время и удовлетворяет условиям (город, язык, занятость).
+    """
+    def __init__(self, role: str):
+        """
+        @brief Конструктор исключения
+        @param role Роль, для которой искали сотрудника (например, "agent")
+        """
+        super().__init__(f"No eligible {role} is available")
+
+
+class StaffScheduler:
+    """
+    @brief Планировщик назначения сотрудников по нагрузке
+    @details Для каждой роли хранит кучу (нагрузка, порядковый номер, сотрудник):
+    агенты и менеджеры — по одной куче на роль, гиды — по куче на город и на пару
+    (город, язык). Назначение берёт наименее загруженного подходящего сотрудника
+    с вершины кучи за O(log n); при изменении нагрузки в кучу добавляется новая запись,
+    а устаревшие записи отбрасываются при извлечении. Сотрудники, не подходящие по
+    графику работы или занятости, пропускаются и возвращаются в кучу.
+    @note O(log n) — это стоимость назначения, когда подходит сотрудник с вершины кучи.
+    Неподходящие сотрудники (вне смены, заняты) извлекаются по одному до первого
+    подходящего, поэтому при k пропущенных назначение стоит O(k log n), а в худшем
+    случае (почти никто не на смене) — O(n log n).
+    """
+
+    def __init__(self, employees=()):
+        """
+        @brief Конструктор планировщика
+        @param employees Сотрудники для начальной регистрации
+        """
+        self.__lock = Lock()
+        self.__sequence = count()
+        self.__heaps: Dict[tuple, List[Tuple[int, int, Employee]]] = {}
+        self.__members: Dict[tuple, int] = {}
+        self.__keys: Dict[int, List[tuple]] = {}
+        self.__loads: Dict[int, int] = {}
+        self.__latest: Dict[int, int] = {}
+        for employee in employees:
+            self.add(employee)
+
+    @staticmethod
+    def __role_keys(employee: Employee) -> List[tuple]:
+        """
+        @brief Возвращает ключи куч, в которых учитывается сотрудник
+        @param employee Сотрудник
+        @return Список ключей
+        @exception TypeError Если роль сотрудника не поддерживается
+        """
+        if isinstance(employee, TravelAgent):
+            return [("agent",)]
+        if isinstance(employee, Manager):
+            return [("manager",)]
+        if isinstance(employee, Guide):
+            return [("guide", employee.city)] + [("guide", employee.city, language) for language in employee.languages]
+        raise TypeError(f"unsupported employee role: {type(employee).__name__}")
+
+    def __push(self, employee: Employee):
+        """
+        @brief Добавляет актуальные записи сотрудника во все его кучи (под блокировкой)
+        @param employee Сотрудник
+        """
+        sequence = next(self.__sequence)
+        self.__latest[id(employee)] = sequence
+        for key in self.__keys[id(employee)]:
+            heap = self.__heaps.setdefault(key, [])
+            heappush(heap, (self.__loads[id(employee)], sequence, employee))
+            if len(heap) > 4 * self.__members[key] + 64:
+                heap[:] = [entry for entry in heap if self.__latest.get(id(entry[2])) == entry[1]]
+                heapify(heap)
+
+    def add(self, employee: Employee):
+        """
+        @brief Регистрирует сотрудника с нулевой нагрузкой
+        @param employee Агент, менеджер или гид
+        @exception TypeError Если роль сотрудника не поддерживается
+        """
+        with self.__lock:
+            if id(employee) in self.__keys:
+                return
+            self.__keys[id(employee)] = self.__role_keys(employee)
+            self.__loads[id(employee)] = 0
+            for key in self.__keys[id(employee)]:
+                self.__members[key] = self.__members.get(key, 0) + 1
+            self.__push(employee)
+
+    def remove(self, employee: Employee):
+        """
+        @brief Снимает сотрудника с учёта
+        @details Записи сотрудника в кучах становятся устаревшими и отбрасываются при
+        следующем извлечении, поэтому удаление стоит O(число ролей сотрудника).
+        @param employee Сотрудник (если он не зарегистрирован — ничего не происходит)
+        """
+        with self.__lock:
+            keys = self.__keys.pop(id(employee), None)
+            if keys is None:
+                return
+            for key in keys:
+                self.__members[key] -= 1
+                if not self.__members[key]:
+                    del self.__members[key]
+                    self.__heaps.pop(key, None)
+            del self.__loads[id(employee)]
+            del self.__latest[id(employee)]
+
+    def __contains__(self, employee: Employee) -> bool:
+        """
+        @brief Проверяет, зарегистрирован ли сотрудник
+        @param employee Сотрудник
+        @return True, если сотрудник учитывается планировщиком
+        """
+        return id(employee) in self.__keys
+
+    def load_of(self, employee: Employee) -> int:
+        """
+        @brief Возвращает текущую нагрузку сотрудника
+        @param employee Зарегистрированный сотрудник
+        @return Количество незавершённых назначений
+        """
+        return self.__loads[id(employee)]
+
+    def __acquire(self, key: tuple, role: str, eligible: Callable[[Employee], bool]) -> Employee:
+        """
+        @brief Назначает наименее загруженного подходящего сотрудника из кучи
+        @param key Ключ кучи
+        @param role Название роли для сообщения об ошибке
+        @param eligible Проверка сотрудника (график, занятость)
+        @return Сотрудник с увеличенной на единицу нагрузкой
+        @exception NoEligibleEmployee Если подходящих сотрудников нет
+        """
+        with self.__lock:
+            heap = self.__heaps.get(key, [])
+            skipped = []
+            try:
+                while heap:
+                    entry = heappop(heap)
+                    employee = entry[2]
+                    if self.__latest.get(id(employee)) != entry[1]:
+                        continue
+                    if not eligible(employee):
+                        skipped.append(entry)
+                        continue
+                    self.__loads[id(employee)] += 1
+                    self.__push(employee)
+                    return employee
+                raise NoEligibleEmployee(role)
+            finally:
+                for entry in skipped:
+                    heappush(heap, entry)
+
+    @staticmethod
+    def __on_duty(at: Optional[datetime]) -> Callable[[Employee], bool]:
+        """
+        @brief Возвращает проверку графика работы
+        @param at Момент назначения (None — график не проверяется)
+        @return Функция employee -> bool
+        """
+        if at is None:
+            return lambda employee: True
+        return lambda employee: (getattr(employee, "work_schedule", None) is None
+                                 or employee.work_schedule.is_working(at))
+
+    def acquire_agent(self, at: Optional[datetime] = None) -> TravelAgent:
+        """
+        @brief Назначает наименее загруженного агента
+        @param at Момент назначения для проверки графика (None — без проверки)
+        @return Объект TravelAgent
+        @exception NoEligibleEmployee Если подходящих агентов нет
+        """
+        return self.__acquire(("agent",), "agent", self.__on_duty(at))
+
+    def acquire_manager(self, at: Optional[datetime] = None) -> Manager:
+        """
+        @brief Назначает наименее загруженного менеджера
+        @param at Момент назначения для проверки графика (None — без проверки)
+        @return Объект Manager
+        @exception NoEligibleEmployee Если подходящих менеджеров нет
+        """
+        return self.__acquire(("manager",), "manager", self.__on_duty(at))
+
+    def acquire_guide(self, city: City, language: Optional[str] = None, at: Optional[datetime] = None,
+                      eligible: Optional[Callable[[Guide], bool]] = None) -> Guide:
+        """
+        @brief Назначает наименее загруженного свободного гида города
+        @param city Город тура
+        @param language Язык экскурсий (None — любой)
+        @param at Момент назначения для проверки графика (None — без проверки)
+        @param eligible Дополнительная проверка гида (по умолчанию — guide.is_available;
+        для конкретного тура — guide.is_free_for(tour))
+        @return Объект Guide
+        @exception NoEligibleEmployee Если подходящих гидов нет
+        """
+        on_duty = self.__on_duty(at)
+        eligible = eligible or (lambda guide: guide.is_available)
+        key = ("guide", city) if language is None else ("guide", city, language)
+        return self.__acquire(key, "guide", lambda guide: on_duty(guide) and eligible(guide))
+
+    def assign(self, employee: Employee):
+        """
+        @brief Увеличивает нагрузку сотрудника, назначенного в обход acquire_*
+        @param employee Зарегистрированный сотрудник
+        """
+        with self.__lock:
+            self.__loads[id(employee)] += 1
+            self.__push(employee)
+
+    def release(self, employee: Employee):
+        """
+        @brief Уменьшает нагрузку сотрудника после завершения работы
+        @param employee Сотрудник (для снятого с учёта ничего не происходит)
+        @exception ValueError Если нагрузка сотрудника уже нулевая
+        """
+        with self.__lock:
+            if id(employee) not in self.__loads:
+                return
+            if self.__loads[id(employee)] == 0:
+                raise ValueError("employee has no assignments to release")
+            self.__loads[id(employee)] -= 1
+            self.__push(employee)
@@ -1,11 +1,14 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 from .person import Person as Client
 from models.travel.booking import Booking
 from models.travel.tour import Tour
 from models.travel.geography import City
+from models.travel.availability import AvailabilityCalendar, RangeAlreadyReserved
 from random import random
+from threading import RLock
 from services.bank_account import BankAccount
+from services.events import emit
 
 
 GUIDE_SUCCESS_RATE = 0.3
@@ -16,6 +19,12 @@ GUIDE_SUCCESS_RATE = 0.3
 """
 
 
+WEEKDAY_NAMES = (("Mnd", "Mon"), ("Tue",), ("Wed",), ("Thu",), ("Fri",), ("Sat",), ("Sun",))
+"""
+@brief Константа: допустимые обозначения дней недели в WorkSchedule (индекс — datetime.weekday())
+"""
+
+
 class EmployeeIsUnavailable(Exception):
     """
     @brief Исключение: сотрудник недоступен
@@ -87,6 +96,27 @@ class WorkSchedule:
         self.end_time = end_time
         self.days = days
 
+    @staticmethod
+    def __minutes(clock: str) -> int:
+        """
+        @brief Переводит время вида "HH.MM" в минуты от полуночи
+        @param clock Время в формате "HH.MM" (например, "9.00")
+        @return Количество минут
+        """
+        hours, _, minutes = clock.partition(".")
+        return int(hours) * 60 + int(minutes or 0)
+
+    def is_working(self, at: datetime) -> bool:
+        """
+        @brief Проверяет, работает ли сотрудник в указанный момент
+        @param at Дата и время
+        @return True, если день недели входит в days и время в [start_time, end_time)
+        """
+        if not any(name in self.days for name in WEEKDAY_NAMES[at.weekday()]):
+            return False
+        minute = at.hour * 60 + at.minute
+        return self.__minutes(self.start_time) <= minute < self.__minutes(self.end_time)
+
     def __str__(self) -> str:
         """
         @brief Строковое представление графика
@@ -100,6 +130,8 @@ class Employee:
     """
     @brief Базовый класс для всех сотрудников туристического агентства
     @details Содержит общую информацию: ID, имя, должность, дату приёма на работу и статус активности.
+    Изменения счётчиков, бонусов и занятости выполняются под блокировкой self.lock,
+    так как одного сотрудника могут одновременно выбрать несколько потоков обслуживания.
     """
 
     def __init__(self, employee_id: str, name: str, position: str, hire_date: datetime):
@@ -115,6 +147,7 @@ class Employee:
         self.position = position
         self.hire_date = hire_date
         self.is_active = True
+        self.lock = RLock()
 
     def __str__(self) -> str:
         """
@@ -151,17 +184,48 @@ class TravelAgent(Employee):
         @param client Клиент (Person)
         @param tour Тур для бронирования
         @param travel_agency_bank_account Банковский счёт агентства
-        @return Объект Booking при успехе; None не возвращается (всегда создаётся Booking)
-        @exception BookingTourFailed Если tour.book() завершился с ошибкой
-        @note Увеличивает счётчик обработанных бронирований и начисляет бонус
+        @return Объект Booking
+        @exception BookingTourFailed Если tour.book() отказал (виза, нехватка средств) или завершился с ошибкой
+        @note Счётчик обработанных бронирований и бонус увеличиваются только при успешном бронировании
         """
         try:
-            tour.book(client, travel_agency_bank_account)
+            booked = tour.book(client, travel_agency_bank_account)
         except Exception:
             raise BookingTourFailed()
-        self.bookings_handled += 1
-        self.get_bonus()
-        print(f"Tour booked by agent {self.name} for {client.passport.name}. Commission: {tour.price * self.commission_rate:.2f}")
+        if not booked:
+            raise BookingTourFailed()
+        return self.__record_booking(client, tour)
+
+    async def book_tour_for_client_async(self, client: Client, tour: Tour,
+                                         travel_agency_bank_account: BankAccount) -> Booking:
+        """
+        @brief Асинхронно бронирует тур для клиента
+        @param client Клиент (Person)
+        @param tour Тур для бронирования
+        @param travel_agency_bank_account Банковский счёт агентства
+        @return Объект Booking
+        @exception BookingTourFailed Если tour.book_async() отказал или завершился с ошибкой
+        """
+        try:
+            booked = await tour.book_async(client, travel_agency_bank_account)
+        except Exception:
+            raise BookingTourFailed()
+        if not booked:
+            raise BookingTourFailed()
+        return self.__record_booking(client, tour)
+
+    def __record_booking(self, client: Client, tour: Tour) -> Booking:
+        """
+        @brief Учитывает проведённое бронирование: счётчик, бонус и событие
+        @param client Клиент
+        @param tour Забронированный тур
+        @return Объект Booking
+        """
+        with self.lock:
+            self.bookings_handled += 1
+            self.get_bonus()
+        emit("agent_booked_tour", agent=self.name, client=client.passport.name,
+             commission=tour.price * self.commission_rate)
         return Booking(client)
 
     def get_bonus(self):
@@ -169,7 +233,8 @@ class TravelAgent(Employee):
         @brief Начисляет бонус к зарплате
         @details Увеличивает текущий бонус на 12% (умножает на 1.12)
         """
-        self.salary.bonus *= 1.12
+        with self.lock:
+            self.salary.bonus *= 1.12
 
     def __str__(self) -> str:
         """
@@ -202,17 +267,18 @@ class Manager(Employee):
         @brief Увеличивает бонус менеджера на 10%
         @details Приватный метод, вызываемый при предложении туров
         """
-        self.salary.bonus *= 1.1
+        with self.lock:
+            self.salary.bonus *= 1.1
 
     def offer_tours_to_client(self, tours: List[Tour]):
         """
         @brief Предлагает клиенту список доступных туров
         @param tours Список объектов Tour для предложения
         @note Автоматически увеличивает бонус менеджера
-        @note Выводит все туры в консоль (для демонстрации)
+        @note Отправляет событие tours_offered (по умолчанию туры выводятся в консоль)
         """
         self.__increase_bonus()
-        print(*tours)
+        emit("tours_offered", manager=self.name, tours=tours)
 
     def __str__(self) -> str:
         """
@@ -228,8 +294,10 @@ class Manager(Employee):
 class Guide(Employee):
     """
     @brief Гид
-    @details Проводит экскурсии в определённом городе, владеет языками,
-    может быть недоступен после назначения на тур.
+    @details Проводит экскурсии в определённом городе, владеет языками.
+    Назначения хранятся в календаре AvailabilityCalendar: гид занят только в дни
+    назначенных туров (с start_date по end_date включительно) и свободен в остальное время.
+    Флаг is_available позволяет вывести гида из работы целиком.
     """
 
     def __init__(self, employee_id: str, name: str, hire_date: datetime, languages: List[str], city: City):
@@ -246,24 +314,56 @@ class Guide(Employee):
         self.city = city
         self.is_available = True
         self.salary = Salary(1000, 2000)
+        self.calendar = AvailabilityCalendar()
+
+    @staticmethod
+    def tour_window(tour: Tour) -> Tuple:
+        """
+        @brief Возвращает полуинтервал дней, которые гид проводит в туре
+        @param tour Тур
+        @return Пара (start_date, end_date + 1 день)
+        """
+        return tour.start_date, tour.end_date + timedelta(days=1)
+
+    def is_free_for(self, tour: Tour) -> bool:
+        """
+        @brief Проверяет, может ли гид провести тур
+        @param tour Тур
+        @return True, если гид в работе, город совпадает и дни тура свободны
+        """
+        return self.is_available and tour.destination == self.city and self.calendar.is_free(*self.tour_window(tour))
 
     def __assign_to_tour(self, tour: Tour) -> bool:
         """
         @brief Проверяет и назначает гида на тур
         @param tour Тур для назначения
-        @return True, если гид доступен и город совпадает; иначе False
-        @note При успешном назначении гид становится недоступным (is_available = False)
+        @return True, если гид в работе, город совпадает и дни тура свободны; иначе False
+        @note При успешном назначении дни тура резервируются в календаре гида
         """
-        if not self.is_available or tour.destination != self.city:
-            return False
-        self.is_available = False
-        return True
+        with self.lock:
+            if not self.is_available or tour.destination != self.city:
+                return False
+            try:
+                self.calendar.reserve(*self.tour_window(tour))
+            except RangeAlreadyReserved:
+                return False
+            return True
+
+    def release(self, tour: Tour) -> bool:
+        """
+        @brief Снимает гида с тура, освобождая его дни
+        @param tour Тур, на который гид был назначен
+        @return True, если назначение было и снято; иначе False
+        """
+        with self.lock:
+            return self.calendar.release(*self.tour_window(tour))
 
     def go_to_tour(self, tour: Tour):
         """
         @brief Отправляет гида на тур
         @param tour Тур для сопровождения
-        @exception EmployeeIsUnavailable Если гид недоступен или город не совпадает
+        @exception EmployeeIsUnavailable Если гид выведен из работы, город не совпадает
+        или в дни тура гид уже занят
         @note С вероятностью (1 - GUIDE_SUCCESS_RATE) начисляется бонус
         """
         if self.__assign_to_tour(tour):
@@ -277,7 +377,8 @@ class Guide(Employee):
         @brief Увеличивает бонус гида на 20%
         @details Приватный метод, вызываемый при успешном завершении тура
         """
-        self.salary.bonus *= 1.2
+        with self.lock:
+            self.salary.bonus *= 1.2
 
     def __str__(self) -> str:
         """
@@ -1,7 +1,11 @@
 import datetime as dt
-from typing import Optional
+from threading import Lock
+from typing import Dict, List, Optional
 from .geography import City
+from .availability import AvailabilityCalendar, RangeAlreadyReserved
+from services.capacity import CapacityCounter
 from services.bank_account import BankAccount, Transaction, NotEnoughMoney
+from services.events import emit
 from random import randint
 
 
@@ -30,6 +34,8 @@ class Accomodation:
     @brief Абстрактный базовый класс для проживания
     @details Определяет общую логику бронирования жилья: расчёт стоимости,
     проверку дат и выполнение платежа. Используется как родительский для Hotel, Hostel, Apartment.
+    Занятость объекта по датам хранится в календаре AvailabilityCalendar, поэтому один объект
+    может принимать много непересекающихся броней.
     """
 
     def __init__(
@@ -57,38 +63,149 @@ class Accomodation:
         self.price_per_night = price_per_night
         self.location = location
         self.bank_account = bank_account
+        self.calendar = AvailabilityCalendar()
         if start_date >= end_date:
             raise StartAndEndDateError()
         if self.end_date == dt.date.today():
             raise AccomodationNotFoundOrExpired()
 
-    def __getattribute__(self, name):
+    @classmethod
+    def restore(
+        cls,
+        start_date: dt.date,
+        end_date: dt.date,
+        location: Optional[City] = None,
+        price_per_night: float = 0.0,
+        bank_account: Optional[BankAccount] = None
+    ) -> 'Accomodation':
+        """
+        @brief Восстанавливает сохранённое проживание без проверки дат
+        @details Используется загрузчиком снимка агентства: даты сохранённого жилья могли
+        пройти, а конструктор сравнивает их с сегодняшним днём. Календарь создаётся пустым,
+        поля подклассов (звёзды отеля, этаж апартаментов) задаются после восстановления.
+        @param start_date Дата заезда
+        @param end_date Дата выезда
+        @param location Город размещения
+        @param price_per_night Стоимость за ночь
+        @param bank_account Банковский счёт владельца жилья
+        @return Объект класса cls
+        """
+        stay = cls.__new__(cls)
+        stay.start_date = start_date
+        stay.end_date = end_date
+        stay.price = price_per_night * (end_date - start_date).days
+        stay.price_per_night = price_per_night
+        stay.location = location
+        stay.bank_account = bank_account
+        stay.calendar = AvailabilityCalendar()
+        return stay
+
+    def __getattr__(self, name):
         """
-        @brief Переопределённый метод доступа к атрибутам
-        @details Логирует попытки доступа к несуществующим атрибутам.
+        @brief Обработка обращения к несуществующему атрибуту
+        @details Вызывается интерпретатором только при промахе, поэтому обычное
+        чтение атрибутов не проходит через Python-обёртку.
         @param name Имя запрашиваемого атрибута
-        @exception AttributeError Если атрибут не найден
+        @exception AttributeError Всегда (атрибут не найден)
+        @note Отправляет событие attribute_missing (services.events)
+        """
+        emit("attribute_missing", name=name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def is_free(self, start_date: dt.date = None, end_date: dt.date = None) -> bool:
+        """
+        @brief Проверяет, свободно ли проживание на даты
+        @param start_date Дата заезда (по умолчанию self.start_date)
+        @param end_date Дата выезда (по умолчанию self.end_date)
+        @return True, если даты не пересекаются ни с одной бронью
+        """
+        return self.calendar.is_free(start_date or self.start_date, end_date or self.end_date)
+
+    def reserve(self, start_date: dt.date = None, end_date: dt.date = None) -> bool:
+        """
+        @brief Резервирует даты без оплаты
+        @param start_date Дата заезда (по умолчанию self.start_date)
+        @param end_date Дата выезда (по умолчанию self.end_date)
+        @return True, если даты были свободны и зарезервированы; иначе False
+        @exception StartAndEndDateError Если start_date >= end_date
         """
+        start_date = start_date or self.start_date
+        end_date = end_date or self.end_date
+        if start_date >= end_date:
+            raise StartAndEndDateError()
         try:
-            return super().__getattribute__(name)
-        except AttributeError:
-            print(f"attribute {name} not found")
-            raise
+            self.calendar.reserve(start_date, end_date)
+            return True
+        except RangeAlreadyReserved:
+            return False
+
+    def __prepare_booking(self, start_date: Optional[dt.date], end_date: Optional[dt.date]):
+        """
+        @brief Резервирует даты перед оплатой бронирования
+        @param start_date Дата заезда или None
+        @param end_date Дата выезда или None
+        @return Пара (дата заезда, дата выезда) или None, если даты заняты
+        """
+        start_date = start_date or self.start_date
+        end_date = end_date or self.end_date
+        if not self.reserve(start_date, end_date):
+            emit("accommodation_unavailable", accommodation=self, start_date=start_date, end_date=end_date)
+            return None
+        return start_date, end_date
 
-    def book(self, client_bank_account: BankAccount) -> bool:
+    def book(self, client_bank_account: BankAccount, start_date: dt.date = None, end_date: dt.date = None) -> bool:
         """
         @brief Бронирует проживание для клиента
         @param client_bank_account Банковский счёт клиента
-        @return True, если оплата прошла успешно; False при нехватке средств
-        @note Использует метод make_transaction() из BankAccount
+        @param start_date Дата заезда (по умолчанию self.start_date)
+        @param end_date Дата выезда (по умолчанию self.end_date)
+        @return True, если даты свободны и оплата прошла успешно; False, если даты заняты или не хватает средств
+        @exception StartAndEndDateError Если start_date >= end_date
+        @note Даты резервируются до оплаты и освобождаются, если оплата не прошла.
+        Использует метод make_transaction() из BankAccount
         """
-        total_price = self.price
+        dates = self.__prepare_booking(start_date, end_date)
+        if dates is None:
+            return False
         try:
-            client_bank_account.make_transaction(self.bank_account, total_price)
+            client_bank_account.make_transaction(self.bank_account, self.price_per_night * (dates[1] - dates[0]).days)
             return True
         except NotEnoughMoney:
+            self.release(*dates)
             return False
 
+    async def book_async(self, client_bank_account: BankAccount, start_date: dt.date = None,
+                         end_date: dt.date = None) -> bool:
+        """
+        @brief Асинхронно бронирует проживание для клиента
+        @details Резервирование дат не ждёт ввода-вывода и выполняется сразу; ожидание
+        блокировок счетов при оплате не блокирует цикл событий.
+        @param client_bank_account Банковский счёт клиента
+        @param start_date Дата заезда (по умолчанию self.start_date)
+        @param end_date Дата выезда (по умолчанию self.end_date)
+        @return True, если даты свободны и оплата прошла успешно; иначе False
+        @exception StartAndEndDateError Если start_date >= end_date
+        """
+        dates = self.__prepare_booking(start_date, end_date)
+        if dates is None:
+            return False
+        try:
+            await client_bank_account.make_transaction_async(
+                self.bank_account, self.price_per_night * (dates[1] - dates[0]).days)
+            return True
+        except NotEnoughMoney:
+            self.release(*dates)
+            return False
+
+    def release(self, start_date: dt.date = None, end_date: dt.date = None) -> bool:
+        """
+        @brief Снимает бронь с дат (без возврата оплаты)
+        @param start_date Дата заезда брони (по умолчанию self.start_date)
+        @param end_date Дата выезда брони (по умолчанию self.end_date)
+        @return True, если бронь была снята
+        """
+        return self.calendar.release(start_date or self.start_date, end_date or self.end_date)
+
 
 class Hotel(Accomodation):
     """
@@ -138,6 +255,10 @@ class Hostel(Accomodation):
     """
     @brief Представляет хостел
     @details Расширяет базовое проживание, добавляя количество мест в комнате.
+    В отличие от отеля и апартаментов, хостел бронируется по койкам: на каждую ночь
+    заводится счётчик свободных коек (persons_for_room * rooms), и диапазон свободен,
+    пока на каждую его ночь остаётся хотя бы одна койка. Бронь и снятие брони на несколько
+    ночей выполняются под блокировкой хостела, поэтому они атомарны относительно друг друга.
     """
 
     def __init__(
@@ -147,7 +268,8 @@ class Hostel(Accomodation):
         location: Optional[City] = None,
         price_per_night: float = 0.0,
         bank_account: Optional[BankAccount] = None,
-        persons_for_room: int = 2
+        persons_for_room: int = 2,
+        rooms: int = 1
     ):
         """
         @brief Конструктор хостела
@@ -157,9 +279,134 @@ class Hostel(Accomodation):
         @param price_per_night Стоимость за ночь
         @param bank_account Банковский счёт хостела
         @param persons_for_room Количество человек в одной комнате (по умолчанию 2)
+        @param rooms Количество комнат (по умолчанию 1)
         """
         super().__init__(start_date, end_date, location, price_per_night, bank_account)
         self.persons_for_room = persons_for_room
+        self.rooms = rooms
+        self.__nights: Dict[dt.date, CapacityCounter] = {}
+        self.__lock = Lock()
+
+    @classmethod
+    def restore(
+        cls,
+        start_date: dt.date,
+        end_date: dt.date,
+        location: Optional[City] = None,
+        price_per_night: float = 0.0,
+        bank_account: Optional[BankAccount] = None,
+        persons_for_room: int = 2,
+        rooms: int = 1
+    ) -> 'Hostel':
+        """
+        @brief Восстанавливает сохранённый хостел без проверки дат
+        @details См. Accomodation.restore(); счётчики коек по ночам создаются пустыми
+        и заполняются бронями через reserve().
+        @param start_date Дата заезда
+        @param end_date Дата выезда
+        @param location Город размещения
+        @param price_per_night Стоимость за ночь
+        @param bank_account Банковский счёт хостела
+        @param persons_for_room Количество человек в одной комнате
+        @param rooms Количество комнат
+        @return Объект Hostel
+        """
+        hostel = super().restore(start_date, end_date, location, price_per_night, bank_account)
+        hostel.persons_for_room = persons_for_room
+        hostel.rooms = rooms
+        hostel.__nights = {}
+        hostel.__lock = Lock()
+        return hostel
+
+    def __night_counters(self, start_date: dt.date, end_date: dt.date) -> List[CapacityCounter]:
+        """
+        @brief Возвращает счётчики коек для каждой ночи диапазона, создавая недостающие
+        @param start_date Дата заезда
+        @param end_date Дата выезда
+        @return Список CapacityCounter по ночам
+        """
+        beds = self.persons_for_room * self.rooms
+        counters = []
+        for offset in range((end_date - start_date).days):
+            night = start_date + dt.timedelta(days=offset)
+            counter = self.__nights.get(night)
+            if counter is None:
+                counter = self.__nights[night] = CapacityCounter(beds)
+            counters.append(counter)
+        return counters
+
+    def remaining_beds(self, start_date: dt.date = None, end_date: dt.date = None) -> int:
+        """
+        @brief Возвращает количество коек, свободных на все ночи диапазона
+        @param start_date Дата заезда (по умолчанию self.start_date)
+        @param end_date Дата выезда (по умолчанию self.end_date)
+        @return Минимум свободных коек по ночам диапазона
+        """
+        start_date = start_date or self.start_date
+        end_date = end_date or self.end_date
+        beds = self.persons_for_room * self.rooms
+        nights = (start_date + dt.timedelta(days=offset) for offset in range((end_date - start_date).days))
+        return min((self.__nights[night].remaining() if night in self.__nights else beds for night in nights),
+                   default=beds)
+
+    def occupancy(self) -> Dict[dt.date, int]:
+        """
+        @brief Возвращает занятые койки по ночам
+        @return Словарь {ночь: количество занятых коек} в порядке дат (только ночи с бронями)
+        """
+        beds = self.persons_for_room * self.rooms
+        return {night: beds - counter.remaining() for night, counter in sorted(self.__nights.items())
+                if counter.remaining() < beds}
+
+    def is_free(self, start_date: dt.date = None, end_date: dt.date = None) -> bool:
+        """
+        @brief Проверяет, есть ли свободная койка на все ночи диапазона
+        @param start_date Дата заезда (по умолчанию self.start_date)
+        @param end_date Дата выезда (по умолчанию self.end_date)
+        @return True, если хотя бы одна койка свободна на каждую ночь
+        """
+        return self.remaining_beds(start_date, end_date) > 0
+
+    def reserve(self, start_date: dt.date = None, end_date: dt.date = None) -> bool:
+        """
+        @brief Резервирует одну койку на все ночи диапазона без оплаты
+        @param start_date Дата заезда (по умолчанию self.start_date)
+        @param end_date Дата выезда (по умолчанию self.end_date)
+        @return True, если койка есть на каждую ночь; иначе False (ничего не резервируется)
+        @exception StartAndEndDateError Если start_date >= end_date
+        @note Если на какую-то ночь мест нет, уже занятые ночи освобождаются
+        """
+        start_date = start_date or self.start_date
+        end_date = end_date or self.end_date
+        if start_date >= end_date:
+            raise StartAndEndDateError()
+        with self.__lock:
+            counters = self.__night_counters(start_date, end_date)
+            for position, counter in enumerate(counters):
+                if not counter.try_reserve():
+                    for reserved in counters[:position]:
+                        reserved.release()
+                    return False
+            return True
+
+    def release(self, start_date: dt.date = None, end_date: dt.date = None) -> bool:
+        """
+        @brief Освобождает одну койку на даты (без возврата оплаты)
+        @param start_date Дата заезда брони (по умолчанию self.start_date)
+        @param end_date Дата выезда брони (по умолчанию self.end_date)
+        @return True, если койка была занята на все ночи и освобождена; иначе False
+        """
+        start_date = start_date or self.start_date
+        end_date = end_date or self.end_date
+        beds = self.persons_for_room * self.rooms
+        with self.__lock:
+            counters = [self.__nights.get(start_date + dt.timedelta(days=offset))
+                        for offset in range((end_date - start_date).days)]
+            if not counters or any(counter is None or counter.remaining() == beds for counter in counters):
+                return False
+            for counter in counters:
+                counter.release()
+            return True
 
     def property_stolen(self,client_bank_account: BankAccount, amount: float) -> bool:
         """
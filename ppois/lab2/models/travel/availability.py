@@ -0,0 +1,167 @@
+from bisect import bisect_right
+from datetime import date
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+from .geography import City
+
+
+class RangeAlreadyReserved(Exception):
+    """
+    @brief Исключение: диапазон дат пересекается с существующей бронью
+    @details Выбрасывается при попытке зарезервировать занятый диапазон.
+    """
+    def __init__(self, start: date, end: date):
+        """
+        @brief Конструктор исключения
+        @param start Начало запрошенного диапазона
+        @param end Конец запрошенного диапазона
+        """
+        super().__init__(f"Range {start} - {end} is already reserved")
+
+
+class AvailabilityCalendar:
+    """
+    @brief Календарь занятости одного объекта проживания
+    @details Хранит непересекающиеся полуинтервалы [заезд, выезд) двумя отсортированными
+    массивами начал и концов. Так как брони не пересекаются, оба массива упорядочены
+    одинаково, и проверка диапазона сводится к одному бинарному поиску — O(log n).
+    День выезда одной брони может быть днём заезда следующей.
+    """
+
+    def __init__(self):
+        """
+        @brief Конструктор пустого календаря
+        """
+        self.__lock = Lock()
+        self.__starts: List[date] = []
+        self.__ends: List[date] = []
+
+    def __position(self, start: date, end: date) -> Optional[int]:
+        """
+        @brief Ищет место вставки свободного диапазона
+        @param start Дата заезда
+        @param end Дата выезда
+        @return Индекс вставки или None, если диапазон пересекается с бронью
+        """
+        position = bisect_right(self.__starts, start)
+        if position > 0 and self.__ends[position - 1] > start:
+            return None
+        if position < len(self.__starts) and self.__starts[position] < end:
+            return None
+        return position
+
+    def is_free(self, start: date, end: date) -> bool:
+        """
+        @brief Проверяет, свободен ли диапазон
+        @param start Дата заезда
+        @param end Дата выезда
+        @return True, если диапазон не пересекается ни с одной бронью
+        """
+        with self.__lock:
+            return self.__position(start, end) is not None
+
+    def reserve(self, start: date, end: date):
+        """
+        @brief Резервирует диапазон
+        @param start Дата заезда
+        @param end Дата выезда
+        @exception ValueError Если start >= end
+        @exception RangeAlreadyReserved Если диапазон пересекается с бронью
+        """
+        if start >= end:
+            raise ValueError("start date must be before end date")
+        with self.__lock:
+            position = self.__position(start, end)
+            if position is None:
+                raise RangeAlreadyReserved(start, end)
+            self.__starts.insert(position, start)
+            self.__ends.insert(position, end)
+
+    def release(self, start: date, end: date) -> bool:
+        """
+        @brief Снимает бронь с диапазона
+        @param start Дата заезда брони
+        @param end Дата выезда брони
+        @return True, если такая бронь была и снята; иначе False
+        """
+        with self.__lock:
+            position = bisect_right(self.__starts, start) - 1
+            if position < 0 or self.__starts[position] != start or self.__ends[position] != end:
+                return False
+            del self.__starts[position]
+            del self.__ends[position]
+            return True
+
+    def reservations(self) -> Iterator[Tuple[date, date]]:
+        """
+        @brief Перечисляет брони в порядке дат
+        @return Итератор пар (заезд, выезд)
+        """
+        return iter(list(zip(self.__starts, self.__ends)))
+
+    def __len__(self) -> int:
+        """
+        @brief Количество броней
+        @return Число зарезервированных диапазонов
+        """
+        return len(self.__starts)
+
+
+class AccommodationInventory:
+    """
+    @brief Инвентарь объектов проживания по городам
+    @details Группирует отели, хостелы и апартаменты по городу размещения (по geo_id),
+    поэтому поиск свободного жилья просматривает только объекты нужного города,
+    проверяя каждый за O(log n) по его календарю.
+    """
+
+    def __init__(self, accommodations=()):
+        """
+        @brief Конструктор инвентаря
+        @param accommodations Объекты Accomodation для начальной загрузки
+        """
+        self.__by_city: Dict[City, List] = {}
+        for accommodation in accommodations:
+            self.add(accommodation)
+
+    def add(self, accommodation):
+        """
+        @brief Добавляет объект проживания
+        @param accommodation Объект Accomodation с заданным location
+        """
+        self.__by_city.setdefault(accommodation.location, []).append(accommodation)
+
+    def remove(self, accommodation):
+        """
+        @brief Удаляет объект проживания
+        @param accommodation Объект Accomodation, ранее добавленный в инвентарь
+        @exception ValueError Если объекта нет в инвентаре
+        """
+        self.__by_city.get(accommodation.location, []).remove(accommodation)
+
+    def in_city(self, city: City) -> List:
+        """
+        @brief Возвращает все объекты проживания города
+        @param city Город
+        @return Список Accomodation
+        """
+        return list(self.__by_city.get(city, []))
+
+    def find_free(self, city: City, start: date, end: date, kind: type = None) -> List:
+        """
+        @brief Ищет объекты проживания, свободные на все даты диапазона
+        @param city Город
+        @param start Дата заезда
+        @param end Дата выезда
+        @param kind Тип жилья (Hotel, Hostel, Apartment) или None — любой
+        @return Список свободных Accomodation
+        """
+        return [accommodation for accommodation in self.__by_city.get(city, [])
+                if (kind is None or isinstance(accommodation, kind)) and accommodation.is_free(start, end)]
+
+    def __len__(self) -> int:
+        """
+        @brief Количество объектов в инвентаре
+        @return Число объектов проживания
+        """
+        return sum(len(accommodations) for accommodations in self.__by_city.values())
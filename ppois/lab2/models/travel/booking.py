@@ -4,6 +4,8 @@ from models.people.person import Person
 from .transport import Flight, CarRental
 from .accomodation import Accomodation
 from services.bank_account import Transaction, NotEnoughMoney
+from services.ids import next_id
+from services.events import emit
 
 
 class Booking:
@@ -13,6 +15,8 @@ class Booking:
     Используется как родительский для специализированных типов бронирования.
     """
 
+    __slots__ = ("person", "booking_date", "is_confirmed", "booking_id")
+
     def __init__(self, person: Person, booking_date: datetime = None):
         """
         @brief Конструктор базового бронирования
@@ -27,31 +31,33 @@ class Booking:
     def generate_booking_id(self) -> str:
         """
         @brief Генерирует уникальный идентификатор бронирования
-        @return Строка в формате: "BOOK_<bank_account_id>_<YYYYMMDDHHMMSS>"
+        @return Строка в формате: "BOOK_<bank_account_id>_<уникальный номер>"
+        @note Номер выдаётся генератором services.ids и не повторяется даже для
+        нескольких бронирований одного клиента в одну секунду
         """
-        return f"BOOK_{self.person.bank_account.id}_{self.booking_date.strftime('%Y%m%d%H%M%S')}"
+        return f"BOOK_{self.person.bank_account.id}_{next_id()}"
 
     def confirm(self) -> bool:
         """
         @brief Подтверждает бронирование
         @return True после успешного подтверждения
-        @note Выводит сообщение в консоль
+        @note Отправляет событие booking_confirmed (services.events)
         """
         self.is_confirmed = True
-        print(f"Booking {self.booking_id} confirmed.")
+        emit("booking_confirmed", booking_id=self.booking_id)
         return True
 
     def cancel(self) -> bool:
         """
         @brief Отменяет бронирование
         @return True, если бронирование было подтверждено и успешно отменено; False, если не подтверждено
-        @note Выводит соответствующее сообщение в консоль
+        @note Отправляет событие booking_cancelled или booking_not_confirmed (services.events)
         """
         if not self.is_confirmed:
-            print("Booking is not confirmed yet.")
+            emit("booking_not_confirmed", booking_id=self.booking_id)
             return False
         self.is_confirmed = False
-        print(f"Booking {self.booking_id} cancelled.")
+        emit("booking_cancelled", booking_id=self.booking_id)
         return True
 
     def __str__(self) -> str:
@@ -69,6 +75,8 @@ class FlightBooking(Booking):
     при создании объекта.
     """
 
+    __slots__ = ("flight",)
+
     def __init__(self, person: Person, flight: Flight):
         """
         @brief Конструктор бронирования авиаперелёта
@@ -81,6 +89,17 @@ class FlightBooking(Booking):
         self.flight = flight
         self.is_confirmed = self.flight.book(person)
 
+    def cancel(self) -> bool:
+        """
+        @brief Отменяет бронирование перелёта
+        @return True, если бронирование было подтверждено и отменено; иначе False
+        @note При отмене место на рейсе освобождается (оплата не возвращается)
+        """
+        cancelled = super().cancel()
+        if cancelled:
+            self.flight.release_seat()
+        return cancelled
+
     def __str__(self) -> str:
         """
         @brief Строковое представление бронирования перелёта
@@ -95,18 +114,46 @@ class AccomodationBooking(Booking):
     @details Расширяет базовое бронирование, связывая его с объектом проживания.
     """
 
+    __slots__ = ("accommodation",)
+
     def __init__(self, person: Person, accommodation: Accomodation):
         """
         @brief Конструктор бронирования проживания
         @param person Клиент, бронирующий проживание
         @param accommodation Объект Accomodation для бронирования
-        @note Метод accommodation.book(person) вызывается только если бронирование уже подтверждено
-        (в текущей реализации — никогда, так как is_confirmed = False по умолчанию).
+        @note Даты проживания резервируются и оплачиваются при подтверждении (confirm())
         """
         super().__init__(person)
         self.accommodation = accommodation
+
+    def is_available(self) -> bool:
+        """
+        @brief Проверяет, свободно ли проживание на его даты
+        @return True, если даты (для хостела — койка на все ночи) ещё свободны
+        """
+        return self.accommodation.is_free()
+
+    def confirm(self) -> bool:
+        """
+        @brief Подтверждает бронирование, резервируя и оплачивая проживание
+        @return True, если проживание забронировано; False, если мест нет или не хватает средств
+        """
         if self.is_confirmed:
-            self.accommodation.book(person)
+            return True
+        if not self.accommodation.book(self.person.bank_account):
+            return False
+        return super().confirm()
+
+    def cancel(self) -> bool:
+        """
+        @brief Отменяет бронирование проживания
+        @return True, если бронирование было подтверждено и отменено; иначе False
+        @note При отмене даты (койка) освобождаются (оплата не возвращается)
+        """
+        cancelled = super().cancel()
+        if cancelled:
+            self.accommodation.release()
+        return cancelled
 
     def __str__(self) -> str:
         """
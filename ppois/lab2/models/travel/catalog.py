@@ -0,0 +1,510 @@
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .route_planner import RoutePlanner
+from .tour import EndAndStartDateError, Tour
+from .tourist_agency import TouristAgency
+from .transport import Transport
+
+
+ADDED = "added"
+"""
+@brief Константа: действие ленты изменений — объект добавлен в каталог
+"""
+
+CHANGED = "changed"
+"""
+@brief Константа: действие ленты изменений — объект каталога изменён на месте
+"""
+
+REMOVED = "removed"
+"""
+@brief Константа: действие ленты изменений — объект удалён из каталога
+"""
+
+_OPERATIONAL = ("seats", "bank_account")
+"""
+@brief Атрибуты транспорта, которые хранят состояние продаж и не приходят из фида
+"""
+
+_TOUR_FIELDS = ("base_cost", "start_date", "end_date", "destination", "commission_rate")
+"""
+@brief Атрибуты тура, которые сравниваются и переносятся при обновлении
+"""
+
+
+class CatalogItemNotFound(Exception):
+    """
+    @brief Исключение: в каталоге нет объекта с таким ключом
+    @details Выбрасывается при удалении или запросе тура либо транспорта по неизвестному ключу.
+    """
+    def __init__(self, entity: str, key: str):
+        """
+        @brief Конструктор исключения
+        @param entity Вид объекта ("tour" или "transport")
+        @param key Ключ объекта
+        """
+        super().__init__(f"No {entity} with key '{key}' in the catalog")
+
+
+class ChangeFeedGap(Exception):
+    """
+    @brief Исключение: запрошенные изменения уже вытеснены из ленты
+    @details Выбрасывается, если потребитель отстал больше, чем на ёмкость ленты;
+    такому потребителю нужна полная перезагрузка каталога.
+    """
+    def __init__(self, sequence: int, oldest: int):
+        """
+        @brief Конструктор исключения
+        @param sequence Номер последнего события, применённого потребителем
+        @param oldest Номер самого старого события в ленте
+        """
+        super().__init__(f"Changes after {sequence} are no longer available (oldest is {oldest})")
+
+
+class ChangeEvent:
+    """
+    @brief Событие ленты изменений каталога
+    @details Хранит порядковый номер, действие (added, changed, removed), вид объекта
+    ("tour" или "transport"), его ключ, сам объект и для изменений — имена изменённых полей.
+    """
+    __slots__ = ("sequence", "action", "entity", "key", "item", "fields")
+
+    def __init__(self, sequence: int, action: str, entity: str, key: str, item, fields: Tuple[str, ...] = ()):
+        """
+        @brief Конструктор события
+        @param sequence Порядковый номер события в ленте (начиная с 1)
+        @param action ADDED, CHANGED или REMOVED
+        @param entity "tour" или "transport"
+        @param key Ключ объекта в каталоге
+        @param item Объект Tour или Transport
+        @param fields Имена изменённых полей (для CHANGED)
+        """
+        self.sequence = sequence
+        self.action = action
+        self.entity = entity
+        self.key = key
+        self.item = item
+        self.fields = fields
+
+    def __repr__(self) -> str:
+        """
+        @brief Строковое представление события
+        @return Строка в формате: "#N changed tour KEY (поля)"
+        """
+        fields = f" ({', '.join(self.fields)})" if self.fields else ""
+        return f"#{self.sequence} {self.action} {self.entity} {self.key}{fields}"
+
+
+class ChangeFeed:
+    """
+    @brief Лента изменений каталога
+    @details Хранит последние capacity событий в кольцевом буфере. Потребители либо
+    подписываются на события (callback вызывается сразу при изменении), либо
+    периодически забирают дельту методом since() по номеру последнего применённого события.
+    """
+
+    def __init__(self, capacity: int = 100000):
+        """
+        @brief Конструктор пустой ленты
+        @param capacity Сколько последних событий хранить
+        """
+        self.__events: deque = deque(maxlen=capacity)
+        self.__sequence = 0
+        self.__subscribers: List[Callable[[ChangeEvent], None]] = []
+
+    def publish(self, action: str, entity: str, key: str, item, fields: Iterable[str] = ()) -> ChangeEvent:
+        """
+        @brief Записывает событие и уведомляет подписчиков
+        @param action ADDED, CHANGED или REMOVED
+        @param entity "tour" или "transport"
+        @param key Ключ объекта
+        @param item Объект Tour или Transport
+        @param fields Имена изменённых полей
+        @return Объект ChangeEvent
+        """
+        self.__sequence += 1
+        event = ChangeEvent(self.__sequence, action, entity, key, item, tuple(fields))
+        self.__events.append(event)
+        for callback in list(self.__subscribers):
+            callback(event)
+        return event
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None]):
+        """
+        @brief Подписывает функцию на новые события
+        @param callback Функция, принимающая ChangeEvent
+        """
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ChangeEvent], None]):
+        """
+        @brief Отменяет подписку
+        @param callback Ранее подписанная функция
+        @exception ValueError Если функция не подписана
+        """
+        self.__subscribers.remove(callback)
+
+    def last_sequence(self) -> int:
+        """
+        @brief Номер последнего события
+        @return Номер (0, если событий ещё не было)
+        """
+        return self.__sequence
+
+    def since(self, sequence: int) -> List[ChangeEvent]:
+        """
+        @brief Возвращает события после указанного номера
+        @param sequence Номер последнего события, уже применённого потребителем (0 — с начала)
+        @return Список событий в порядке возникновения
+        @exception ChangeFeedGap Если часть нужных событий уже вытеснена из буфера
+        """
+        if not self.__events or sequence >= self.__sequence:
+            return []
+        oldest = self.__events[0].sequence
+        if sequence < oldest - 1:
+            raise ChangeFeedGap(sequence, oldest)
+        start = sequence - oldest + 1
+        return [self.__events[position] for position in range(start, len(self.__events))]
+
+    def __len__(self) -> int:
+        """
+        @brief Количество событий в буфере
+        @return Число хранимых событий
+        """
+        return len(self.__events)
+
+
+def _transport_number(trans: Transport) -> Optional[str]:
+    """
+    @brief Возвращает номер рейса, поезда или автобуса
+    @param trans Объект Transport
+    @return Номер или None, если у транспорта нет номера
+    """
+    for name in ("flight_number", "train_number", "bus_number"):
+        number = getattr(trans, name, None)
+        if number is not None:
+            return number
+    return None
+
+
+def _transport_fields(trans: Transport) -> dict:
+    """
+    @brief Возвращает атрибуты транспорта, приходящие из фида
+    @param trans Объект Transport
+    @return Словарь атрибутов без мест и счёта перевозчика
+    """
+    return {name: value for name, value in vars(trans).items() if name not in _OPERATIONAL}
+
+
+def _signature(items: Iterable, attributes: Tuple[str, ...]) -> List[tuple]:
+    """
+    @brief Строит сравнимое описание списка компонентов тура
+    @param items Объекты проживания или услуги
+    @param attributes Атрибуты, по которым компоненты считаются одинаковыми
+    @return Список кортежей (класс, значения атрибутов)
+    """
+    return [(type(item),) + tuple(getattr(item, name) for name in attributes) for item in items]
+
+
+class TourCatalog:
+    """
+    @brief Каталог туров и транспорта с постоянными ключами
+    @details Позволяет применять ежедневные фиды поставщиков дельтами вместо перестройки
+    агентства. Каждый тур и транспорт хранится под ключом (для транспорта по умолчанию —
+    номер рейса, поезда или автобуса). upsert сравнивает пришедший объект с имеющимся:
+        - новый ключ — объект добавляется в агентство, индекс и планировщик маршрутов;
+        - без изменений — ничего не происходит;
+        - есть изменения — имеющийся объект обновляется на месте, поэтому ссылки на него
+          (бронирования, маршруты клиентов) остаются действительными.
+    Цены туров пересчитываются по разнице (Tour.refresh_transport, add_/remove_*), а
+    индекс каталога агентства и планировщик обновляются только для затронутых записей.
+    Обо всех изменениях публикуются события в ленту feed.
+    """
+
+    def __init__(self, agency: TouristAgency, planner: Optional[RoutePlanner] = None,
+                 feed: Optional[ChangeFeed] = None):
+        """
+        @brief Конструктор пустого каталога
+        @param agency Агентство, туры которого ведёт каталог
+        @param planner Планировщик маршрутов для транспорта каталога (необязательно)
+        @param feed Лента изменений (по умолчанию создаётся новая)
+        """
+        self.agency = agency
+        self.planner = planner
+        self.feed = ChangeFeed() if feed is None else feed
+        self.__tours: Dict[str, Tour] = {}
+        self.__transports: Dict[str, Transport] = {}
+        self.__transport_keys: Dict[int, str] = {}
+        self.__users: Dict[str, Set[str]] = {}
+
+    def tour(self, key: str) -> Tour:
+        """
+        @brief Возвращает тур по ключу
+        @param key Ключ тура
+        @return Объект Tour
+        @exception CatalogItemNotFound Если ключа нет в каталоге
+        """
+        if key not in self.__tours:
+            raise CatalogItemNotFound("tour", key)
+        return self.__tours[key]
+
+    def transport(self, key: str) -> Transport:
+        """
+        @brief Возвращает транспорт по ключу
+        @param key Ключ транспорта
+        @return Объект Transport
+        @exception CatalogItemNotFound Если ключа нет в каталоге
+        """
+        if key not in self.__transports:
+            raise CatalogItemNotFound("transport", key)
+        return self.__transports[key]
+
+    def tour_keys(self) -> List[str]:
+        """
+        @brief Ключи туров каталога
+        @return Список ключей
+        """
+        return list(self.__tours)
+
+    def transport_keys(self) -> List[str]:
+        """
+        @brief Ключи транспорта каталога
+        @return Список ключей
+        """
+        return list(self.__transports)
+
+    def __reindex(self, tour: Tour):
+        """
+        @brief Обновляет записи тура в индексе и ценовых колонках агентства
+        @param tour Объект Tour
+        """
+        self.agency.refresh_tour(tour)
+
+    def __tours_using(self, key: str) -> List[Tuple[str, Tour]]:
+        """
+        @brief Находит туры, в которые входит транспорт
+        @param key Ключ транспорта
+        @return Список пар (ключ тура, тур)
+        """
+        return [(tour_key, self.__tours[tour_key]) for tour_key in sorted(self.__users.get(key, ()))]
+
+    def __changed_tour(self, key: str, tour: Tour, old_price: float, fields: List[str]):
+        """
+        @brief Переиндексирует изменённый тур и публикует событие
+        @param key Ключ тура
+        @param tour Объект Tour
+        @param old_price Цена тура до изменения
+        @param fields Имена изменённых полей (без цены)
+        """
+        if tour.price != old_price:
+            fields.append("price")
+        self.__reindex(tour)
+        self.feed.publish(CHANGED, "tour", key, tour, fields)
+
+    def upsert_transport(self, trans: Transport, key: Optional[str] = None) -> Transport:
+        """
+        @brief Добавляет или обновляет транспорт
+        @details При изменении расписания или тарифа атрибуты переносятся в имеющийся объект,
+        места и счёт перевозчика сохраняются, а стоимость транспорта в турах пересчитывается
+        по разнице. Если сменился вид транспорта, объект заменяется во всех турах.
+        @param trans Объект Transport из фида
+        @param key Ключ транспорта (по умолчанию номер рейса, поезда или автобуса)
+        @return Объект транспорта, который хранится в каталоге
+        @exception ValueError Если ключ не задан и у транспорта нет номера
+        """
+        key = _transport_number(trans) if key is None else key
+        if key is None:
+            raise ValueError("transport key is required")
+        current = self.__transports.get(key)
+        if current is None:
+            self.__transports[key] = trans
+            self.__transport_keys[id(trans)] = key
+            if self.planner is not None:
+                self.planner.add(trans)
+            self.feed.publish(ADDED, "transport", key, trans)
+            return trans
+        if current is trans:
+            return current
+
+        fields = _transport_fields(trans)
+        previous = _transport_fields(current)
+        if type(current) is type(trans) and fields == previous:
+            return current
+        users = self.__tours_using(key)
+        prices = [tour.price for _, tour in users]
+        if self.planner is not None and current in self.planner:
+            self.planner.remove(current)
+        if type(current) is type(trans):
+            changed = sorted(name for name in fields.keys() | previous.keys()
+                             if fields.get(name) != previous.get(name))
+            for name in changed:
+                setattr(current, name, fields[name])
+            for _, tour in users:
+                tour.refresh_transport(current)
+        else:
+            changed = ["type"]
+            del self.__transport_keys[id(current)]
+            for _, tour in users:
+                tour.remove_transport(current)
+                tour.add_transport(trans)
+            self.__transports[key] = current = trans
+            self.__transport_keys[id(trans)] = key
+        if self.planner is not None:
+            self.planner.add(current)
+        self.feed.publish(CHANGED, "transport", key, current, changed)
+        for (tour_key, tour), price in zip(users, prices):
+            self.__changed_tour(tour_key, tour, price, ["transports"])
+        return current
+
+    def delete_transport(self, key: str):
+        """
+        @brief Удаляет транспорт из каталога и из всех туров, в которые он входит
+        @param key Ключ транспорта
+        @exception CatalogItemNotFound Если ключа нет в каталоге
+        """
+        trans = self.transport(key)
+        for tour_key, tour in self.__tours_using(key):
+            price = tour.price
+            tour.remove_transport(trans)
+            self.__changed_tour(tour_key, tour, price, ["transports"])
+        self.__users.pop(key, None)
+        del self.__transports[key]
+        del self.__transport_keys[id(trans)]
+        if self.planner is not None and trans in self.planner:
+            self.planner.remove(trans)
+        self.feed.publish(REMOVED, "transport", key, trans)
+
+    def __register_transports(self, tour: Tour) -> List[Transport]:
+        """
+        @brief Заменяет транспорт тура объектами каталога
+        @param tour Объект Tour из фида
+        @return Список транспорта каталога в порядке тура
+        """
+        return [self.upsert_transport(trans, self.__transport_keys.get(id(trans))) for trans in tour.transports]
+
+    def __link(self, key: str, transports: Iterable[Transport], linked: bool):
+        """
+        @brief Обновляет обратные ссылки «транспорт — туры»
+        @param key Ключ тура
+        @param transports Транспорт тура
+        @param linked True — добавить ссылки, False — снять
+        """
+        for trans in transports:
+            transport_key = self.__transport_keys.get(id(trans))
+            if transport_key is None:
+                continue
+            if linked:
+                self.__users.setdefault(transport_key, set()).add(key)
+            else:
+                self.__users.get(transport_key, set()).discard(key)
+
+    @staticmethod
+    def __replace_transports(tour: Tour, transports: List[Transport]):
+        """
+        @brief Заменяет весь транспорт тура с пересчётом цены по разнице
+        @param tour Объект Tour
+        @param transports Новый список транспорта
+        """
+        for trans in list(tour.transports):
+            tour.remove_transport(trans)
+        for trans in transports:
+            tour.add_transport(trans)
+
+    def upsert_tour(self, key: str, tour: Tour) -> Tour:
+        """
+        @brief Добавляет или обновляет тур
+        @details Транспорт тура сначала регистрируется через upsert_transport(). Для уже
+        известного ключа изменения переносятся в имеющийся тур: поля из _TOUR_FIELDS
+        копируются, а транспорт, проживание и услуги заменяются только если их состав
+        изменился (проживание и услуги сравниваются по виду, датам, месту и цене).
+        Топливная надбавка, бронирования и достопримечательности имеющегося тура сохраняются.
+        @param key Ключ тура
+        @param tour Объект Tour из фида
+        @return Объект тура, который хранится в каталоге
+        """
+        transports = self.__register_transports(tour)
+        current = self.__tours.get(key)
+        if current is None:
+            if [id(trans) for trans in tour.transports] != [id(trans) for trans in transports]:
+                self.__replace_transports(tour, transports)
+            self.__tours[key] = tour
+            self.__link(key, tour.transports, True)
+            self.agency.add_tour(tour)
+            self.feed.publish(ADDED, "tour", key, tour)
+            return tour
+        if current is tour:
+            return current
+
+        price = current.price
+        fields = [name for name in _TOUR_FIELDS if getattr(current, name) != getattr(tour, name)]
+        if "start_date" in fields or "end_date" in fields:
+            if tour.end_date <= tour.start_date:
+                raise EndAndStartDateError()
+        for name in fields:
+            setattr(current, name, getattr(tour, name))
+        if [id(trans) for trans in current.transports] != [id(trans) for trans in transports]:
+            self.__link(key, current.transports, False)
+            self.__replace_transports(current, transports)
+            self.__link(key, current.transports, True)
+            fields.append("transports")
+        attributes = ("start_date", "end_date", "location", "price")
+        if _signature(current.accommodations, attributes) != _signature(tour.accommodations, attributes):
+            for accommodation in list(current.accommodations):
+                current.remove_accommodation(accommodation)
+            for accommodation in tour.accommodations:
+                current.add_accommodation(accommodation)
+            fields.append("accommodations")
+        if _signature(current.services, ("name", "price")) != _signature(tour.services, ("name", "price")):
+            for service in list(current.services):
+                current.remove_service(service)
+            for service in tour.services:
+                current.add_service(service)
+            fields.append("services")
+        if not fields:
+            return current
+        current.set_commission_rate(current.commission_rate)
+        self.__changed_tour(key, current, price, fields)
+        return current
+
+    def delete_tour(self, key: str):
+        """
+        @brief Снимает тур с продажи и удаляет его из каталога
+        @param key Ключ тура
+        @exception CatalogItemNotFound Если ключа нет в каталоге
+        @note Транспорт тура остаётся в каталоге под своими ключами
+        """
+        tour = self.tour(key)
+        self.__link(key, tour.transports, False)
+        del self.__tours[key]
+        self.agency.remove_tour(tour)
+        self.feed.publish(REMOVED, "tour", key, tour)
+
+    def sync(self, tours: Dict[str, Tour], transports: Iterable[Transport] = (),
+             prune: bool = True) -> Tuple[int, int]:
+        """
+        @brief Применяет полный дневной фид как дельту
+        @details Все переданные объекты проходят через upsert; при prune туры и транспорт,
+        которых нет в фиде, удаляются. Неизменившиеся объекты событий не порождают.
+        @param tours Словарь {ключ тура: Tour}
+        @param transports Транспорт фида (ключ — номер); транспорт туров учитывается автоматически
+        @param prune True — удалить объекты, отсутствующие в фиде
+        @return Кортеж (номер первого события этой синхронизации, номер последнего);
+        если изменений нет, первый номер больше последнего
+        """
+        first = self.feed.last_sequence() + 1
+        seen = {id(self.upsert_transport(trans)) for trans in transports}
+        for key, tour in tours.items():
+            seen.update(id(trans) for trans in self.upsert_tour(key, tour).transports)
+        if prune:
+            for key in [key for key in self.__tours if key not in tours]:
+                self.delete_tour(key)
+            for key in [key for key, trans in self.__transports.items() if id(trans) not in seen]:
+                self.delete_transport(key)
+        return first, self.feed.last_sequence()
+
+    def __len__(self) -> int:
+        """
+        @brief Количество туров в каталоге
+        @return Число туров
+        """
+        return len(self.__tours)
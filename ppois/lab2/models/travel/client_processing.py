@@ -0,0 +1,174 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Set
+from models.people.person import Person
+from .tourist_agency import TouristAgency, WorkWithClient
+
+
+class ClientOutcome:
+    """
+    @brief Результат обслуживания одного клиента
+    @details Хранит клиента, признак успеха, исключение (если обслуживание не удалось)
+    и время обработки.
+    """
+
+    __slots__ = ("client", "succeeded", "error", "latency")
+
+    def __init__(self, client: Person, succeeded: bool, error: Optional[Exception], latency: float):
+        """
+        @brief Конструктор результата
+        @param client Клиент
+        @param succeeded True, если WorkWithClient завершился без ошибки
+        @param error Исключение WorkWithClientFailed (или None)
+        @param latency Время обработки в секундах
+        """
+        self.client = client
+        self.succeeded = succeeded
+        self.error = error
+        self.latency = latency
+
+    def __str__(self) -> str:
+        """
+        @brief Строковое представление результата
+        @return Строка в формате: "Имя: ok, X.X ms" или "Имя: failed (ошибка), X.X ms"
+        """
+        status = "ok" if self.succeeded else f"failed ({self.error})"
+        return f"{self.client.passport.name}: {status}, {self.latency * 1000:.1f} ms"
+
+
+class ProcessingReport:
+    """
+    @brief Отчёт о пакетном обслуживании клиентов
+    @details Содержит результаты по каждому клиенту в порядке поступления и общее время;
+    рассчитывает пропускную способность и перцентили задержки.
+    """
+
+    def __init__(self, outcomes: List[ClientOutcome], elapsed: float):
+        """
+        @brief Конструктор отчёта
+        @param outcomes Результаты по клиентам в порядке поступления
+        @param elapsed Общее время обработки в секундах
+        """
+        self.outcomes = outcomes
+        self.elapsed = elapsed
+        self.__latencies = sorted(outcome.latency for outcome in outcomes)
+
+    def __len__(self) -> int:
+        """
+        @brief Количество обслуженных клиентов
+        @return Число результатов
+        """
+        return len(self.outcomes)
+
+    def succeeded(self) -> List[ClientOutcome]:
+        """
+        @brief Возвращает успешные результаты
+        @return Список ClientOutcome с succeeded = True
+        """
+        return [outcome for outcome in self.outcomes if outcome.succeeded]
+
+    def failed(self) -> List[ClientOutcome]:
+        """
+        @brief Возвращает неудачные результаты
+        @return Список ClientOutcome с succeeded = False
+        """
+        return [outcome for outcome in self.outcomes if not outcome.succeeded]
+
+    def throughput(self) -> float:
+        """
+        @brief Пропускная способность
+        @return Клиентов в секунду (0.0 для пустого отчёта)
+        """
+        return len(self.outcomes) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        @brief Перцентиль времени обработки (метод ближайшего ранга)
+        @param percent Перцентиль от 0 до 100 (например, 50, 95, 99)
+        @return Время в секундах (0.0 для пустого отчёта)
+        """
+        if not self.__latencies:
+            return 0.0
+        rank = max(1, -(-len(self.__latencies) * percent // 100))
+        return self.__latencies[int(rank) - 1]
+
+    def summary(self) -> Dict[str, float]:
+        """
+        @brief Сводка отчёта
+        @return Словарь с ключами clients, succeeded, failed, throughput, p50, p95, p99 (задержки в секундах)
+        """
+        succeeded = len(self.succeeded())
+        return {
+            "clients": len(self.outcomes),
+            "succeeded": succeeded,
+            "failed": len(self.outcomes) - succeeded,
+            "throughput": self.throughput(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+    def __str__(self) -> str:
+        """
+        @brief Строковое представление отчёта
+        @return Строка в формате: "N clients (K failed), X.X clients/s, p50 A ms, p95 B ms, p99 C ms"
+        """
+        summary = self.summary()
+        return (f"{summary['clients']} clients ({summary['failed']} failed), "
+                f"{summary['throughput']:.1f} clients/s, "
+                f"p50 {summary['p50'] * 1000:.1f} ms, p95 {summary['p95'] * 1000:.1f} ms, "
+                f"p99 {summary['p99'] * 1000:.1f} ms")
+
+
+class ClientProcessingEngine:
+    """
+    @brief Пул потоков для одновременного обслуживания клиентов агентства
+    @details Для каждого клиента из входного потока выполняет WorkWithClient в пуле потоков.
+    Одновременно в работе держится не больше max_pending клиентов, поэтому поток клиентов
+    может быть сколь угодно длинным (например, генератором). Общие объекты защищены
+    собственными блокировками: счета — BankAccount.lock и Ledger, сотрудники — Employee.lock.
+    """
+
+    def __init__(self, agency: TouristAgency, workers: int = 8, max_pending: Optional[int] = None):
+        """
+        @brief Конструктор движка
+        @param agency Туристическое агентство
+        @param workers Количество потоков (по умолчанию 8)
+        @param max_pending Предел клиентов в работе (по умолчанию workers * 4)
+        """
+        self.agency = agency
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+
+    def __serve(self, client: Person) -> ClientOutcome:
+        """
+        @brief Обслуживает одного клиента (выполняется в потоке пула)
+        @param client Клиент
+        @return Объект ClientOutcome
+        """
+        started = time.perf_counter()
+        try:
+            WorkWithClient(self.agency, client)
+        except Exception as error:
+            return ClientOutcome(client, False, error, time.perf_counter() - started)
+        return ClientOutcome(client, True, None, time.perf_counter() - started)
+
+    def process(self, clients: Iterable[Person]) -> ProcessingReport:
+        """
+        @brief Обслуживает поток клиентов
+        @param clients Клиенты (список или генератор)
+        @return Объект ProcessingReport с результатами в порядке поступления
+        """
+        outcomes: List[Optional[ClientOutcome]] = []
+        pending: Set[Future] = set()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for client in clients:
+                if len(pending) >= self.max_pending:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                position = len(outcomes)
+                outcomes.append(None)
+                future = executor.submit(self.__serve, client)
+                future.add_done_callback(lambda done, position=position: outcomes.__setitem__(position, done.result()))
+                pending.add(future)
+        return ProcessingReport(outcomes, time.perf_counter() - started)
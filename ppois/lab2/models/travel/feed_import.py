@@ -0,0 +1,413 @@
+import csv
+import json
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from services.bank_account import BankAccount
+from .accomodation import Accomodation, Apartment, Hostel, Hotel, StartAndEndDateError, AccomodationNotFoundOrExpired
+from .availability import AccommodationInventory
+from .geography import GEO_REGISTRY, City, GeoRegistry
+from .route_planner import RoutePlanner
+from .tour import EndAndStartDateError, Tour
+from .tourist_agency import TouristAgency
+from .transport import Bus, Flight, Train, Transport
+
+
+FEED_CHUNK_SIZE = 10000
+"""
+@brief Константа: количество строк фида, после которого накопленные объекты загружаются пачкой
+"""
+
+_REQUIRED = object()
+
+
+class FeedRowError(Exception):
+    """
+    @brief Исключение: строка фида не может быть импортирована
+    @details Выбрасывается (или попадает в отчёт импорта) при отсутствии обязательного поля,
+    неверном формате значения, неизвестной ссылке или ошибке проверки в конструкторе модели.
+    """
+    def __init__(self, line: int, message: str):
+        """
+        @brief Конструктор исключения
+        @param line Номер строки в файле фида
+        @param message Описание ошибки
+        """
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+class ImportReport:
+    """
+    @brief Отчёт об импорте фида
+    @details Считает прочитанные строки, импортированные объекты по типам и ошибки.
+    Хранится не больше max_errors первых ошибок, счётчик ошибок ведётся всегда.
+    """
+
+    def __init__(self, max_errors: int = 1000):
+        """
+        @brief Конструктор пустого отчёта
+        @param max_errors Сколько первых ошибок сохранять в errors
+        """
+        self.max_errors = max_errors
+        self.rows = 0
+        self.imported: Dict[str, int] = {}
+        self.errors: List[FeedRowError] = []
+        self.error_count = 0
+        self.elapsed = 0.0
+
+    def add_error(self, error: FeedRowError):
+        """
+        @brief Регистрирует ошибку строки
+        @param error Объект FeedRowError
+        """
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(error)
+
+    def total(self) -> int:
+        """
+        @brief Количество импортированных объектов
+        @return Сумма по всем типам
+        """
+        return sum(self.imported.values())
+
+    def __str__(self) -> str:
+        """
+        @brief Строковое представление отчёта
+        @return Строка в формате: "N rows, M imported (тип: K, ...), E errors, X.X s"
+        """
+        kinds = ", ".join(f"{kind}: {count}" for kind, count in sorted(self.imported.items()))
+        return f"{self.rows} rows, {self.total()} imported ({kinds}), {self.error_count} errors, {self.elapsed:.1f} s"
+
+
+class FeedKeys:
+    """
+    @brief Хранилище ключей импортированных объектов
+    @details Связывает ключи фида с транспортом, жильём и счетами владельцев, чтобы туры
+    могли ссылаться на объекты, загруженные раньше. Хранилище держит ссылки на все
+    запомненные объекты, пока его не очистят или не удалят.
+    """
+
+    def __init__(self):
+        """
+        @brief Конструктор пустого хранилища
+        """
+        self.transports: Dict[str, Transport] = {}
+        self.accommodations: Dict[str, Accomodation] = {}
+        self.accounts: Dict[str, BankAccount] = {}
+
+    def clear(self):
+        """
+        @brief Забывает все запомненные ключи
+        """
+        self.transports.clear()
+        self.accommodations.clear()
+        self.accounts.clear()
+
+
+class FeedImporter:
+    """
+    @brief Потоковый импорт фидов поставщиков (CSV и JSON Lines)
+    @details Файл читается построчно генератором, поэтому память не зависит от его размера.
+    Каждая строка описывает один объект; тип задаётся полем "type" или параметром kind:
+        - flight, train, bus: from_city, from_country, from_code, to_city, to_country, to_code,
+          departure, arrival (ISO 8601), price, number, class_type (перелёт, поезд),
+          company (автобус), seats, account;
+        - hotel, hostel, apartment: city, country, code, check_in, check_out, price_per_night,
+          account, stars (отель), persons_for_room и rooms (хостел), bedrooms (апартаменты);
+        - tour: city, country, code, start, end, base_cost, commission, transports и
+          accommodations (ключи ранее импортированных объектов через ";" или списком JSON).
+    Транспорт и жильё запоминаются по полю key (для транспорта по умолчанию — number),
+    чтобы туры могли на них ссылаться. По умолчанию ключи видны только в пределах одного
+    вызова import_rows() (одного файла) и отпускаются после него; чтобы туры одного файла
+    ссылались на транспорт или жильё из другого, передайте общее хранилище FeedKeys. Страны, города и счета интернируются. Даты
+    проверяются конструкторами моделей; для транспорта дополнительно требуется, чтобы
+    прибытие было позже отправления. Объекты загружаются пачками по chunk_size строк:
+    туры — в агентство (TouristAgency.add_tours), транспорт — в планировщик маршрутов,
+    жильё — в инвентарь, если они переданы.
+    """
+
+    def __init__(self, agency: TouristAgency, planner: Optional[RoutePlanner] = None,
+                 inventory: Optional[AccommodationInventory] = None, registry: GeoRegistry = None,
+                 chunk_size: int = FEED_CHUNK_SIZE, progress: Optional[Callable[[ImportReport], None]] = None,
+                 strict: bool = False, max_errors: int = 1000, keys: Optional[FeedKeys] = None):
+        """
+        @brief Конструктор импортёра
+        @param agency Агентство, в которое загружаются туры
+        @param planner Планировщик маршрутов для импортированного транспорта (необязательно)
+        @param inventory Инвентарь для импортированного жилья (необязательно)
+        @param registry Реестр географии (по умолчанию GEO_REGISTRY)
+        @param chunk_size Количество строк в одной пачке загрузки
+        @param progress Функция, вызываемая с отчётом после каждой пачки
+        @param strict True — прервать импорт на первой ошибке (FeedRowError)
+        @param max_errors Сколько первых ошибок сохранять в отчёте
+        @param keys Хранилище ключей, общее для нескольких файлов (по умолчанию ключи
+        живут в пределах одного вызова import_rows())
+        """
+        self.agency = agency
+        self.planner = planner
+        self.inventory = inventory
+        self.registry = GEO_REGISTRY if registry is None else registry
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.strict = strict
+        self.max_errors = max_errors
+        self.keys = keys
+        self.__scope = FeedKeys() if keys is None else keys
+        self.__parsers = {
+            "flight": self.__transport, "train": self.__transport, "bus": self.__transport,
+            "hotel": self.__accommodation, "hostel": self.__accommodation, "apartment": self.__accommodation,
+            "tour": self.__tour,
+        }
+
+    @staticmethod
+    def read_rows(path: str, feed_format: Optional[str] = None) -> Iterator[Tuple[int, dict]]:
+        """
+        @brief Лениво читает строки фида
+        @param path Путь к файлу
+        @param feed_format "csv" или "jsonl" (по умолчанию — по расширению файла)
+        @return Генератор пар (номер строки, словарь полей); пустые строки JSONL пропускаются
+        @exception ValueError Если формат не поддерживается
+        """
+        feed_format = feed_format or path.rsplit(".", 1)[-1].lower()
+        with open(path, newline="", encoding="utf-8") as file:
+            if feed_format == "csv":
+                reader = csv.DictReader(file)
+                for row in reader:
+                    yield reader.line_num, row
+            elif feed_format in ("jsonl", "ndjson"):
+                for line, text in enumerate(file, 1):
+                    if text.strip():
+                        try:
+                            yield line, json.loads(text)
+                        except ValueError:
+                            yield line, None
+            else:
+                raise ValueError(f"unsupported feed format: {feed_format}")
+
+    @staticmethod
+    def __field(row: dict, name: str, convert: Callable = str, default=_REQUIRED):
+        """
+        @brief Читает и преобразует поле строки
+        @param row Поля строки
+        @param name Имя поля
+        @param convert Функция преобразования (str, float, int, date.fromisoformat...)
+        @param default Значение для отсутствующего или пустого поля (по умолчанию поле обязательно)
+        @return Преобразованное значение
+        @exception ValueError Если обязательное поле отсутствует или значение не преобразуется
+        """
+        value = row.get(name)
+        if value is None or value == "":
+            if default is _REQUIRED:
+                raise ValueError(f"missing field '{name}'")
+            return default
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid value for '{name}': {value!r}") from None
+
+    @staticmethod
+    def __keys(value) -> List[str]:
+        """
+        @brief Разбирает список ключей
+        @param value Строка "k1;k2" или список JSON
+        @return Список ключей
+        """
+        if value is None or value == "":
+            return []
+        if isinstance(value, list):
+            return [str(key) for key in value]
+        return [key.strip() for key in str(value).split(";") if key.strip()]
+
+    def __city(self, row: dict, prefix: str = "") -> City:
+        """
+        @brief Интернирует город строки
+        @param row Поля строки
+        @param prefix Префикс полей ("from_", "to_" или пустой)
+        @return Канонический объект City
+        """
+        country = self.registry.country(self.__field(row, prefix + "country"), self.__field(row, prefix + "code"))
+        return self.registry.city(self.__field(row, prefix + "city"), country)
+
+    def __account(self, row: dict) -> Optional[BankAccount]:
+        """
+        @brief Интернирует счёт владельца по полю account
+        @param row Поля строки
+        @return Общий объект BankAccount с нулевым балансом или None
+        """
+        account_id = self.__field(row, "account", str, None)
+        if account_id is None:
+            return None
+        account = self.__scope.accounts.get(account_id)
+        if account is None:
+            account = self.__scope.accounts[account_id] = BankAccount(0.0, account_id)
+        return account
+
+    def __transport(self, kind: str, row: dict) -> Transport:
+        """
+        @brief Создаёт перелёт, поезд или автобус из строки
+        @param kind "flight", "train" или "bus"
+        @param row Поля строки
+        @return Объект Transport (запоминается по key или number)
+        """
+        start, end = self.__city(row, "from_"), self.__city(row, "to_")
+        departure = self.__field(row, "departure", datetime.fromisoformat)
+        arrival = self.__field(row, "arrival", datetime.fromisoformat)
+        if arrival <= departure:
+            raise ValueError("arrival must be after departure")
+        price = self.__field(row, "price", float)
+        number = self.__field(row, "number")
+        seats = self.__field(row, "seats", int, None)
+        if kind == "flight":
+            trans = Flight(start, end, departure, arrival, price, number, self.__field(row, "class_type", int, 1), seats)
+        elif kind == "train":
+            trans = Train(start, end, departure, arrival, price, number, self.__field(row, "class_type", int, 1), seats)
+        else:
+            trans = Bus(start, end, departure, arrival, price, number, self.__field(row, "company", int, 0), seats)
+        account = self.__account(row)
+        if account is not None:
+            trans.bank_account = account
+        self.__scope.transports[self.__field(row, "key", str, number)] = trans
+        return trans
+
+    def __accommodation(self, kind: str, row: dict) -> Accomodation:
+        """
+        @brief Создаёт отель, хостел или апартаменты из строки
+        @param kind "hotel", "hostel" или "apartment"
+        @param row Поля строки
+        @return Объект Accomodation (запоминается по key, если он задан)
+        """
+        arguments = (self.__field(row, "check_in", date.fromisoformat),
+                     self.__field(row, "check_out", date.fromisoformat),
+                     self.__city(row), self.__field(row, "price_per_night", float), self.__account(row))
+        if kind == "hotel":
+            accommodation = Hotel(*arguments, stars=self.__field(row, "stars", int, 1))
+        elif kind == "hostel":
+            accommodation = Hostel(*arguments, persons_for_room=self.__field(row, "persons_for_room", int, 2),
+                                   rooms=self.__field(row, "rooms", int, 1))
+        else:
+            accommodation = Apartment(*arguments, bedrooms=self.__field(row, "bedrooms", int, 1))
+        key = self.__field(row, "key", str, None)
+        if key is not None:
+            self.__scope.accommodations[key] = accommodation
+        return accommodation
+
+    def __tour(self, kind: str, row: dict) -> Tour:
+        """
+        @brief Создаёт тур из строки
+        @param kind "tour"
+        @param row Поля строки
+        @return Объект Tour
+        @exception ValueError Если тур ссылается на неизвестный транспорт или жильё
+        """
+        transports, accommodations = [], []
+        for key in self.__keys(row.get("transports")):
+            if key not in self.__scope.transports:
+                raise ValueError(f"unknown transport '{key}'")
+            transports.append(self.__scope.transports[key])
+        for key in self.__keys(row.get("accommodations")):
+            if key not in self.__scope.accommodations:
+                raise ValueError(f"unknown accommodation '{key}'")
+            accommodations.append(self.__scope.accommodations[key])
+        return Tour(self.__field(row, "base_cost", float), self.__field(row, "start", date.fromisoformat),
+                    self.__field(row, "end", date.fromisoformat), self.__city(row),
+                    self.__field(row, "commission", float, 0.05), accommodations, transports)
+
+    def parse(self, line: int, row: Optional[dict], kind: Optional[str] = None):
+        """
+        @brief Создаёт объект модели из одной строки фида
+        @param line Номер строки (для сообщения об ошибке)
+        @param row Поля строки (None — строка не разобрана)
+        @param kind Тип объектов фида (если в строке нет поля "type")
+        @return Объект Transport, Accomodation или Tour
+        @exception FeedRowError Если строку нельзя импортировать
+        """
+        if not isinstance(row, dict):
+            raise FeedRowError(line, "malformed row")
+        row_kind = str(row.get("type") or kind or "").lower()
+        parser = self.__parsers.get(row_kind)
+        if parser is None:
+            raise FeedRowError(line, f"unknown row type '{row_kind}'")
+        try:
+            return parser(row_kind, row)
+        except (ValueError, EndAndStartDateError, StartAndEndDateError, AccomodationNotFoundOrExpired) as error:
+            raise FeedRowError(line, str(error)) from None
+
+    def __flush(self, tours: List[Tour], transports: List[Transport], accommodations: List[Accomodation],
+                report: ImportReport):
+        """
+        @brief Загружает накопленную пачку объектов и сообщает о прогрессе
+        @param tours Новые туры
+        @param transports Новый транспорт
+        @param accommodations Новое жильё
+        @param report Текущий отчёт
+        """
+        self.agency.add_tours(tours)
+        if self.planner is not None:
+            self.planner.add_many(transports)
+        if self.inventory is not None:
+            for accommodation in accommodations:
+                self.inventory.add(accommodation)
+        tours.clear()
+        transports.clear()
+        accommodations.clear()
+        if self.progress is not None:
+            self.progress(report)
+
+    def import_rows(self, rows: Iterable[Tuple[int, Optional[dict]]], kind: Optional[str] = None) -> ImportReport:
+        """
+        @brief Импортирует поток строк
+        @param rows Пары (номер строки, поля), например из read_rows()
+        @param kind Тип объектов, если в строках нет поля "type"
+        @return Объект ImportReport
+        @exception FeedRowError В строгом режиме — на первой ошибочной строке
+        (уже загруженные пачки остаются в агентстве)
+        @note Без общего хранилища keys ключи, запомненные за вызов, отпускаются после него
+        """
+        if self.keys is None:
+            self.__scope = FeedKeys()
+        try:
+            report = ImportReport(self.max_errors)
+            started = time.perf_counter()
+            tours: List[Tour] = []
+            transports: List[Transport] = []
+            accommodations: List[Accomodation] = []
+            for line, row in rows:
+                report.rows += 1
+                try:
+                    obj = self.parse(line, row, kind)
+                except FeedRowError as error:
+                    if self.strict:
+                        raise
+                    report.add_error(error)
+                else:
+                    if isinstance(obj, Tour):
+                        tours.append(obj)
+                        category = "tour"
+                    elif isinstance(obj, Transport):
+                        transports.append(obj)
+                        category = type(obj).__name__.lower()
+                    else:
+                        accommodations.append(obj)
+                        category = type(obj).__name__.lower()
+                    report.imported[category] = report.imported.get(category, 0) + 1
+                if report.rows % self.chunk_size == 0:
+                    report.elapsed = time.perf_counter() - started
+                    self.__flush(tours, transports, accommodations, report)
+            report.elapsed = time.perf_counter() - started
+            self.__flush(tours, transports, accommodations, report)
+            return report
+        finally:
+            if self.keys is None:
+                self.__scope = FeedKeys()
+
+    def import_file(self, path: str, kind: Optional[str] = None, feed_format: Optional[str] = None) -> ImportReport:
+        """
+        @brief Импортирует файл фида
+        @param path Путь к файлу CSV или JSON Lines
+        @param kind Тип объектов, если в строках нет поля "type" (например, "flight")
+        @param feed_format "csv" или "jsonl" (по умолчанию — по расширению)
+        @return Объект ImportReport
+        """
+        return self.import_rows(self.read_rows(path, feed_format), kind)
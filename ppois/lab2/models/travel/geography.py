@@ -1,22 +1,38 @@
 from datetime import date
+from itertools import count
+from threading import RLock
+from typing import Dict, Set, Tuple, Union
+from services.events import emit
+
+_GEO_IDS = count()
+"""
+@brief Общая для процесса последовательность geo_id
+@details Реестры берут номера из одной последовательности, поэтому объекты разных
+реестров никогда не получают одинаковый geo_id и не считаются равными.
+"""
+
 
 class Country:
     """
     @brief Представляет страну в системе туризма
     @details Хранит название, уникальный код (например, ISO) и информацию о необходимости визы.
     Код страны инкапсулирован и доступен только через метод get_code().
+    Каждая страна получает в реестре GeoRegistry целочисленный geo_id по коду:
+    страны с одинаковым кодом равны, сравнение и хеширование — по geo_id.
     """
     
-    def __init__(self, name: str, code: str, visa_required: bool = True):
+    def __init__(self, name: str, code: str, visa_required: bool = True, registry: 'GeoRegistry' = None):
         """
         @brief Конструктор класса Country
         @param name Название страны (например, "France")
         @param code Уникальный код страны (например, "FR" по ISO 3166)
         @param visa_required Флаг: требуется ли виза для въезда (по умолчанию True)
+        @param registry Реестр, выдающий geo_id (по умолчанию GEO_REGISTRY)
         """
         self.name = name
         self.__code = code
         self.visa_required = visa_required
+        self.geo_id = (GEO_REGISTRY if registry is None else registry).register_country(self)
 
     def get_code(self) -> str:
         """
@@ -29,23 +45,38 @@ class Country:
         """
         @brief Сравнивает текущую страну с другой
         @param other Объект для сравнения
-        @return True, если оба объекта — Country и совпадают название и код; иначе False
+        @return True, если оба объекта — Country с одним geo_id (одинаковым кодом); иначе False
+        """
+        return self == other
+
+    def __eq__(self, other) -> bool:
+        """
+        @brief Проверяет равенство стран по geo_id
+        @param other Объект для сравнения
+        @return True, если other — Country с тем же geo_id
         """
         if isinstance(other, Country):
-            return self.__code == other.get_code() and self.name == other.name
-        return False
+            return self.geo_id == other.geo_id
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        """
+        @brief Хеш страны
+        @return geo_id страны
+        """
+        return self.geo_id
     
-    def __getattribute__(self, name):
+    def __getattr__(self, name):
         """
-        @brief Переопределённый метод доступа к атрибутам
-        @details Перехватывает попытки доступа к несуществующим атрибутам.
+        @brief Обработка обращения к несуществующему атрибуту
+        @details Вызывается интерпретатором только при промахе, поэтому обычное
+        чтение атрибутов не проходит через Python-обёртку.
         @param name Имя запрашиваемого атрибута
-        @exception AttributeError Если атрибут не найден
+        @exception AttributeError Всегда (атрибут не найден)
+        @note Отправляет событие attribute_missing (services.events)
         """
-        try:
-            return object.__getattribute__(self, name)
-        except AttributeError:
-            raise AttributeError(f"attribute {name} not found")
+        emit("attribute_missing", name=name)
+        raise AttributeError(f"attribute {name} not found")
     
     def __str__(self):
         """
@@ -59,25 +90,47 @@ class City:
     """
     @brief Представляет город, привязанный к стране
     @details Город не может существовать без страны. Используется для локализации туров, отелей и достопримечательностей.
+    Город получает в реестре GeoRegistry целочисленный geo_id по паре (страна, название):
+    сравнение и хеширование городов — по geo_id.
     """
+
+    __slots__ = ("name", "country", "geo_id")
     
-    def __init__(self, name: str, country: Country):
+    def __init__(self, name: str, country: Country, registry: 'GeoRegistry' = None):
         """
         @brief Конструктор класса City
         @param name Название города (например, "Paris")
         @param country Объект Country, к которому принадлежит город
+        @param registry Реестр, выдающий geo_id (по умолчанию GEO_REGISTRY)
         """
         self.name = name
         self.country = country
+        self.geo_id = (GEO_REGISTRY if registry is None else registry).register_city(self)
     
-    def compare(self, other):
+    def compare(self, other) -> bool:
         """
         @brief Сравнивает текущий город с другим
         @param other Объект для сравнения
-        @return True, если оба объекта — City и совпадают название и страна; иначе False или None
+        @return True, если оба объекта — City с одним geo_id (та же страна и название); иначе False
+        """
+        return self == other
+
+    def __eq__(self, other) -> bool:
+        """
+        @brief Проверяет равенство городов по geo_id
+        @param other Объект для сравнения
+        @return True, если other — City с тем же geo_id
         """
         if isinstance(other, City):
-            return other.name == self.name and other.country == self.country
+            return self.geo_id == other.geo_id
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        """
+        @brief Хеш города
+        @return geo_id города
+        """
+        return self.geo_id
     
     def __str__(self):
         """
@@ -109,6 +162,126 @@ class Sight:
         """
         @brief Имитирует посещение достопримечательности
         @param sight_info Описание достопримечательности (по умолчанию — заглушка)
-        @note Выводит информацию в консоль
+        @note Отправляет событие sight_visited (по умолчанию выводится в консоль)
         """
-        print(sight_info)
\ No newline at end of file
+        emit("sight_visited", sight=self.name, info=sight_info)
+
+
+class GeoRegistry:
+    """
+    @brief Реестр интернирования стран и городов
+    @details Выдаёт целочисленные geo_id: странам — по коду, городам — по паре
+    (geo_id страны, название). Номера берутся из общей для процесса последовательности,
+    поэтому они уникальны и между разными реестрами. Первый зарегистрированный объект с данным ключом считается
+    каноническим; методы country() и city() возвращают его вместо создания дубликата,
+    поэтому одинаковые страны и города хранятся в памяти один раз.
+    """
+
+    def __init__(self):
+        """
+        @brief Конструктор пустого реестра
+        """
+        self.__lock = RLock()
+        self.__objects: Dict[int, Union[Country, City]] = {}
+        self.__countries: Dict[str, int] = {}
+        self.__cities: Dict[Tuple[int, str], int] = {}
+        self.__country_names: Dict[str, Set[int]] = {}
+
+    def __intern(self, table: dict, key, obj) -> int:
+        """
+        @brief Возвращает geo_id по ключу, регистрируя obj как канонический при первом обращении
+        @param table Таблица ключей (стран или городов)
+        @param key Ключ объекта
+        @param obj Регистрируемый объект
+        @return geo_id
+        """
+        geo_id = table.get(key)
+        if geo_id is None:
+            with self.__lock:
+                geo_id = table.get(key)
+                if geo_id is None:
+                    geo_id = next(_GEO_IDS)
+                    self.__objects[geo_id] = obj
+                    table[key] = geo_id
+        return geo_id
+
+    def register_country(self, country: Country) -> int:
+        """
+        @brief Выдаёт geo_id стране
+        @param country Страна
+        @return geo_id (общий для всех стран с тем же кодом)
+        @note Название страны запоминается для поиска по имени (country_ids())
+        """
+        geo_id = self.__intern(self.__countries, country.get_code(), country)
+        with self.__lock:
+            self.__country_names.setdefault(country.name, set()).add(geo_id)
+        return geo_id
+
+    def register_city(self, city: City) -> int:
+        """
+        @brief Выдаёт geo_id городу
+        @param city Город
+        @return geo_id (общий для всех городов той же страны с тем же названием)
+        """
+        return self.__intern(self.__cities, (city.country.geo_id, city.name), city)
+
+    def country(self, name: str, code: str, visa_required: bool = True) -> Country:
+        """
+        @brief Возвращает каноническую страну с данным кодом, создавая её при необходимости
+        @param name Название страны
+        @param code Код страны
+        @param visa_required Флаг необходимости визы (используется только при создании)
+        @return Объект Country
+        """
+        geo_id = self.__countries.get(code)
+        if geo_id is None:
+            geo_id = Country(name, code, visa_required, registry=self).geo_id
+        return self.__objects[geo_id]
+
+    def city(self, name: str, country: Country) -> City:
+        """
+        @brief Возвращает канонический город, создавая его при необходимости
+        @param name Название города
+        @param country Страна города
+        @return Объект City
+        """
+        geo_id = self.__cities.get((country.geo_id, name))
+        if geo_id is None:
+            geo_id = City(name, country, registry=self).geo_id
+        return self.__objects[geo_id]
+
+    def country_ids(self, name: str) -> Tuple[int, ...]:
+        """
+        @brief Находит geo_id стран по названию
+        @details Название не уникально (уникален код), поэтому стран может быть несколько.
+        Учитываются названия, под которыми страны регистрировались, и текущие названия
+        канонических стран (на случай переименования).
+        @param name Название страны
+        @return Отсортированный кортеж geo_id (пустой, если таких стран нет)
+        """
+        with self.__lock:
+            geo_ids = set(self.__country_names.get(name, ()))
+            geo_ids.update(geo_id for geo_id in self.__countries.values() if self.__objects[geo_id].name == name)
+        return tuple(sorted(geo_ids))
+
+    def get(self, geo_id: int) -> Union[Country, City]:
+        """
+        @brief Возвращает канонический объект по geo_id
+        @param geo_id Идентификатор страны или города
+        @return Объект Country или City
+        @exception KeyError Если geo_id не выдавался этим реестром
+        """
+        return self.__objects[geo_id]
+
+    def __len__(self) -> int:
+        """
+        @brief Количество зарегистрированных стран и городов
+        @return Число geo_id
+        """
+        return len(self.__objects)
+
+
+GEO_REGISTRY = GeoRegistry()
+"""
+@brief Общий реестр стран и городов процесса
+"""
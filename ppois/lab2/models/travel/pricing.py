@@ -0,0 +1,227 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+from .tour import Tour
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TourAlreadyPriced(Exception):
+    """
+    @brief Исключение: цены тура уже ведёт другой каталог
+    @details Выбрасывается при добавлении тура, который хранит цену, комиссию и надбавку
+    в колонках другого CatalogPricing (например, тура другого агентства).
+    """
+    def __init__(self):
+        """@brief Конструктор исключения"""
+        super().__init__("The tour is already priced by another catalog")
+
+
+class CatalogPricing:
+    """
+    @brief Постоянные ценовые колонки каталога для пакетного пересчёта цен
+    @details Хранит по строке на тур: базовая стоимость, итоги по транспорту, проживанию
+    и услугам (накопленные суммы тура, см. Tour.get_cost_totals()), комиссия, топливная
+    надбавка и цена. Колонки ведутся вызовами add()/remove()/refresh() и обновляются
+    по подписке на изменения тура, поэтому пересчёт их не перестраивает. Цена, комиссия
+    и надбавка тура хранятся прямо в колонках (Tour.attach_pricing), так что reprice()
+    записывает новые цены одним присваиванием столбца, не обходя туры. Расчёт выполняется
+    одним векторным проходом через NumPy; без NumPy — тем же алгоритмом на модуле array.
+    Освободившиеся строки используются повторно; строку можно задать явно, например
+    идентификатором тура в индексе каталога (TourIndex), чтобы столбец цен читался индексом.
+    """
+
+    def __init__(self, tours: Iterable[Tour] = ()):
+        """
+        @brief Конструктор колонок каталога
+        @param tours Туры для начальной загрузки (занимают строки по порядку)
+        @exception TourAlreadyPriced Если цены тура уже ведёт другой каталог
+        """
+        self.__tours: List[Optional[Tour]] = []
+        self.__rows: Dict[int, int] = {}
+        self.__free: List[int] = []
+        self.__dirty: Set[int] = set()
+        self.base_costs = array("d")
+        self.transport_totals = array("d")
+        self.accommodation_totals = array("d")
+        self.service_totals = array("d")
+        self.commission_rates = array("d")
+        self.fuel_surcharges = array("d")
+        self.prices = array("d")
+        for tour in tours:
+            self.add(tour)
+
+    def __len__(self) -> int:
+        """
+        @brief Количество туров в колонках
+        @return Число туров
+        """
+        return len(self.__rows)
+
+    def rows(self) -> int:
+        """
+        @brief Количество строк колонок (включая свободные)
+        @return Длина каждой колонки
+        """
+        return len(self.__tours)
+
+    def check(self, tours: Iterable[Tour]):
+        """
+        @brief Проверяет, что туры можно добавить в колонки
+        @param tours Объекты Tour
+        @exception TourAlreadyPriced Если цены одного из туров ведёт другой каталог
+        """
+        for tour in tours:
+            if tour.get_pricing() not in (None, self):
+                raise TourAlreadyPriced()
+
+    def __grow(self, rows: int):
+        """
+        @brief Дополняет колонки пустыми строками
+        @param rows Требуемое число строк
+        """
+        missing = rows - len(self.__tours)
+        if missing <= 0:
+            return
+        zeros = array("d", bytes(8 * missing))
+        self.__tours.extend([None] * missing)
+        for column in (self.base_costs, self.transport_totals, self.accommodation_totals,
+                       self.service_totals, self.commission_rates, self.fuel_surcharges, self.prices):
+            column.extend(zeros)
+
+    def __fill(self, row: int, tour: Tour):
+        """
+        @brief Записывает накопленные суммы тура в колонки
+        @param row Строка тура
+        @param tour Объект Tour
+        """
+        (self.base_costs[row], self.transport_totals[row],
+         self.accommodation_totals[row], self.service_totals[row]) = tour.get_cost_totals()
+
+    def add(self, tour: Tour, row: Optional[int] = None) -> int:
+        """
+        @brief Добавляет тур в колонки и переносит туда его цену, комиссию и надбавку
+        @param tour Объект Tour
+        @param row Строка для тура (None — свободная или новая строка)
+        @return Строка тура
+        @exception TourAlreadyPriced Если цены тура уже ведёт другой каталог
+        @exception ValueError Если заданная строка занята другим туром
+        @note Повторное добавление того же тура обновляет его строку (см. refresh())
+        """
+        self.check([tour])
+        current = self.__rows.get(id(tour))
+        if current is not None:
+            self.refresh(tour)
+            return current
+        if row is None:
+            row = self.__free.pop() if self.__free else len(self.__tours)
+        elif row in self.__free:
+            self.__free.remove(row)
+        self.__grow(row + 1)
+        if self.__tours[row] is not None:
+            raise ValueError(f"Pricing row {row} is already taken")
+        self.__tours[row] = tour
+        self.__rows[id(tour)] = row
+        self.__fill(row, tour)
+        self.commission_rates[row] = tour.commission_rate
+        self.fuel_surcharges[row] = tour.fuel_surcharge
+        self.prices[row] = tour.price
+        tour.attach_pricing(self, row)
+        tour.subscribe(self.__mark)
+        return row
+
+    def remove(self, tour: Tour):
+        """
+        @brief Убирает тур из колонок
+        @details Цена, комиссия и надбавка возвращаются в сам тур, строка освобождается.
+        @param tour Объект Tour
+        @exception KeyError Если тура нет в колонках
+        """
+        row = self.__rows.pop(id(tour))
+        tour.unsubscribe(self.__mark)
+        tour.detach_pricing()
+        self.__dirty.discard(row)
+        self.__tours[row] = None
+        for column in (self.base_costs, self.transport_totals, self.accommodation_totals,
+                       self.service_totals, self.commission_rates, self.fuel_surcharges, self.prices):
+            column[row] = 0.0
+        self.__free.append(row)
+
+    def refresh(self, tour: Tour):
+        """
+        @brief Обновляет строку тура после изменений, о которых тур не сообщает
+        @param tour Объект Tour (например, после прямого присваивания base_cost)
+        @exception KeyError Если тура нет в колонках
+        """
+        row = self.__rows[id(tour)]
+        self.__dirty.discard(row)
+        self.__fill(row, tour)
+
+    def __mark(self, tour: Tour):
+        """
+        @brief Помечает строку тура как устаревшую (вызывается туром при изменении)
+        @param tour Изменившийся тур
+        """
+        row = self.__rows.get(id(tour))
+        if row is not None:
+            self.__dirty.add(row)
+
+    def __sync(self):
+        """
+        @brief Обновляет строки туров, изменившихся после последнего расчёта
+        """
+        while self.__dirty:
+            row = self.__dirty.pop()
+            self.__fill(row, self.__tours[row])
+
+    def compute(self, commission_rate: Optional[float] = None,
+                fuel_surcharge: Optional[float] = None) -> Sequence[float]:
+        """
+        @brief Рассчитывает цены по колонкам, не изменяя их
+        @param commission_rate Новая комиссия для всех туров (None — у каждого своя)
+        @param fuel_surcharge Новая топливная надбавка для всех туров (None — у каждого своя)
+        @return Столбец цен по строкам (numpy.ndarray или array('d')); свободные строки — 0
+        """
+        self.__sync()
+        count = len(self.__tours)
+        if np is not None:
+            surcharge = (np.frombuffer(self.fuel_surcharges) if fuel_surcharge is None
+                         else np.full(count, fuel_surcharge))
+            commission = (np.frombuffer(self.commission_rates) if commission_rate is None
+                          else np.full(count, commission_rate))
+            subtotal = (np.frombuffer(self.base_costs) + np.frombuffer(self.transport_totals) * (1 + surcharge)
+                        + np.frombuffer(self.accommodation_totals) + np.frombuffer(self.service_totals))
+            return subtotal * (1 + commission)
+
+        prices = array("d", bytes(8 * count))
+        for row in range(count):
+            surcharge = self.fuel_surcharges[row] if fuel_surcharge is None else fuel_surcharge
+            commission = self.commission_rates[row] if commission_rate is None else commission_rate
+            subtotal = (self.base_costs[row] + self.transport_totals[row] * (1 + surcharge)
+                        + self.accommodation_totals[row] + self.service_totals[row])
+            prices[row] = subtotal * (1 + commission)
+        return prices
+
+    def reprice(self, commission_rate: Optional[float] = None,
+                fuel_surcharge: Optional[float] = None) -> array:
+        """
+        @brief Пересчитывает цены и записывает их в колонки
+        @details Сначала полностью рассчитывается новый столбец цен и только затем
+        колонки заменяются, так что при ошибке расчёта ни один тур не меняется.
+        Туры читают цену из колонки, поэтому их подписчики не уведомляются:
+        индексу каталога передаётся сам столбец (TourIndex.set_prices).
+        @param commission_rate Новая комиссия для всех туров (None — без изменений)
+        @param fuel_surcharge Новая топливная надбавка для всех туров (None — без изменений)
+        @return Новый столбец цен по строкам
+        """
+        computed = self.compute(commission_rate, fuel_surcharge)
+        prices = computed if isinstance(computed, array) else array("d", computed.tobytes())
+        count = len(self.__tours)
+        if commission_rate is not None:
+            self.commission_rates = array("d", [commission_rate]) * count
+        if fuel_surcharge is not None:
+            self.fuel_surcharges = array("d", [fuel_surcharge]) * count
+        self.prices = prices
+        return prices
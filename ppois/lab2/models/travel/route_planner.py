@@ -0,0 +1,383 @@
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+from heapq import heappop, heappush
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from .geography import City
+from .transport import Transport
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+Moment = Union[datetime, date]
+
+
+class RouteNotFound(Exception):
+    """
+    @brief Исключение: маршрут между городами не найден
+    @details Выбрасывается, если ни одна цепочка рейсов не доводит из пункта отправления
+    в пункт назначения с учётом времени отправления и минимального времени пересадки.
+    """
+    def __init__(self, origin: City, destination: City):
+        """
+        @brief Конструктор исключения
+        @param origin Город отправления
+        @param destination Город назначения
+        """
+        super().__init__(f"No route from {origin} to {destination}")
+
+
+def _seconds(moment: Moment) -> float:
+    """
+    @brief Переводит момент времени в секунды для сравнения
+    @param moment datetime (наивный или с часовым поясом) либо date (полночь)
+    @return Число секунд от 1970-01-01
+    """
+    if not isinstance(moment, datetime):
+        moment = datetime(moment.year, moment.month, moment.day)
+    if moment.tzinfo is not None:
+        return moment.timestamp()
+    return (moment - _EPOCH).total_seconds()
+
+
+class Itinerary:
+    """
+    @brief Найденный маршрут из нескольких перемещений
+    @details Содержит транспорт в порядке следования; список transports можно
+    сразу передать в Tour или бронировать по одному через Transport.book().
+    """
+
+    def __init__(self, transports: List[Transport], cost: float):
+        """
+        @brief Конструктор маршрута
+        @param transports Перемещения в порядке следования
+        @param cost Суммарная стоимость (price_for_hour * продолжительность по всем плечам)
+        """
+        self.transports = transports
+        self.cost = cost
+
+    @property
+    def departure(self) -> Moment:
+        """
+        @brief Время отправления первого плеча
+        @return Время отправления
+        """
+        return self.transports[0].start_time
+
+    @property
+    def arrival(self) -> Moment:
+        """
+        @brief Время прибытия последнего плеча
+        @return Время прибытия
+        """
+        return self.transports[-1].end_time
+
+    def __len__(self) -> int:
+        """
+        @brief Количество плеч маршрута
+        @return Число перемещений
+        """
+        return len(self.transports)
+
+    def __str__(self) -> str:
+        """
+        @brief Строковое представление маршрута
+        @return Строка в формате: "Город1 - Город2 - Город3, N legs, X.XX total"
+        """
+        cities = [str(self.transports[0].start_point)] + [str(trans.end_point) for trans in self.transports]
+        return f"{' - '.join(cities)}, {len(self.transports)} legs, {self.cost:.2f} total"
+
+
+class RoutePlanner:
+    """
+    @brief Планировщик маршрутов по расписанию транспорта
+    @details Хранит все перемещения как рёбра между городами (по geo_id) с временем
+    отправления и прибытия:
+        - массив плеч, отсортированный по отправлению, — для сканирования связей
+          (Connection Scan) при поиске самого раннего прибытия;
+        - для каждого города — отсортированный по отправлению список исходящих плеч,
+          в котором продолжения после пересадки находятся бинарным поиском.
+    Пересадка возможна, если следующее плечо отправляется не раньше, чем через
+    min_connection после прибытия предыдущего.
+    Удалённые плечи остаются в общем массиве как «надгробия» и пропускаются при
+    сканировании; массив уплотняется, когда надгробий становится больше половины.
+    """
+
+    def __init__(self, transports: Iterable[Transport] = (),
+                 min_connection: timedelta = timedelta(minutes=30)):
+        """
+        @brief Конструктор планировщика
+        @param transports Перемещения для начальной загрузки
+        @param min_connection Минимальное время пересадки (по умолчанию 30 минут)
+        """
+        self.min_connection = min_connection
+        self.__legs: List[Optional[Transport]] = []
+        self.__leg_ids: Dict[int, int] = {}
+        self.__departures: List[float] = []
+        self.__arrivals: List[float] = []
+        self.__origins: List[int] = []
+        self.__targets: List[int] = []
+        self.__costs: List[float] = []
+        for trans in {id(trans): trans for trans in transports}.values():
+            self.__append(trans)
+        self.__by_departure: List[Tuple[float, float, int]] = sorted(
+            zip(self.__departures, self.__arrivals, range(len(self.__legs))))
+        self.__removed = 0
+        self.__outgoing: Dict[int, List[Tuple[float, int]]] = {}
+        for departure, _, leg in self.__by_departure:
+            self.__outgoing.setdefault(self.__origins[leg], []).append((departure, leg))
+        for outgoing in self.__outgoing.values():
+            outgoing.sort()
+
+    def __append(self, trans: Transport) -> int:
+        """
+        @brief Дописывает плечо в колонки (без обновления отсортированных массивов)
+        @param trans Объект Transport
+        @return Номер плеча
+        """
+        leg = len(self.__legs)
+        departure = _seconds(trans.start_time)
+        arrival = _seconds(trans.end_time)
+        self.__legs.append(trans)
+        self.__leg_ids[id(trans)] = leg
+        self.__departures.append(departure)
+        self.__arrivals.append(arrival)
+        self.__origins.append(trans.start_point.geo_id)
+        self.__targets.append(trans.end_point.geo_id)
+        self.__costs.append(trans.price_for_hour * (arrival - departure) / 3600)
+        return leg
+
+    def add(self, trans: Transport):
+        """
+        @brief Добавляет перемещение в расписание
+        @param trans Объект Transport
+        @note Повторное добавление того же перемещения обновляет его плечо
+        """
+        if id(trans) in self.__leg_ids:
+            self.remove(trans)
+        leg = self.__append(trans)
+        departure = self.__departures[leg]
+        insort(self.__by_departure, (departure, self.__arrivals[leg], leg))
+        insort(self.__outgoing.setdefault(self.__origins[leg], []), (departure, leg))
+
+    def add_many(self, transports: Iterable[Transport]):
+        """
+        @brief Добавляет много перемещений одним слиянием
+        @details Новые плечи дописываются в конец отсортированных массивов, которые затем
+        пересортировываются (Timsort сливает упорядоченные серии за линейное время).
+        @param transports Объекты Transport (повторно добавленные обновляются)
+        """
+        transports = list({id(trans): trans for trans in transports}.values())
+        for trans in transports:
+            if id(trans) in self.__leg_ids:
+                self.remove(trans)
+        added = [self.__append(trans) for trans in transports]
+        if not added:
+            return
+        self.__by_departure = sorted(self.__by_departure + [
+            (self.__departures[leg], self.__arrivals[leg], leg) for leg in added])
+        touched = set()
+        for leg in added:
+            self.__outgoing.setdefault(self.__origins[leg], []).append((self.__departures[leg], leg))
+            touched.add(self.__origins[leg])
+        for origin in touched:
+            self.__outgoing[origin].sort()
+
+    def remove(self, trans: Transport):
+        """
+        @brief Удаляет перемещение из расписания
+        @details В общем массиве по отправлению плечо помечается надгробием (O(1)
+        амортизированно: уплотнение за O(n) выполняется, когда надгробий больше половины
+        массива). Из списка исходящих плеч города плечо удаляется со сдвигом — O(k),
+        где k — число рейсов из этого города. Номер плеча больше не используется,
+        поэтому номера остальных плеч не меняются.
+        @param trans Объект Transport
+        @exception KeyError Если перемещения нет в расписании
+        """
+        leg = self.__leg_ids.pop(id(trans))
+        departure = self.__departures[leg]
+        outgoing = self.__outgoing[self.__origins[leg]]
+        outgoing.pop(bisect_left(outgoing, (departure, leg)))
+        if not outgoing:
+            del self.__outgoing[self.__origins[leg]]
+        self.__legs[leg] = None
+        self.__removed += 1
+        if self.__removed * 2 > len(self.__by_departure):
+            self.__by_departure = [entry for entry in self.__by_departure if self.__legs[entry[2]] is not None]
+            self.__removed = 0
+
+    def __contains__(self, trans: Transport) -> bool:
+        """
+        @brief Проверяет, есть ли перемещение в расписании
+        @param trans Объект Transport
+        @return True, если перемещение добавлено и не удалено
+        """
+        return id(trans) in self.__leg_ids
+
+    def __len__(self) -> int:
+        """
+        @brief Количество плеч в расписании
+        @return Число перемещений
+        """
+        return len(self.__leg_ids)
+
+    def __transfer(self) -> float:
+        """
+        @brief Минимальное время пересадки в секундах
+        @return Секунды
+        """
+        return self.min_connection.total_seconds()
+
+    def __itinerary(self, last_leg: int, parents: Dict[int, int]) -> Itinerary:
+        """
+        @brief Восстанавливает маршрут по цепочке предшествующих плеч
+        @param last_leg Плечо, прибывающее в пункт назначения
+        @param parents Словарь {плечо: предыдущее плечо} (у первого плеча предыдущего нет)
+        @return Объект Itinerary
+        """
+        legs = [last_leg]
+        while legs[-1] in parents:
+            legs.append(parents[legs[-1]])
+        legs.reverse()
+        return Itinerary([self.__legs[leg] for leg in legs], sum(self.__costs[leg] for leg in legs))
+
+    def earliest_arrival(self, origin: City, destination: City, depart_after: Moment) -> Itinerary:
+        """
+        @brief Ищет маршрут с самым ранним прибытием (Connection Scan)
+        @details Плечи просматриваются один раз в порядке отправления, начиная с depart_after;
+        просмотр останавливается, как только отправление позже лучшего прибытия в пункт назначения.
+        @param origin Город отправления
+        @param destination Город назначения
+        @param depart_after Время, не раньше которого можно отправиться
+        @return Объект Itinerary
+        @exception RouteNotFound Если маршрута нет
+        """
+        source, target = origin.geo_id, destination.geo_id
+        transfer = self.__transfer()
+        ready: Dict[int, float] = {source: _seconds(depart_after)}
+        entered: Dict[int, int] = {}
+        best = float("inf")
+        start = bisect_left(self.__by_departure, (ready[source],))
+        by_departure = self.__by_departure
+        for position in range(start, len(by_departure)):
+            departure, arrival, leg = by_departure[position]
+            if departure >= best:
+                break
+            if self.__legs[leg] is None:
+                continue
+            city = self.__origins[leg]
+            if departure < ready.get(city, best):
+                continue
+            next_city = self.__targets[leg]
+            if arrival + transfer < ready.get(next_city, best + transfer) and next_city != source:
+                ready[next_city] = arrival + transfer
+                entered[next_city] = leg
+                if next_city == target:
+                    best = arrival
+        if target not in entered:
+            raise RouteNotFound(origin, destination)
+        parents = {}
+        leg = entered[target]
+        while self.__origins[leg] != source:
+            parents[leg] = entered[self.__origins[leg]]
+            leg = parents[leg]
+        return self.__itinerary(entered[target], parents)
+
+    def __continuations(self, leg: int, relaxed: Dict[int, float]) -> List[int]:
+        """
+        @brief Возвращает ещё не просмотренные продолжения маршрута после плеча
+        @details Из города прибытия берутся плечи, отправляющиеся после пересадки и раньше
+        уже просмотренной границы relaxed[город]: более поздние плеча уже были достигнуты
+        не хуже (раньше или дешевле), поэтому каждое плечо просматривается один раз.
+        @param leg Номер прибывшего плеча
+        @param relaxed Словарь {geo_id города: наименьшее уже просмотренное время готовности}
+        @return Номера плеч-продолжений
+        """
+        city = self.__targets[leg]
+        ready = self.__arrivals[leg] + self.__transfer()
+        bound = relaxed.get(city, float("inf"))
+        if ready >= bound:
+            return []
+        relaxed[city] = ready
+        outgoing = self.__outgoing.get(city, [])
+        return [next_leg for _, next_leg in
+                outgoing[bisect_left(outgoing, (ready,)):bisect_left(outgoing, (bound,))]]
+
+    def __first_legs(self, origin: City, depart_after: Moment, relaxed: Dict[int, float]) -> List[int]:
+        """
+        @brief Возвращает плечи, которыми можно начать маршрут
+        @param origin Город отправления
+        @param depart_after Время, не раньше которого можно отправиться
+        @param relaxed Словарь просмотренных границ (заполняется для города отправления)
+        @return Номера плеч из города отправления
+        """
+        ready = _seconds(depart_after)
+        relaxed[origin.geo_id] = ready
+        outgoing = self.__outgoing.get(origin.geo_id, [])
+        return [leg for _, leg in outgoing[bisect_left(outgoing, (ready,)):]]
+
+    def cheapest(self, origin: City, destination: City, depart_after: Moment,
+                 arrive_by: Optional[Moment] = None) -> Itinerary:
+        """
+        @brief Ищет самый дешёвый маршрут (алгоритм Дейкстры по плечам расписания)
+        @details Вершины графа — плечи; плечо извлекается из кучи один раз с наименьшей
+        стоимостью пути, а продолжения каждого плеча из города просматриваются один раз.
+        @param origin Город отправления
+        @param destination Город назначения
+        @param depart_after Время, не раньше которого можно отправиться
+        @param arrive_by Время, не позже которого нужно прибыть (по умолчанию без ограничения)
+        @return Объект Itinerary
+        @exception RouteNotFound Если маршрута нет
+        """
+        target = destination.geo_id
+        deadline = float("inf") if arrive_by is None else _seconds(arrive_by)
+        relaxed: Dict[int, float] = {}
+        parents: Dict[int, int] = {}
+        settled = set()
+        heap: List[Tuple[float, float, int]] = []
+        for leg in self.__first_legs(origin, depart_after, relaxed):
+            if self.__arrivals[leg] <= deadline:
+                heappush(heap, (self.__costs[leg], self.__arrivals[leg], leg))
+        while heap:
+            cost, arrival, leg = heappop(heap)
+            if leg in settled:
+                continue
+            settled.add(leg)
+            if self.__targets[leg] == target:
+                return self.__itinerary(leg, parents)
+            for next_leg in self.__continuations(leg, relaxed):
+                if next_leg not in settled and self.__arrivals[next_leg] <= deadline:
+                    parents.setdefault(next_leg, leg)
+                    heappush(heap, (cost + self.__costs[next_leg], self.__arrivals[next_leg], next_leg))
+        raise RouteNotFound(origin, destination)
+
+    def fewest_legs(self, origin: City, destination: City, depart_after: Moment) -> Itinerary:
+        """
+        @brief Ищет маршрут с наименьшим числом пересадок (поиск в ширину по плечам)
+        @details Плечи обходятся раундами по числу пересадок; внутри раунда — в порядке
+        прибытия, поэтому из маршрутов с равным числом плеч выбирается самый ранний.
+        @param origin Город отправления
+        @param destination Город назначения
+        @param depart_after Время, не раньше которого можно отправиться
+        @return Объект Itinerary
+        @exception RouteNotFound Если маршрута нет
+        """
+        target = destination.geo_id
+        relaxed: Dict[int, float] = {}
+        parents: Dict[int, int] = {}
+        seen = set()
+        round_legs = self.__first_legs(origin, depart_after, relaxed)
+        seen.update(round_legs)
+        while round_legs:
+            round_legs.sort(key=self.__arrivals.__getitem__)
+            arrived = [leg for leg in round_legs if self.__targets[leg] == target]
+            if arrived:
+                return self.__itinerary(arrived[0], parents)
+            next_round = []
+            for leg in round_legs:
+                for next_leg in self.__continuations(leg, relaxed):
+                    if next_leg not in seen:
+                        seen.add(next_leg)
+                        parents[next_leg] = leg
+                        next_round.append(next_leg)
+            round_legs = next_round
+        raise RouteNotFound(origin, destination)
@@ -0,0 +1,823 @@
+import gc
+import mmap
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.docs.passport import Passport
+from models.docs.visa import Visa
+from models.docs.visa_index import VisaIndex
+from models.people.person import ContactInfo, Person
+from models.people.staff import Employee, Guide, Manager, Salary, TravelAgent, WorkSchedule
+from services.bank_account import BankAccount
+from services.capacity import CapacityCounter
+from services.services import Insurance, LuggageService, Service, VisaSupportService
+from .accomodation import Accomodation, Apartment, Hostel, Hotel
+from .booking import AccomodationBooking, Booking, FlightBooking
+from .geography import GEO_REGISTRY, City, Country, GeoRegistry, Sight
+from .tour import Tour
+from .tourist_agency import TouristAgency
+from .transport import Bus, Flight, Train, Transport
+
+
+SNAPSHOT_MAGIC = b"AGSNAP01"
+"""
+@brief Константа: сигнатура файла снимка агентства
+"""
+
+SNAPSHOT_VERSION = 1
+"""
+@brief Константа: версия формата снимка
+"""
+
+NO_VALUE = -(1 << 63)
+"""
+@brief Константа: значение целочисленной колонки, означающее None
+"""
+
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<32sc7xQQ")
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NO_REF = -1
+
+_TRANSPORT_KINDS = (Transport, Flight, Train, Bus)
+_ACCOMMODATION_KINDS = (Accomodation, Hotel, Hostel, Apartment)
+_SERVICE_KINDS = (Service, Insurance, VisaSupportService, LuggageService)
+_BOOKING_KINDS = (Booking, FlightBooking, AccomodationBooking)
+_EMPLOYEE_KINDS = (TravelAgent, Manager, Guide)
+
+
+class SnapshotCorrupted(Exception):
+    """
+    @brief Исключение: файл снимка повреждён или имеет чужой формат
+    @details Выбрасывается при открытии файла с неверной сигнатурой, версией или оглавлением.
+    """
+    def __init__(self, path: str):
+        """
+        @brief Конструктор исключения
+        @param path Путь к файлу снимка
+        """
+        super().__init__(f"Agency snapshot {path} is corrupted")
+
+
+def _kind(kinds: tuple, obj) -> int:
+    """
+    @brief Возвращает номер точного типа объекта в таблице типов
+    @param kinds Кортеж поддерживаемых классов
+    @param obj Объект
+    @return Позиция type(obj) в kinds
+    @exception TypeError Если тип объекта не поддерживается форматом
+    """
+    try:
+        return kinds.index(type(obj))
+    except ValueError:
+        raise TypeError(f"unsupported type in snapshot: {type(obj).__name__}") from None
+
+
+def _micros(moment: datetime) -> int:
+    """
+    @brief Переводит дату и время в микросекунды от 1970-01-01
+    @param moment Наивный datetime
+    @return Целое число микросекунд
+    """
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def _moment(micros: int) -> datetime:
+    """
+    @brief Обратное преобразование для _micros()
+    @param micros Микросекунды от 1970-01-01
+    @return Объект datetime
+    """
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+@contextmanager
+def _collector_paused():
+    """
+    @brief Приостанавливает циклический сборщик мусора на время массового создания объектов
+    @details Сборщик запускается по числу созданных контейнеров и при миллионах объектов
+    многократно обходит всю кучу, хотя мусора при загрузке не образуется.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _bare(cls: type, **state):
+    """
+    @brief Создаёт объект без вызова конструктора (так же, как pickle)
+    @details Используется для бронирований, чей конструктор выполняет оплату:
+    сохранённое состояние (открытые слоты __slots__) восстанавливается как есть.
+    @param cls Класс объекта
+    @param state Значения атрибутов
+    @return Новый объект
+    """
+    obj = cls.__new__(cls)
+    for name, value in state.items():
+        setattr(obj, name, value)
+    return obj
+
+
+_COLUMNS = {
+    "countries": {"name": "q", "code": "q", "visa": "b"},
+    "cities": {"name": "q", "country": "q"},
+    "accounts": {"id": "q", "sum": "d"},
+    "visas": {"number": "q", "country": "q", "issue": "q", "expiry": "q", "entries": "q", "used": "q", "active": "b"},
+    "passports": {"number": "q", "name": "q", "surname": "q", "expiry": "q", "visa": "q"},
+    "persons": {"passport": "q", "account": "q", "mood": "q", "email": "q", "phone": "q"},
+    "transports": {"kind": "b", "start": "q", "end": "q", "departure": "q", "arrival": "q", "rate": "d",
+                   "account": "q", "number": "q", "company": "q", "seats": "q", "free": "q"},
+    "stays": {"kind": "b", "start": "q", "end": "q", "location": "q", "rate": "d", "account": "q",
+              "first": "q", "second": "q", "services": "[", "calendar": "[", "nights": "["},
+    "services": {"kind": "b", "name": "q", "price": "d", "coverage": "q", "weight": "q"},
+    "sights": {"name": "q", "country": "q", "city": "q"},
+    "bookings": {"kind": "b", "person": "q", "date": "q", "confirmed": "b", "id": "q", "target": "q"},
+    "tours": {"base": "d", "start": "q", "end": "q", "destination": "q", "commission": "d", "fuel": "d",
+              "price": "d", "transports": "[", "stays": "[", "services": "[", "sights": "[", "bookings": "["},
+    "staff": {"kind": "b", "id": "q", "name": "q", "hire": "q", "hire_date": "b", "active": "b", "salary": "d",
+              "bonus": "d", "commission": "d", "handled": "q", "city": "q", "available": "b",
+              "shift_start": "q", "shift_end": "q", "days": "[", "languages": "[", "calendar": "["},
+    "agency": {"name": "q", "account": "q", "tours": "[", "staff": "[", "clients": "["},
+}
+"""
+@brief Схема снимка: таблица -> {поле: код типа array}; "[" — список целых (смещения + элементы)
+"""
+
+
+class _SnapshotWriter:
+    """
+    @brief Раскладывает граф объектов агентства по колонкам снимка
+    @details Каждый объект получает номер строки в таблице своего типа при первой
+    встрече; все ссылки записываются номерами строк, поэтому общие города, счета
+    и клиенты сохраняются один раз. Списки хранятся парой колонок: смещения
+    (n + 1 значение, колонка "имя@") и плоский массив элементов.
+    """
+
+    def __init__(self):
+        """
+        @brief Конструктор пустого набора колонок по схеме _COLUMNS
+        """
+        self.columns: Dict[str, array] = {}
+        for table, fields in _COLUMNS.items():
+            for field, typecode in fields.items():
+                if typecode == "[":
+                    self.columns[f"{table}.{field}"] = array("q")
+                    self.columns[f"{table}.{field}@"] = array("q", [0])
+                else:
+                    self.columns[f"{table}.{field}"] = array(typecode)
+        self.__refs: Dict[str, Dict[int, int]] = {table: {} for table in _COLUMNS}
+        self.__keep: List[object] = []
+        self.__strings: Dict[str, int] = {}
+        self.__blob = bytearray()
+        self.__string_offsets = array("q", [0])
+
+    def string(self, value: Optional[str]) -> int:
+        """
+        @brief Интернирует строку в общей таблице строк
+        @param value Строка или None
+        @return Номер строки (-1 для None)
+        """
+        if value is None:
+            return _NO_REF
+        number = self.__strings.get(value)
+        if number is None:
+            number = self.__strings[value] = len(self.__string_offsets) - 1
+            self.__blob += value.encode("utf-8")
+            self.__string_offsets.append(len(self.__blob))
+        return number
+
+    def items(self, name: str, values: Iterable[int]):
+        """
+        @brief Дописывает список значений строки таблицы
+        @param name Имя списка ("таблица.поле")
+        @param values Целочисленные значения (номера строк, ссылки, пары дат)
+        """
+        items = self.columns[name]
+        items.extend(values)
+        self.columns[name + "@"].append(len(items))
+
+    def __known(self, table: str, obj) -> Optional[int]:
+        """
+        @brief Возвращает номер строки уже записанного объекта
+        @param table Имя таблицы
+        @param obj Объект или None
+        @return Номер строки, -1 для None или None, если объект ещё не записан
+        """
+        return _NO_REF if obj is None else self.__refs[table].get(id(obj))
+
+    def __added(self, table: str, obj) -> int:
+        """
+        @brief Присваивает номер только что записанной строке объекта
+        @param table Имя таблицы
+        @param obj Объект
+        @return Номер строки
+        """
+        refs = self.__refs[table]
+        number = refs[id(obj)] = len(refs)
+        self.__keep.append(obj)
+        return number
+
+    def country(self, country: Country) -> int:
+        """@brief Записывает страну и возвращает номер её строки"""
+        number = self.__known("countries", country)
+        if number is not None:
+            return number
+        columns = self.columns
+        columns["countries.name"].append(self.string(country.name))
+        columns["countries.code"].append(self.string(country.get_code()))
+        columns["countries.visa"].append(bool(country.visa_required))
+        return self.__added("countries", country)
+
+    def city(self, city: City) -> int:
+        """@brief Записывает город и возвращает номер его строки"""
+        number = self.__known("cities", city)
+        if number is not None:
+            return number
+        columns = self.columns
+        columns["cities.country"].append(self.country(city.country))
+        columns["cities.name"].append(self.string(city.name))
+        return self.__added("cities", city)
+
+    def account(self, account: BankAccount) -> int:
+        """@brief Записывает банковский счёт и возвращает номер его строки"""
+        number = self.__known("accounts", account)
+        if number is not None:
+            return number
+        columns = self.columns
+        columns["accounts.id"].append(self.string(account.id))
+        columns["accounts.sum"].append(account.sum)
+        return self.__added("accounts", account)
+
+    def visa(self, visa: Visa) -> int:
+        """@brief Записывает визу и возвращает номер её строки"""
+        number = self.__known("visas", visa)
+        if number is not None:
+            return number
+        columns = self.columns
+        columns["visas.number"].append(self.string(visa.visa_number))
+        columns["visas.country"].append(self.string(visa.country))
+        columns["visas.issue"].append(visa.issue_date.toordinal())
+        columns["visas.expiry"].append(visa.expiration_date.toordinal())
+        columns["visas.entries"].append(visa.entry_count)
+        columns["visas.used"].append(visa.used_entries)
+        columns["visas.active"].append(bool(visa.is_active))
+        return self.__added("visas", visa)
+
+    def passport(self, passport: Passport) -> int:
+        """@brief Записывает паспорт и возвращает номер его строки"""
+        number = self.__known("passports", passport)
+        if number is not None:
+            return number
+        columns = self.columns
+        columns["passports.visa"].append(self.visa(passport.visa))
+        columns["passports.number"].append(self.string(passport.get_passport_num()))
+        columns["passports.name"].append(self.string(passport.name))
+        columns["passports.surname"].append(self.string(passport.surname))
+        columns["passports.expiry"].append(passport.passport_expiration_date.toordinal())
+        return self.__added("passports", passport)
+
+    def person(self, person: Person) -> int:
+        """@brief Записывает клиента и возвращает номер его строки"""
+        number = self.__known("persons", person)
+        if number is not None:
+            return number
+        columns = self.columns
+        contact = person.contact_info
+        columns["persons.passport"].append(self.passport(person.passport))
+        columns["persons.account"].append(self.account(person.bank_account))
+        columns["persons.mood"].append(person.get_mood())
+        columns["persons.email"].append(self.string(None if contact is None else contact.email))
+        columns["persons.phone"].append(self.string(None if contact is None else contact.phone))
+        return self.__added("persons", person)
+
+    def transport(self, transport: Transport) -> int:
+        """@brief Записывает транспорт и возвращает номер его строки"""
+        number = self.__known("transports", transport)
+        if number is not None:
+            return number
+        columns = self.columns
+        kind = _kind(_TRANSPORT_KINDS, transport)
+        code = (transport.flight_number if kind == 1 else transport.train_number if kind == 2
+                else transport.bus_number if kind == 3 else None)
+        seats = transport.seats
+        columns["transports.kind"].append(kind)
+        columns["transports.start"].append(self.city(transport.start_point))
+        columns["transports.end"].append(self.city(transport.end_point))
+        columns["transports.departure"].append(_micros(transport.start_time))
+        columns["transports.arrival"].append(_micros(transport.end_time))
+        columns["transports.rate"].append(transport.price_for_hour)
+        columns["transports.account"].append(self.account(transport.bank_account))
+        columns["transports.number"].append(self.string(code))
+        columns["transports.company"].append(transport.bus_company if kind == 3 else NO_VALUE)
+        columns["transports.seats"].append(NO_VALUE if seats is None else seats.capacity)
+        columns["transports.free"].append(NO_VALUE if seats is None else seats.remaining())
+        return self.__added("transports", transport)
+
+    def accommodation(self, accommodation: Accomodation) -> int:
+        """@brief Записывает объект проживания и возвращает номер его строки"""
+        number = self.__known("stays", accommodation)
+        if number is not None:
+            return number
+        columns = self.columns
+        kind = _kind(_ACCOMMODATION_KINDS, accommodation)
+        first, second = NO_VALUE, NO_VALUE
+        if kind == 1:
+            first = accommodation.star_rating
+        elif kind == 2:
+            first, second = accommodation.persons_for_room, accommodation.rooms
+        elif kind == 3:
+            first = accommodation.bedrooms
+            second = NO_VALUE if accommodation.floor is None else accommodation.floor
+        columns["stays.kind"].append(kind)
+        columns["stays.start"].append(accommodation.start_date.toordinal())
+        columns["stays.end"].append(accommodation.end_date.toordinal())
+        columns["stays.location"].append(self.city(accommodation.location))
+        columns["stays.rate"].append(accommodation.price_per_night)
+        columns["stays.account"].append(self.account(accommodation.bank_account))
+        columns["stays.first"].append(first)
+        columns["stays.second"].append(second)
+        self.items("stays.services", [self.string(name) for name in accommodation.services] if kind == 1 else ())
+        self.items("stays.calendar", [day.toordinal() for reservation in accommodation.calendar.reservations()
+                                      for day in reservation])
+        self.items("stays.nights", [value for night, beds in accommodation.occupancy().items()
+                                    for value in (night.toordinal(), beds)] if kind == 2 else ())
+        return self.__added("stays", accommodation)
+
+    def service(self, service: Service) -> int:
+        """@brief Записывает услугу и возвращает номер её строки"""
+        number = self.__known("services", service)
+        if number is not None:
+            return number
+        columns = self.columns
+        kind = _kind(_SERVICE_KINDS, service)
+        columns["services.kind"].append(kind)
+        columns["services.name"].append(self.string(service.name))
+        columns["services.price"].append(service.price)
+        columns["services.coverage"].append(self.string(service.coverage if kind == 1 else None))
+        columns["services.weight"].append(service.weight_kg if kind == 3 else NO_VALUE)
+        return self.__added("services", service)
+
+    def sight(self, sight: Sight) -> int:
+        """@brief Записывает достопримечательность и возвращает номер её строки"""
+        number = self.__known("sights", sight)
+        if number is not None:
+            return number
+        columns = self.columns
+        columns["sights.name"].append(self.string(sight.name))
+        columns["sights.country"].append(self.country(sight.country))
+        columns["sights.city"].append(self.city(sight.city))
+        return self.__added("sights", sight)
+
+    def booking(self, booking: Booking) -> int:
+        """@brief Записывает бронирование и возвращает номер его строки"""
+        number = self.__known("bookings", booking)
+        if number is not None:
+            return number
+        columns = self.columns
+        kind = _kind(_BOOKING_KINDS, booking)
+        columns["bookings.kind"].append(kind)
+        columns["bookings.person"].append(self.person(booking.person))
+        columns["bookings.date"].append(_micros(booking.booking_date))
+        columns["bookings.confirmed"].append(bool(booking.is_confirmed))
+        columns["bookings.id"].append(self.string(booking.booking_id))
+        columns["bookings.target"].append(self.transport(booking.flight) if kind == 1
+                                          else self.accommodation(booking.accommodation) if kind == 2 else _NO_REF)
+        return self.__added("bookings", booking)
+
+    def tour(self, tour: Tour) -> int:
+        """@brief Записывает тур и возвращает номер его строки"""
+        number = self.__known("tours", tour)
+        if number is not None:
+            return number
+        columns = self.columns
+        columns["tours.base"].append(tour.base_cost)
+        columns["tours.start"].append(tour.start_date.toordinal())
+        columns["tours.end"].append(tour.end_date.toordinal())
+        columns["tours.destination"].append(self.city(tour.destination))
+        columns["tours.commission"].append(tour.commission_rate)
+        columns["tours.fuel"].append(tour.fuel_surcharge)
+        columns["tours.price"].append(tour.price)
+        self.items("tours.transports", [self.transport(trans) for trans in tour.transports])
+        self.items("tours.stays", [self.accommodation(acc) for acc in tour.accommodations])
+        self.items("tours.services", [self.service(service) for service in tour.services])
+        self.items("tours.sights", [self.sight(sight) for sight in tour.sights])
+        self.items("tours.bookings", [self.booking(booking) for booking in tour.bookings])
+        return self.__added("tours", tour)
+
+    def employee(self, employee: Employee) -> int:
+        """@brief Записывает сотрудника и возвращает номер его строки"""
+        number = self.__known("staff", employee)
+        if number is not None:
+            return number
+        columns = self.columns
+        kind = _kind(_EMPLOYEE_KINDS, employee)
+        hire = employee.hire_date
+        hired_on_date = not isinstance(hire, datetime)
+        schedule = getattr(employee, "work_schedule", None)
+        columns["staff.kind"].append(kind)
+        columns["staff.id"].append(self.string(employee.employee_id))
+        columns["staff.name"].append(self.string(employee.name))
+        columns["staff.hire"].append(hire.toordinal() if hired_on_date else _micros(hire))
+        columns["staff.hire_date"].append(hired_on_date)
+        columns["staff.active"].append(bool(employee.is_active))
+        columns["staff.salary"].append(employee.salary.base_salary)
+        columns["staff.bonus"].append(employee.salary.bonus)
+        columns["staff.commission"].append(employee.commission_rate if kind == 0 else 0.0)
+        columns["staff.handled"].append(employee.bookings_handled if kind == 0 else 0)
+        columns["staff.city"].append(self.city(employee.city) if kind == 2 else _NO_REF)
+        columns["staff.available"].append(bool(employee.is_available) if kind == 2 else False)
+        columns["staff.shift_start"].append(self.string(None if schedule is None else schedule.start_time))
+        columns["staff.shift_end"].append(self.string(None if schedule is None else schedule.end_time))
+        self.items("staff.days", () if schedule is None else [self.string(day) for day in schedule.days])
+        self.items("staff.languages", [self.string(language) for language in employee.languages] if kind == 2 else ())
+        self.items("staff.calendar", [day.toordinal() for reservation in employee.calendar.reservations()
+                                      for day in reservation] if kind == 2 else ())
+        return self.__added("staff", employee)
+
+    def sections(self) -> List[Tuple[str, str, bytes]]:
+        """
+        @brief Возвращает все колонки в виде секций файла
+        @return Список (имя, код типа, байты) в порядке записи
+        """
+        sections = [("strings", "B", bytes(self.__blob)), ("strings@", "q", self.__string_offsets)]
+        sections += [(name, column.typecode, column) for name, column in self.columns.items()]
+        encoded = []
+        for name, typecode, data in sections:
+            if isinstance(data, array) and sys.byteorder != "little":
+                data = array(data.typecode, data)
+                data.byteswap()
+            encoded.append((name, typecode, bytes(data)))
+        return encoded
+
+
+class AgencySnapshot:
+    """
+    @brief Компактный двоичный снимок агентства и его клиентов
+    @details Файл состоит из заголовка, оглавления секций и самих секций. Каждая секция —
+    плотный массив одного типа (колонка таблицы), выровненный по 8 байтам; объекты
+    ссылаются друг на друга номерами строк, а все строки собраны в одну таблицу.
+    При открытии файл отображается в память, и колонки читаются прямо из отображения
+    (memoryview без разбора по записям), после чего restore() собирает объекты
+    по колонкам. Формат хранит числа в порядке little-endian.
+    """
+
+    def __init__(self, path: str):
+        """
+        @brief Открывает снимок
+        @param path Путь к файлу снимка
+        @exception SnapshotCorrupted Если файл не является снимком поддерживаемой версии
+        """
+        self.path = path
+        self.__file = open(path, "rb")
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.__file.close()
+            raise SnapshotCorrupted(path) from None
+        self.__views: List[memoryview] = []
+        self.__sections: Dict[str, Tuple[str, int, int]] = {}
+        try:
+            magic, version, count = _HEADER.unpack_from(self.__map, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise SnapshotCorrupted(path)
+            for position in range(count):
+                name, typecode, offset, length = _SECTION.unpack_from(
+                    self.__map, _HEADER.size + position * _SECTION.size)
+                typecode = typecode.decode("ascii")
+                if offset + length * array(typecode).itemsize > len(self.__map):
+                    raise SnapshotCorrupted(path)
+                self.__sections[name.rstrip(b"\0").decode("utf-8")] = (typecode, offset, length)
+        except (struct.error, ValueError):
+            self.close()
+            raise SnapshotCorrupted(path) from None
+        except SnapshotCorrupted:
+            self.close()
+            raise
+
+    @staticmethod
+    def save(path: str, agency: TouristAgency, clients: Iterable[Person] = ()) -> int:
+        """
+        @brief Сохраняет агентство и клиентов в файл снимка
+        @details Сохраняются туры (с транспортом, жильём, услугами, достопримечательностями
+        и бронированиями), персонал с графиками и календарями гидов, счета, а также
+        клиенты с паспортами и визами.
+        @param path Путь к файлу (перезаписывается)
+        @param agency Туристическое агентство
+        @param clients Клиенты, которых нужно сохранить вместе с агентством
+        @return Размер файла в байтах
+        @exception TypeError Если в графе объектов встретился неподдерживаемый подкласс
+        """
+        writer = _SnapshotWriter()
+        with _collector_paused():
+            writer.columns["agency.name"].append(writer.string(agency.name))
+            writer.columns["agency.account"].append(writer.account(agency.bank_account))
+            writer.items("agency.tours", [writer.tour(tour) for tour in agency.get_avaiable_tours()])
+            writer.items("agency.staff", [writer.employee(employee) for employee
+                                          in agency.managers + agency.travel_agents + agency.guides])
+            writer.items("agency.clients", [writer.person(client) for client in clients])
+
+        sections = writer.sections()
+        offset = _HEADER.size + _SECTION.size * len(sections)
+        with open(path, "wb") as file:
+            file.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(sections)))
+            for name, typecode, data in sections:
+                offset += -offset % 8
+                file.write(_SECTION.pack(name.encode("utf-8"), typecode.encode("ascii"), offset,
+                                         len(data) // array(typecode).itemsize))
+                offset += len(data)
+            for name, typecode, data in sections:
+                file.write(b"\0" * (-file.tell() % 8))
+                file.write(data)
+            return file.tell()
+
+    def names(self) -> List[str]:
+        """
+        @brief Перечисляет секции снимка
+        @return Имена колонок в порядке записи
+        """
+        return list(self.__sections)
+
+    def column(self, name: str):
+        """
+        @brief Возвращает колонку, читаемую прямо из отображения файла
+        @param name Имя колонки (например, "tours.price")
+        @return memoryview нужного типа (пустой кортеж, если колонки нет)
+        @note Представление действительно до close(); на big-endian системах
+        возвращается копия с переставленными байтами
+        """
+        section = self.__sections.get(name)
+        if section is None:
+            return ()
+        typecode, offset, length = section
+        view = memoryview(self.__map)[offset:offset + length * array(typecode).itemsize]
+        self.__views.append(view)
+        if sys.byteorder != "little" and typecode != "B":
+            column = array(typecode, view.tobytes())
+            column.byteswap()
+            return column
+        cast = view.cast(typecode)
+        self.__views.append(cast)
+        return cast
+
+    def __values(self, name: str) -> list:
+        """
+        @brief Читает колонку целиком в список Python
+        @details Представление колонки освобождается сразу после чтения.
+        @param name Имя колонки
+        @return Список значений (пустой, если колонки нет)
+        """
+        section = self.__sections.get(name)
+        if section is None:
+            return []
+        typecode, offset, length = section
+        with memoryview(self.__map)[offset:offset + length * array(typecode).itemsize] as view:
+            if sys.byteorder != "little" and typecode != "B":
+                column = array(typecode, view.tobytes())
+                column.byteswap()
+                return column.tolist()
+            with view.cast(typecode) as cast:
+                return cast.tolist()
+
+    def __lists(self, name: str) -> List[list]:
+        """
+        @brief Читает списочную колонку (смещения + элементы)
+        @param name Имя списка
+        @return Список списков значений по строкам таблицы
+        """
+        items, offsets = self.__values(name), self.__values(name + "@")
+        return [items[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def __strings(self) -> List[str]:
+        """
+        @brief Декодирует таблицу строк
+        @return Список строк по номерам
+        """
+        _, offset, length = self.__sections["strings"]
+        blob, offsets = self.__map[offset:offset + length], self.__values("strings@")
+        return [str(blob[start:end], "utf-8") for start, end in zip(offsets, offsets[1:])]
+
+    def restore(self, registry: GeoRegistry = None,
+                visa_index: VisaIndex = None) -> Tuple[TouristAgency, List[Person]]:
+        """
+        @brief Восстанавливает агентство и клиентов
+        @details Страны и города интернируются в реестре, визы паспортов регистрируются
+        в индексе виз (если он передан), места транспорта и брони жилья и гидов восстанавливаются
+        в счётчиках и календарях. Нагрузка гида в планировщике агентства восстанавливается
+        по числу броней в его календаре (нагрузка = назначенные туры). Туры добавляются
+        в агентство одним перестроением индекса.
+        @warning Цель «миллион туров и клиентов за секунды» не достигнута. Отображение файла
+        ускоряет только чтение колонок, а объекты модели создаются сразу и целиком:
+        загрузка линейна по числу объектов (около 5 с на 100 000 туров и 100 000 клиентов,
+        то есть 45–50 с на миллион) и ограничена конструкторами моделей, а не вводом-выводом.
+        Ленивые записи поверх отображения не реализованы: агентство, индекс каталога
+        и планировщик работают с готовыми объектами Tour, Person и Employee.
+        @param registry Реестр географии (по умолчанию GEO_REGISTRY)
+        @param visa_index Индекс виз для восстановленных паспортов (по умолчанию визы не индексируются)
+        @return Кортеж (агентство, клиенты в порядке сохранения)
+        """
+        with _collector_paused():
+            return self.__restore(GEO_REGISTRY if registry is None else registry, visa_index)
+
+    def __restore(self, registry: GeoRegistry, visa_index: Optional[VisaIndex]) -> Tuple[TouristAgency, List[Person]]:
+        """
+        @brief Собирает объекты по колонкам (см. restore())
+        @param registry Реестр географии
+        @param visa_index Индекс виз или None
+        @return Кортеж (агентство, клиенты)
+        """
+        text = self.__strings()
+        string = lambda number: None if number == _NO_REF else text[number]
+        optional = lambda value: None if value == NO_VALUE else value
+
+        countries = [registry.country(text[name], text[code], bool(visa)) for name, code, visa in zip(
+            self.__values("countries.name"), self.__values("countries.code"), self.__values("countries.visa"))]
+        cities = [registry.city(text[name], countries[country]) for name, country in zip(
+            self.__values("cities.name"), self.__values("cities.country"))]
+        city = lambda ref: None if ref == _NO_REF else cities[ref]
+        accounts = [BankAccount(total, text[number]) for number, total in zip(
+            self.__values("accounts.id"), self.__values("accounts.sum"))]
+        account = lambda ref: None if ref == _NO_REF else accounts[ref]
+
+        visas = []
+        for row in zip(*(self.__values("visas." + field) for field in
+                         ("number", "country", "issue", "expiry", "entries", "used", "active"))):
+            visa = Visa(text[row[0]], text[row[1]], date.fromordinal(row[2]), date.fromordinal(row[3]), row[4])
+            visa.used_entries, visa.is_active = row[5], bool(row[6])
+            visas.append(visa)
+
+        passports = []
+        for number, name, surname, expiry, visa in zip(*(self.__values("passports." + field) for field in
+                                                         ("number", "name", "surname", "expiry", "visa"))):
+            passports.append(Passport.restore(text[number], text[name], text[surname], date.fromordinal(expiry),
+                                              None if visa == _NO_REF else visas[visa], visa_index))
+
+        persons = []
+        for passport, holder, mood, email, phone in zip(*(self.__values("persons." + field) for field in
+                                                          ("passport", "account", "mood", "email", "phone"))):
+            person = Person(passports[passport], account(holder), mood)
+            if email != _NO_REF or phone != _NO_REF:
+                person.set_contact_info(ContactInfo(string(email) or "", string(phone) or ""))
+            persons.append(person)
+
+        transports = []
+        for row in zip(*(self.__values("transports." + field) for field in
+                         ("kind", "start", "end", "departure", "arrival", "rate", "account",
+                          "number", "company", "seats", "free"))):
+            kind, start, end, departure, arrival, rate, owner, number, company, seats, free = row
+            points = (city(start), city(end), _moment(departure), _moment(arrival))
+            if kind == 1:
+                trans = Flight(*points, rate, string(number), 1)
+            elif kind == 2:
+                trans = Train(*points, rate * 2, string(number), 1)
+            elif kind == 3:
+                trans = Bus(*points, rate, string(number), company)
+            else:
+                trans = Transport(*points, rate)
+            trans.bank_account = account(owner)
+            if seats != NO_VALUE:
+                trans.seats = CapacityCounter(seats)
+                if free < seats:
+                    trans.seats.reserve(seats - free)
+            transports.append(trans)
+
+        accommodations = []
+        for row in zip(*(self.__values("stays." + field) for field in
+                         ("kind", "start", "end", "location", "rate", "account", "first", "second")),
+                       self.__lists("stays.services"), self.__lists("stays.calendar"), self.__lists("stays.nights")):
+            kind, start, end, location, rate, owner, first, second, services, calendar, nights = row
+            start, end = date.fromordinal(start), date.fromordinal(end)
+            if kind == 2:
+                stay = Hostel.restore(start, end, city(location), rate, account(owner), first, second)
+            else:
+                stay = _ACCOMMODATION_KINDS[kind].restore(start, end, city(location), rate, account(owner))
+            if kind == 1:
+                stay.star_rating, stay.services = first, [text[name] for name in services]
+            elif kind == 2:
+                for position in range(0, len(nights), 2):
+                    night = date.fromordinal(nights[position])
+                    for _ in range(nights[position + 1]):
+                        stay.reserve(night, night + timedelta(days=1))
+            elif kind == 3:
+                stay.bedrooms, stay.floor = first, optional(second)
+            for position in range(0, len(calendar), 2):
+                stay.calendar.reserve(date.fromordinal(calendar[position]), date.fromordinal(calendar[position + 1]))
+            accommodations.append(stay)
+
+        services = []
+        for kind, name, price, coverage, weight in zip(*(self.__values("services." + field) for field in
+                                                         ("kind", "name", "price", "coverage", "weight"))):
+            if kind == 1:
+                service = Insurance(string(coverage), price)
+            elif kind == 2:
+                service = VisaSupportService(price)
+            elif kind == 3:
+                service = LuggageService(weight, price)
+            else:
+                service = Service(string(name), price)
+            service.name = string(name)
+            services.append(service)
+
+        sights = [Sight(text[name], countries[country], cities[sight_city]) for name, country, sight_city in zip(
+            self.__values("sights.name"), self.__values("sights.country"), self.__values("sights.city"))]
+
+        bookings = []
+        for kind, person, moment, confirmed, number, target in zip(*(self.__values("bookings." + field) for field in
+                                                                     ("kind", "person", "date", "confirmed", "id",
+                                                                      "target"))):
+            state = dict(person=persons[person], booking_date=_moment(moment), is_confirmed=bool(confirmed),
+                         booking_id=string(number))
+            if kind == 1:
+                state["flight"] = transports[target]
+            elif kind == 2:
+                state["accommodation"] = accommodations[target]
+            bookings.append(_bare(_BOOKING_KINDS[kind], **state))
+
+        tours = []
+        for row in zip(*(self.__values("tours." + field) for field in
+                         ("base", "start", "end", "destination", "commission", "fuel", "price")),
+                       *(self.__lists("tours." + field) for field in
+                         ("transports", "stays", "services", "sights", "bookings"))):
+            base, start, end, destination, commission, fuel, price = row[:7]
+            tour_transports, tour_stays, tour_services, tour_sights, tour_bookings = row[7:]
+            tour = Tour(base, date.fromordinal(start), date.fromordinal(end), cities[destination], commission,
+                        [accommodations[ref] for ref in tour_stays], [transports[ref] for ref in tour_transports],
+                        [services[ref] for ref in tour_services], [bookings[ref] for ref in tour_bookings])
+            tour.set_pricing(commission, fuel, price)
+            tour.sights = [sights[ref] for ref in tour_sights]
+            tours.append(tour)
+
+        staff = []
+        for row in zip(*(self.__values("staff." + field) for field in
+                         ("kind", "id", "name", "hire", "hire_date", "active", "salary", "bonus", "commission",
+                          "handled", "city", "available", "shift_start", "shift_end")),
+                       self.__lists("staff.days"), self.__lists("staff.languages"), self.__lists("staff.calendar")):
+            (kind, number, name, hire, hired_on_date, active, salary, bonus, commission, handled, guide_city,
+             available, shift_start, shift_end, days, languages, calendar) = row
+            hire = date.fromordinal(hire) if hired_on_date else _moment(hire)
+            if kind == 0:
+                employee = TravelAgent(text[number], text[name], hire, commission)
+                employee.bookings_handled = handled
+            elif kind == 1:
+                employee = Manager(text[number], text[name], hire)
+            else:
+                employee = Guide(text[number], text[name], hire, [text[language] for language in languages],
+                                 cities[guide_city])
+                employee.is_available = bool(available)
+                for position in range(0, len(calendar), 2):
+                    employee.calendar.reserve(date.fromordinal(calendar[position]),
+                                              date.fromordinal(calendar[position + 1]))
+            employee.is_active = bool(active)
+            employee.salary = Salary(salary, bonus)
+            if shift_start != _NO_REF:
+                employee.work_schedule = WorkSchedule(employee, text[shift_start], text[shift_end],
+                                                      [text[day] for day in days])
+            elif kind != 2:
+                employee.work_schedule = None
+            staff.append(employee)
+
+        agency = TouristAgency(text[self.__values("agency.name")[0]], accounts[self.__values("agency.account")[0]])
+        agency.add_tours([tours[ref] for ref in self.__values("agency.tours")])
+        for ref in self.__values("agency.staff"):
+            employee = staff[ref]
+            if isinstance(employee, Manager):
+                agency.add_manager(employee)
+            elif isinstance(employee, TravelAgent):
+                agency.add_agent(employee)
+            else:
+                agency.add_guide(employee)
+                for _ in range(len(employee.calendar)):
+                    agency.scheduler.assign(employee)
+        return agency, [persons[ref] for ref in self.__values("agency.clients")]
+
+    def __release(self):
+        """
+        @brief Освобождает выданные представления колонок
+        """
+        for view in reversed(self.__views):
+            view.release()
+        self.__views.clear()
+
+    def close(self):
+        """
+        @brief Закрывает снимок
+        @note Колонки, полученные через column(), после закрытия недоступны
+        """
+        self.__release()
+        self.__map.close()
+        self.__file.close()
+
+    def __enter__(self) -> 'AgencySnapshot':
+        """@brief Вход в контекстный менеджер"""
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        """@brief Выход из контекстного менеджера (закрывает снимок)"""
+        self.close()
@@ -1,5 +1,6 @@
 from datetime import date
-from typing import List
+from typing import Callable, List, Optional, Tuple
+from weakref import WeakMethod
 from .geography import City
 from models.people.person import Person as Client
 from models.docs.visa import Visa
@@ -8,6 +9,7 @@ from .transport import Transport
 from services.services import Service
 from .booking import Booking
 from services.bank_account import Transaction, BankAccount
+from services.events import emit
 
 class TourAndVisaIncompatible(Exception):
     """
@@ -35,6 +37,10 @@ class Tour:
     @brief Представляет туристический тур
     @details Объединяет проживание, транспорт, услуги и достопримечательности в одном путешествии.
     Поддерживает проверку визы, расчёт полной стоимости и бронирование.
+    Изменения цены и состава транспорта через методы тура сообщаются подписчикам
+    (например, индексу каталога TourIndex), см. subscribe().
+    Цена, комиссия и топливная надбавка тура агентства хранятся в ценовых колонках
+    каталога (CatalogPricing), см. attach_pricing().
     """
 
     def __init__(
@@ -65,6 +71,8 @@ class Tour:
         if end_date <= start_date:
             raise EndAndStartDateError()
 
+        self.__pricing = None
+        self.__pricing_row = 0
         self.base_cost = base_cost
         self.start_date = start_date
         self.end_date = end_date
@@ -73,68 +81,302 @@ class Tour:
         self.transports = transports or []
         self.services = services or []
         self.commission_rate = commission_rate
+        self.fuel_surcharge = 0.0
         self.sights = []
         self.bookings = bookings or []
+        self.__watchers: List[WeakMethod] = []
 
-        self.price = self.__calculate_total_price()
+        self.__transport_costs = [self.__transport_cost(trans) for trans in self.transports]
+        self.__accommodation_costs = [acc.price for acc in self.accommodations]
+        self.__service_costs = [service.price for service in self.services]
+        self.__transport_total = sum(self.__transport_costs)
+        self.__accommodation_total = sum(self.__accommodation_costs)
+        self.__service_total = sum(self.__service_costs)
+        self.__update_price()
 
-    def __calculate_total_price(self) -> float:
+    @property
+    def price(self) -> float:
         """
-        @brief Рассчитывает полную стоимость тура
-        @details Суммирует базовую стоимость, проживание, транспорт, услуги и добавляет комиссию.
-        @return Общая стоимость тура с комиссией
+        @brief Итоговая цена тура
+        @return Цена из колонки каталога или собственная цена тура
         """
-        total = self.base_cost
+        pricing = self.__pricing
+        return self.__price if pricing is None else pricing.prices[self.__pricing_row]
 
-        for trans in self.transports:
-            hours = (trans.end_time - trans.start_time).total_seconds() / 3600
-            total += trans.price_for_hour * hours
+    @price.setter
+    def price(self, value: float):
+        pricing = self.__pricing
+        if pricing is None:
+            self.__price = value
+        else:
+            pricing.prices[self.__pricing_row] = value
+
+    @property
+    def commission_rate(self) -> float:
+        """
+        @brief Комиссия агентства
+        @return Комиссия из колонки каталога или собственная комиссия тура
+        """
+        pricing = self.__pricing
+        return self.__commission_rate if pricing is None else pricing.commission_rates[self.__pricing_row]
+
+    @commission_rate.setter
+    def commission_rate(self, value: float):
+        pricing = self.__pricing
+        if pricing is None:
+            self.__commission_rate = value
+        else:
+            pricing.commission_rates[self.__pricing_row] = value
+
+    @property
+    def fuel_surcharge(self) -> float:
+        """
+        @brief Топливная надбавка к стоимости транспорта
+        @return Надбавка из колонки каталога или собственная надбавка тура
+        """
+        pricing = self.__pricing
+        return self.__fuel_surcharge if pricing is None else pricing.fuel_surcharges[self.__pricing_row]
+
+    @fuel_surcharge.setter
+    def fuel_surcharge(self, value: float):
+        pricing = self.__pricing
+        if pricing is None:
+            self.__fuel_surcharge = value
+        else:
+            pricing.fuel_surcharges[self.__pricing_row] = value
+
+    def attach_pricing(self, pricing, row: int):
+        """
+        @brief Переносит цену, комиссию и надбавку тура в ценовые колонки каталога
+        @details Вызывается CatalogPricing.add() после записи текущих значений в строку row;
+        дальше тур читает и пишет эти значения в колонках, поэтому пакетный пересчёт
+        каталога меняет цену тура без обхода объектов.
+        @param pricing Объект CatalogPricing
+        @param row Строка тура в колонках
+        """
+        self.__pricing = pricing
+        self.__pricing_row = row
+
+    def detach_pricing(self):
+        """
+        @brief Возвращает цену, комиссию и надбавку из колонок каталога в сам тур
+        """
+        if self.__pricing is None:
+            return
+        price, commission_rate, fuel_surcharge = self.price, self.commission_rate, self.fuel_surcharge
+        self.__pricing = None
+        self.__price, self.__commission_rate, self.__fuel_surcharge = price, commission_rate, fuel_surcharge
+
+    def get_pricing(self):
+        """
+        @brief Возвращает каталог, в колонках которого хранится цена тура
+        @return Объект CatalogPricing или None
+        """
+        return self.__pricing
 
-        for acc in self.accommodations:
-            total += acc.price
+    def get_cost_totals(self) -> Tuple[float, float, float, float]:
+        """
+        @brief Возвращает накопленные суммы по компонентам стоимости
+        @return Кортеж (базовая стоимость, транспорт, проживание, услуги); транспорт —
+        по стоимостям, учтённым при добавлении (см. refresh_transport())
+        """
+        return self.base_cost, self.__transport_total, self.__accommodation_total, self.__service_total
+
+    @staticmethod
+    def __transport_cost(trans: Transport) -> float:
+        """
+        @brief Рассчитывает стоимость одного транспорта в составе тура
+        @param trans Объект Transport
+        @return price_for_hour * продолжительность (в часах)
+        """
+        hours = (trans.end_time - trans.start_time).total_seconds() / 3600
+        return trans.price_for_hour * hours
+
+    def __update_price(self):
+        """
+        @brief Обновляет итоговую цену тура по накопленным суммам
+        @details Применяет комиссию к сумме базовой стоимости и накопленных итогов
+        по компонентам за O(1), не обходя списки транспорта, проживания и услуг.
+        """
+        self.price = self.get_subtotal() * (1 + self.commission_rate)
+        self.__changed()
+
+    def __changed(self):
+        """
+        @brief Сообщает подписчикам об изменении цены или транспорта тура
+        """
+        if not self.__watchers:
+            return
+        alive = [reference for reference in self.__watchers if reference() is not None]
+        self.__watchers = alive
+        for reference in alive:
+            watcher = reference()
+            if watcher is not None:
+                watcher(self)
+
+    def subscribe(self, watcher: Callable[['Tour'], None]):
+        """
+        @brief Подписывает метод объекта на изменения цены и транспорта тура
+        @details Тур хранит слабую ссылку на метод, поэтому подписка не продлевает жизнь
+        подписчику (например, временному индексу фильтрации).
+        @param watcher Связанный метод, вызываемый с туром после изменения
+        (повторная подписка игнорируется)
+        @note Даты и город назначения меняются прямым присваиванием и подписчикам не сообщаются:
+        после такого изменения тур нужно переиндексировать явно (TourIndex.update)
+        """
+        reference = WeakMethod(watcher)
+        if reference not in self.__watchers:
+            self.__watchers.append(reference)
+
+    def unsubscribe(self, watcher: Callable[['Tour'], None]):
+        """
+        @brief Отписывает функцию от изменений тура
+        @param watcher Ранее подписанный метод (неизвестный игнорируется)
+        """
+        reference = WeakMethod(watcher)
+        if reference in self.__watchers:
+            self.__watchers.remove(reference)
+
+    def get_subtotal(self) -> float:
+        """
+        @brief Возвращает стоимость тура без комиссии
+        @return Базовая стоимость + транспорт (с топливной надбавкой) + проживание + услуги
+        """
+        return (self.base_cost + self.__transport_total * (1 + self.fuel_surcharge)
+                + self.__accommodation_total + self.__service_total)
 
-        for service in self.services:
-            total += service.price
+    def get_price_breakdown(self) -> dict:
+        """
+        @brief Возвращает разбивку стоимости тура без пересчёта компонентов
+        @return Словарь с ключами base, transport, fuel_surcharge, accommodation, services,
+        subtotal, commission, total
+        """
+        subtotal = self.get_subtotal()
+        return {
+            "base": self.base_cost,
+            "transport": self.__transport_total,
+            "fuel_surcharge": self.__transport_total * self.fuel_surcharge,
+            "accommodation": self.__accommodation_total,
+            "services": self.__service_total,
+            "subtotal": subtotal,
+            "commission": subtotal * self.commission_rate,
+            "total": self.price,
+        }
 
-        total += total * self.commission_rate
+    def set_commission_rate(self, commission_rate: float):
+        """
+        @brief Изменяет комиссию агентства и пересчитывает цену за O(1)
+        @param commission_rate Новая комиссия (например, 0.05 для 5%)
+        """
+        self.commission_rate = commission_rate
+        self.__update_price()
 
-        return total
+    def set_pricing(self, commission_rate: float, fuel_surcharge: float, price: float = None):
+        """
+        @brief Устанавливает комиссию, топливную надбавку и итоговую цену
+        @param commission_rate Комиссия агентства
+        @param fuel_surcharge Надбавка к стоимости транспорта (например, 0.1 для 10%)
+        @param price Уже рассчитанная цена (например, при пакетном пересчёте каталога);
+        если не задана, цена пересчитывается по накопленным суммам
+        """
+        self.commission_rate = commission_rate
+        self.fuel_surcharge = fuel_surcharge
+        if price is None:
+            self.__update_price()
+        else:
+            self.price = price
+            self.__changed()
 
     def add_booking(self, booking: Booking):
         """
         @brief Добавляет бронирование в тур
         @param booking Объект Booking для добавления
-        @note После добавления пересчитывается общая стоимость тура
+        @note Бронирования не влияют на стоимость, поэтому цена не пересчитывается
         """
         self.bookings.append(booking)
-        self.price = self.__calculate_total_price()
 
     def add_accommodation(self, accommodation: Accomodation):
         """
         @brief Добавляет проживание в тур
         @param accommodation Объект Accomodation для добавления
-        @note После добавления пересчитывается общая стоимость тура
+        @note Стоимость проживания прибавляется к цене тура за O(1)
         """
         self.accommodations.append(accommodation)
-        self.price = self.__calculate_total_price()
+        self.__accommodation_costs.append(accommodation.price)
+        self.__accommodation_total += accommodation.price
+        self.__update_price()
 
     def add_transport(self, transport: Transport):
         """
         @brief Добавляет транспорт в тур
         @param transport Объект Transport для добавления
-        @note После добавления пересчитывается общая стоимость тура
+        @note Стоимость транспорта прибавляется к цене тура за O(1)
         """
+        cost = self.__transport_cost(transport)
         self.transports.append(transport)
-        self.price = self.__calculate_total_price()
+        self.__transport_costs.append(cost)
+        self.__transport_total += cost
+        self.__update_price()
 
     def add_service(self, service: Service):
         """
         @brief Добавляет дополнительную услугу в тур
         @param service Объект Service для добавления
-        @note После добавления пересчитывается общая стоимость тура
+        @note Стоимость услуги прибавляется к цене тура за O(1)
         """
         self.services.append(service)
-        self.price = self.__calculate_total_price()
+        self.__service_costs.append(service.price)
+        self.__service_total += service.price
+        self.__update_price()
+
+    def remove_accommodation(self, accommodation: Accomodation):
+        """
+        @brief Удаляет проживание из тура
+        @param accommodation Объект Accomodation, ранее добавленный в тур
+        @exception ValueError Если проживания нет в туре
+        @note Из цены вычитается сумма, учтённая при добавлении
+        """
+        position = self.accommodations.index(accommodation)
+        del self.accommodations[position]
+        self.__accommodation_total -= self.__accommodation_costs.pop(position)
+        self.__update_price()
+
+    def remove_transport(self, transport: Transport):
+        """
+        @brief Удаляет транспорт из тура
+        @param transport Объект Transport, ранее добавленный в тур
+        @exception ValueError Если транспорта нет в туре
+        @note Из цены вычитается сумма, учтённая при добавлении
+        """
+        position = self.transports.index(transport)
+        del self.transports[position]
+        self.__transport_total -= self.__transport_costs.pop(position)
+        self.__update_price()
+
+    def refresh_transport(self, transport: Transport):
+        """
+        @brief Пересчитывает стоимость транспорта после изменения его расписания или тарифа
+        @param transport Объект Transport, ранее добавленный в тур
+        @exception ValueError Если транспорта нет в туре
+        @note Цена тура корректируется на разницу за O(1), порядок транспорта не меняется
+        """
+        position = self.transports.index(transport)
+        cost = self.__transport_cost(transport)
+        self.__transport_total += cost - self.__transport_costs[position]
+        self.__transport_costs[position] = cost
+        self.__update_price()
+
+    def remove_service(self, service: Service):
+        """
+        @brief Удаляет услугу из тура
+        @param service Объект Service, ранее добавленный в тур
+        @exception ValueError Если услуги нет в туре
+        @note Из цены вычитается сумма, учтённая при добавлении
+        """
+        position = self.services.index(service)
+        del self.services[position]
+        self.__service_total -= self.__service_costs.pop(position)
+        self.__update_price()
 
     def add_sight(self, sight):
         """
@@ -145,7 +387,7 @@ class Tour:
         if sight.city == self.destination:
             self.sights.append(sight)
         else:
-            print(f"Sight is not in the tour destination: {self.destination}")
+            emit("sight_outside_destination", destination=self.destination)
 
     def check_visa(self, client: Client) -> bool:
         """
@@ -178,18 +420,45 @@ class Tour:
         @return True, если бронирование успешно; False в случае ошибки визы или нехватки средств
         @note При успехе создаётся транзакция на сумму self.price
         """
+        if not self.__can_book(client):
+            return False
+
+        Transaction(client.bank_account, travel_agency_bank_account, self.price)
+        emit("tour_booked", destination=self.destination, price=self.price)
+        return True
+
+    async def book_async(self, client: Client, travel_agency_bank_account: BankAccount) -> bool:
+        """
+        @brief Асинхронно бронирует тур для клиента
+        @details Проверки те же, что в book(); оплата проводится через Transaction.create_async,
+        поэтому ожидание блокировок счетов не блокирует цикл событий.
+        @param client Клиент, бронирующий тур
+        @param travel_agency_bank_account Банковский счёт туристического агентства
+        @return True, если бронирование успешно; False в случае ошибки визы или нехватки средств
+        @exception NotEnoughMoney Если баланс клиента уменьшился между проверкой и оплатой
+        """
+        if not self.__can_book(client):
+            return False
+
+        await Transaction.create_async(client.bank_account, travel_agency_bank_account, self.price)
+        emit("tour_booked", destination=self.destination, price=self.price)
+        return True
+
+    def __can_book(self, client: Client) -> bool:
+        """
+        @brief Проверяет визу и баланс клиента перед бронированием
+        @param client Клиент, бронирующий тур
+        @return True, если виза совместима и средств достаточно; иначе False (с событием)
+        """
         try:
             self.check_visa(client)
         except TourAndVisaIncompatible as e:
-            print(e)
+            emit("tour_visa_incompatible", error=e)
             return False
 
         if client.bank_account.sum < self.price:
-            print("Not enough money to book the tour.")
+            emit("tour_not_enough_money", price=self.price)
             return False
-
-        Transaction(client.bank_account, travel_agency_bank_account, self.price)
-        print(f"Tour to {self.destination} booked successfully for {self.price:.2f}!")
         return True
 
     def get_total_duration(self) -> int:
@@ -217,8 +486,8 @@ class Tour:
         @brief Обработка обращения к несуществующему атрибуту
         @param name Имя запрашиваемого атрибута
         @return None (вместо исключения)
-        @note Выводит сообщение "attribute not found" в консоль
+        @note Отправляет событие attribute_missing (services.events)
         @warning Этот подход скрывает ошибки опечаток в именах атрибутов
         """
-        print("attribute not found")
+        emit("attribute_missing", name=name)
         return None
\ No newline at end of file
@@ -0,0 +1,476 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from .geography import Country
+from .tour import Tour
+
+
+class TourIndex:
+    """
+    @brief Постоянный индекс каталога туров
+    @details Хранит туры в нескольких структурах, чтобы фильтрация не сканировала весь каталог:
+        - массив, отсортированный по цене;
+        - хеш-корзины по стране назначения, ключ — geo_id страны из реестра GeoRegistry
+          (проверки по стране — сравнения целых чисел, названия в индексе не участвуют);
+        - два отсортированных массива дат (по началу и по окончанию тура);
+        - битовые маски видов транспорта для каждого тура.
+    Каждому туру присваивается внутренний целочисленный идентификатор (позиция в индексе).
+    Индекс подписывается на свои туры (Tour.subscribe): изменение цены или транспорта
+    тура помечает его запись, и помеченные записи переиндексируются при следующем чтении.
+    Даты и город назначения тур не сообщает — после их изменения нужен update().
+    """
+
+    def __init__(self, tours: Optional[Iterable[Tour]] = None):
+        """
+        @brief Конструктор индекса
+        @param tours Туры для начальной загрузки (по умолчанию пустой индекс)
+        """
+        self.__transport_types: Dict[type, int] = {}
+        self.__load(tours or [])
+
+    def __load(self, tours: Iterable[Tour]):
+        """
+        @brief Заполняет индекс заново одним проходом
+        @details Колонки заполняются добавлением в конец, а отсортированные массивы
+        сортируются один раз — O(n log n) вместо n вставок со сдвигом.
+        @param tours Туры для загрузки
+        """
+        self.__tours: List[Optional[Tour]] = []
+        self.__ids: Dict[int, int] = {}
+        self.__prices: List[float] = []
+        self.__countries: List[int] = []
+        self.__starts: List[date] = []
+        self.__ends: List[date] = []
+        self.__transport_bits: List[int] = []
+        self.__by_country: Dict[int, Set[int]] = {}
+        self.__free: List[int] = []
+        self.__dirty: Set[int] = set()
+        for tour in tours:
+            if id(tour) in self.__ids:
+                continue
+            tour.subscribe(self.__mark)
+            tour_id = len(self.__tours)
+            country = tour.destination.country.geo_id
+            self.__tours.append(tour)
+            self.__ids[id(tour)] = tour_id
+            self.__prices.append(tour.price)
+            self.__countries.append(country)
+            self.__starts.append(tour.start_date)
+            self.__ends.append(tour.end_date)
+            self.__transport_bits.append(self.transport_mask(tour.transports))
+            self.__by_country.setdefault(country, set()).add(tour_id)
+        self.__by_price: List[Tuple[float, int]] = sorted(zip(self.__prices, range(len(self.__tours))))
+        self.__by_start: List[Tuple[date, int]] = sorted(zip(self.__starts, range(len(self.__tours))))
+        self.__by_end: List[Tuple[date, int]] = sorted(zip(self.__ends, range(len(self.__tours))))
+
+    def __mark(self, tour: Tour):
+        """
+        @brief Помечает запись тура как устаревшую (вызывается туром при изменении)
+        @param tour Изменившийся тур
+        """
+        tour_id = self.__ids.get(id(tour))
+        if tour_id is not None:
+            self.__dirty.add(tour_id)
+
+    def __sync(self):
+        """
+        @brief Переиндексирует туры, изменившиеся после последнего чтения
+        @details Пометки накапливаются, поэтому серия изменений одного тура переиндексирует
+        его один раз. Идентификаторы туров при этом не меняются.
+        """
+        while self.__dirty:
+            self.update(self.__tours[self.__dirty.pop()])
+
+    def rebuild(self):
+        """
+        @brief Перестраивает индекс по текущему состоянию туров
+        @details Используется после массового изменения туров, когда переиндексация
+        по одному туру обошлась бы в O(n) на каждый тур. Идентификаторы туров не меняются.
+        """
+        self.__dirty.clear()
+        self.__by_country = {}
+        for tour_id in self.__ids.values():
+            self.__fill(tour_id, self.__tours[tour_id])
+        self.__by_price = sorted((self.__prices[tour_id], tour_id) for tour_id in self.__ids.values())
+        self.__by_start = sorted((self.__starts[tour_id], tour_id) for tour_id in self.__ids.values())
+        self.__by_end = sorted((self.__ends[tour_id], tour_id) for tour_id in self.__ids.values())
+
+    def set_prices(self, prices: Sequence[float]):
+        """
+        @brief Записывает столбец цен целиком
+        @details Используется после пакетного пересчёта (CatalogPricing.reprice), когда туры
+        читают цену из столбца и не сообщают об изменении: элемент i столбца — цена тура
+        с идентификатором i (элементы свободных строк игнорируются). Массив, отсортированный
+        по цене, пересобирается одной сортировкой; остальные структуры не затрагиваются.
+        @param prices Столбец цен длиной не меньше rows()
+        @exception ValueError Если столбец короче rows()
+        """
+        if len(prices) < len(self.__tours):
+            raise ValueError("Price column is shorter than the index")
+        self.__prices = list(prices[:len(self.__tours)])
+        self.__by_price = sorted((self.__prices[tour_id], tour_id) for tour_id in self.__ids.values())
+
+    def rows(self) -> int:
+        """
+        @brief Количество строк в колонках индекса (включая свободные)
+        @return Число строк; не превышает наибольшего числа одновременно хранимых туров
+        """
+        return len(self.__tours)
+
+    def __len__(self) -> int:
+        """
+        @brief Количество туров в индексе
+        @return Число проиндексированных туров
+        """
+        return len(self.__ids)
+
+    def __contains__(self, tour: Tour) -> bool:
+        """
+        @brief Проверяет, проиндексирован ли тур
+        @param tour Объект Tour
+        @return True, если тур есть в индексе
+        """
+        return id(tour) in self.__ids
+
+    def __transport_bit(self, transport_type: type) -> int:
+        """
+        @brief Возвращает бит, закреплённый за видом транспорта
+        @param transport_type Класс транспорта (Flight, Train, Bus, ...)
+        @return Битовая маска из одного бита
+        """
+        bit = self.__transport_types.get(transport_type)
+        if bit is None:
+            bit = 1 << len(self.__transport_types)
+            self.__transport_types[transport_type] = bit
+        return bit
+
+    def transport_mask(self, transports: Iterable) -> int:
+        """
+        @brief Строит битовую маску видов транспорта
+        @param transports Объекты транспорта или их классы
+        @return Объединение битов всех указанных видов транспорта
+        """
+        mask = 0
+        for transport in transports:
+            transport_type = transport if isinstance(transport, type) else type(transport)
+            mask |= self.__transport_bit(transport_type)
+        return mask
+
+    def add(self, tour: Tour) -> int:
+        """
+        @brief Добавляет тур в индекс
+        @param tour Объект Tour
+        @return Внутренний идентификатор тура
+        @note Повторное добавление того же тура обновляет его запись (см. update())
+        """
+        if id(tour) in self.__ids:
+            return self.update(tour)
+        tour_id = self.__append(tour)
+        self.__insort(tour_id)
+        return tour_id
+
+    def __insort(self, tour_id: int):
+        """
+        @brief Вставляет запись тура в отсортированные массивы
+        @param tour_id Идентификатор тура с заполненными колонками
+        """
+        insort(self.__by_price, (self.__prices[tour_id], tour_id))
+        insort(self.__by_start, (self.__starts[tour_id], tour_id))
+        insort(self.__by_end, (self.__ends[tour_id], tour_id))
+
+    def __detach(self, tour_id: int):
+        """
+        @brief Убирает запись тура из отсортированных массивов и корзины страны
+        @param tour_id Идентификатор проиндексированного тура
+        """
+        self.__by_price.pop(bisect_left(self.__by_price, (self.__prices[tour_id], tour_id)))
+        self.__by_start.pop(bisect_left(self.__by_start, (self.__starts[tour_id], tour_id)))
+        self.__by_end.pop(bisect_left(self.__by_end, (self.__ends[tour_id], tour_id)))
+        bucket = self.__by_country[self.__countries[tour_id]]
+        bucket.discard(tour_id)
+        if not bucket:
+            del self.__by_country[self.__countries[tour_id]]
+
+    def __fill(self, tour_id: int, tour: Tour):
+        """
+        @brief Записывает текущее состояние тура в колонки и корзину страны
+        @param tour_id Идентификатор строки колонок
+        @param tour Объект Tour
+        """
+        country = tour.destination.country.geo_id
+        self.__tours[tour_id] = tour
+        self.__prices[tour_id] = tour.price
+        self.__countries[tour_id] = country
+        self.__starts[tour_id] = tour.start_date
+        self.__ends[tour_id] = tour.end_date
+        self.__transport_bits[tour_id] = self.transport_mask(tour.transports)
+        self.__by_country.setdefault(country, set()).add(tour_id)
+
+    def __append(self, tour: Tour) -> int:
+        """
+        @brief Заносит новый тур в колонки и корзину страны (без отсортированных массивов)
+        @details Строка удалённого тура используется повторно, поэтому число строк
+        колонок не превышает наибольшего числа одновременно проиндексированных туров.
+        @param tour Объект Tour, которого ещё нет в индексе
+        @return Внутренний идентификатор тура
+        """
+        if self.__free:
+            tour_id = self.__free.pop()
+        else:
+            tour_id = len(self.__tours)
+            self.__tours.append(None)
+            self.__prices.append(0.0)
+            self.__countries.append(0)
+            self.__starts.append(None)
+            self.__ends.append(None)
+            self.__transport_bits.append(0)
+        self.__ids[id(tour)] = tour_id
+        self.__fill(tour_id, tour)
+        tour.subscribe(self.__mark)
+        return tour_id
+
+    def add_many(self, tours: Iterable[Tour]):
+        """
+        @brief Добавляет много туров одним слиянием
+        @details Вместо n вставок со сдвигом (O(n) каждая) новые записи дописываются
+        в конец отсортированных массивов, и массивы пересортировываются: Timsort
+        сливает две упорядоченные серии за линейное время.
+        @param tours Объекты Tour (уже проиндексированные туры обновляются через update())
+        """
+        added = []
+        for tour in tours:
+            if id(tour) in self.__ids:
+                self.update(tour)
+            else:
+                added.append(self.__append(tour))
+        if not added:
+            return
+        self.__by_price = sorted(self.__by_price + [(self.__prices[tour_id], tour_id) for tour_id in added])
+        self.__by_start = sorted(self.__by_start + [(self.__starts[tour_id], tour_id) for tour_id in added])
+        self.__by_end = sorted(self.__by_end + [(self.__ends[tour_id], tour_id) for tour_id in added])
+
+    def remove(self, tour: Tour):
+        """
+        @brief Удаляет тур из индекса
+        @param tour Объект Tour
+        @exception KeyError Если тур не проиндексирован
+        @note Строка тура освобождается и достаётся следующему добавленному туру
+        """
+        tour_id = self.__ids.pop(id(tour))
+        tour.unsubscribe(self.__mark)
+        self.__dirty.discard(tour_id)
+        self.__detach(tour_id)
+        self.__tours[tour_id] = None
+        self.__free.append(tour_id)
+
+    def update(self, tour: Tour) -> int:
+        """
+        @brief Переиндексирует тур после изменения его цены, дат или транспорта
+        @details Запись обновляется на месте под тем же идентификатором: старые ключи
+        убираются из отсортированных массивов, новые вставляются бинарным поиском.
+        @param tour Объект Tour (ещё не проиндексированный тур добавляется)
+        @return Внутренний идентификатор тура
+        """
+        tour_id = self.__ids.get(id(tour))
+        if tour_id is None:
+            return self.add(tour)
+        self.__dirty.discard(tour_id)
+        self.__detach(tour_id)
+        self.__fill(tour_id, tour)
+        self.__insort(tour_id)
+        return tour_id
+
+    def id_of(self, tour: Tour) -> int:
+        """
+        @brief Возвращает внутренний идентификатор тура
+        @param tour Объект Tour
+        @return Идентификатор тура в индексе
+        @exception KeyError Если тур не проиндексирован
+        """
+        return self.__ids[id(tour)]
+
+    def get_tour(self, tour_id: int) -> Tour:
+        """
+        @brief Возвращает тур по внутреннему идентификатору
+        @param tour_id Идентификатор тура в индексе
+        @return Объект Tour
+        """
+        return self.__tours[tour_id]
+
+    def price_of(self, tour_id: int) -> float:
+        """
+        @brief Возвращает проиндексированную цену тура
+        @param tour_id Идентификатор тура в индексе
+        @return Цена тура
+        """
+        self.__sync()
+        return self.__prices[tour_id]
+
+    def country_of(self, tour_id: int) -> Country:
+        """
+        @brief Возвращает страну назначения тура
+        @param tour_id Идентификатор тура в индексе
+        @return Объект Country
+        """
+        self.__sync()
+        return self.__tours[tour_id].destination.country
+
+    def country_id_of(self, tour_id: int) -> int:
+        """
+        @brief Возвращает номер страны назначения тура
+        @param tour_id Идентификатор тура в индексе
+        @return geo_id страны назначения
+        """
+        self.__sync()
+        return self.__countries[tour_id]
+
+    def dates_of(self, tour_id: int) -> Tuple[date, date]:
+        """
+        @brief Возвращает даты начала и окончания тура
+        @param tour_id Идентификатор тура в индексе
+        @return Кортеж (start_date, end_date)
+        """
+        self.__sync()
+        return self.__starts[tour_id], self.__ends[tour_id]
+
+    def transport_bits_of(self, tour_id: int) -> int:
+        """
+        @brief Возвращает битовую маску видов транспорта тура
+        @param tour_id Идентификатор тура в индексе
+        @return Битовая маска
+        """
+        self.__sync()
+        return self.__transport_bits[tour_id]
+
+    def __price_bounds(self, min_price: float, max_price: float) -> Tuple[int, int]:
+        """
+        @brief Находит границы ценового диапазона в отсортированном массиве
+        @return Кортеж (первая позиция, позиция за последней)
+        """
+        low = bisect_left(self.__by_price, (min_price, -1))
+        high = bisect_right(self.__by_price, (max_price, len(self.__tours)))
+        return low, high
+
+    def count_by_price(self, min_price: float, max_price: float) -> int:
+        """
+        @brief Подсчитывает туры в ценовом диапазоне за O(log n)
+        @param min_price Нижняя граница цены (включительно)
+        @param max_price Верхняя граница цены (включительно)
+        @return Количество туров
+        """
+        self.__sync()
+        low, high = self.__price_bounds(min_price, max_price)
+        return high - low
+
+    def iter_by_price(self, min_price: float = float("-inf"), max_price: float = float("inf"),
+                      rise: bool = True, after: Optional[Tuple[float, int]] = None) -> Iterator[int]:
+        """
+        @brief Лениво перечисляет туры в ценовом диапазоне
+        @param min_price Нижняя граница цены (включительно)
+        @param max_price Верхняя граница цены (включительно)
+        @param rise True — по возрастанию цены, False — по убыванию
+        @param after Ключ (цена, идентификатор), после которого продолжить обход (не включительно)
+        @return Итератор идентификаторов туров в порядке цены
+        """
+        self.__sync()
+        low, high = self.__price_bounds(min_price, max_price)
+        if after is not None:
+            if rise:
+                low = max(low, bisect_right(self.__by_price, after))
+            else:
+                high = min(high, bisect_left(self.__by_price, after))
+        positions = range(low, high) if rise else range(high - 1, low - 1, -1)
+        return (self.__by_price[position][1] for position in positions)
+
+    def price_key(self, tour_id: int) -> Tuple[float, int]:
+        """
+        @brief Возвращает ключ упорядочивания тура по цене
+        @param tour_id Идентификатор тура в индексе
+        @return Кортеж (цена, идентификатор); идентификатор разрешает равенство цен
+        """
+        self.__sync()
+        return self.__prices[tour_id], tour_id
+
+    def count_by_country(self, geo_ids: Iterable[int]) -> int:
+        """
+        @brief Подсчитывает туры в страны за O(k)
+        @param geo_ids geo_id стран (например, GeoRegistry.country_ids(название))
+        @return Количество туров
+        """
+        self.__sync()
+        return sum(len(self.__by_country.get(geo_id, ())) for geo_id in geo_ids)
+
+    def ids_by_country(self, geo_ids: Iterable[int]) -> Tuple[int, ...]:
+        """
+        @brief Находит туры по стране назначения
+        @param geo_ids geo_id стран
+        @return Снимок идентификаторов туров (пустой, если туров в эти страны нет)
+        @note Возвращается копия корзин, поэтому добавление и изменение туров во время
+        ленивого обхода результата не ломают итерацию
+        """
+        self.__sync()
+        return tuple(tour_id for geo_id in geo_ids for tour_id in self.__by_country.get(geo_id, ()))
+
+    def __date_bounds(self, start_date: date, end_date: date) -> Tuple[int, int]:
+        """
+        @brief Находит границы интервала дат в отсортированных массивах
+        @return Кортеж (первая позиция с началом >= start_date, позиция за последним окончанием <= end_date)
+        """
+        first_start = bisect_left(self.__by_start, (start_date, -1))
+        last_end = bisect_right(self.__by_end, (end_date, len(self.__tours)))
+        return first_start, last_end
+
+    def count_by_date(self, start_date: date, end_date: date) -> int:
+        """
+        @brief Оценивает число туров внутри интервала дат за O(log n)
+        @return Верхняя оценка: размер меньшей из двух выборок по границам
+        """
+        self.__sync()
+        first_start, last_end = self.__date_bounds(start_date, end_date)
+        return min(len(self.__by_start) - first_start, last_end)
+
+    def iter_by_date(self, start_date: date, end_date: date) -> Iterator[int]:
+        """
+        @brief Лениво перечисляет туры, целиком лежащие в интервале дат
+        @details Берёт меньшую из двух выборок (начало >= start_date или окончание <= end_date)
+        и проверяет вторую границу только для неё.
+        @param start_date Самая ранняя допустимая дата начала
+        @param end_date Самая поздняя допустимая дата окончания
+        @return Итератор идентификаторов туров
+        """
+        self.__sync()
+        first_start, last_end = self.__date_bounds(start_date, end_date)
+        if len(self.__by_start) - first_start <= last_end:
+            return (tour_id for _, tour_id in islice(self.__by_start, first_start, None)
+                    if self.__ends[tour_id] <= end_date)
+        return (tour_id for _, tour_id in islice(self.__by_end, last_end)
+                if self.__starts[tour_id] >= start_date)
+
+    def iter_ids(self) -> Iterator[int]:
+        """
+        @brief Перечисляет все туры индекса
+        @return Итератор идентификаторов туров
+        """
+        return iter(self.__ids.values())
+
+    def order_by_price(self, ids: Iterable[int], rise: bool = True) -> List[Tour]:
+        """
+        @brief Упорядочивает туры по цене
+        @param ids Идентификаторы туров
+        @param rise True — по возрастанию цены, False — по убыванию
+        @return Список объектов Tour
+        """
+        self.__sync()
+        ordered = sorted(ids, key=self.price_key, reverse=not rise)
+        return [self.__tours[tour_id] for tour_id in ordered]
+
+    def sorted_by_price(self, rise: bool = True) -> List[Tour]:
+        """
+        @brief Возвращает весь каталог, упорядоченный по цене, без сортировки
+        @param rise True — по возрастанию цены, False — по убыванию
+        @return Список объектов Tour
+        """
+        self.__sync()
+        entries = self.__by_price if rise else reversed(self.__by_price)
+        return [self.__tours[tour_id] for _, tour_id in entries]
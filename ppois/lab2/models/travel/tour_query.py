@@ -0,0 +1,377 @@
+from datetime import date
+from heapq import nlargest, nsmallest
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from models.docs.visa import Visa
+from .geography import GEO_REGISTRY, Country, GeoRegistry
+from .tour import Tour
+from .tour_index import TourIndex
+
+
+class TourPredicate:
+    """
+    @brief Базовый класс условия поиска тура
+    @details Условие умеет оценить свою селективность по индексу, выдать кандидатов
+    напрямую из индекса (если оно стоит первым в плане) и лениво отфильтровать
+    поток идентификаторов, полученных от предыдущего шага.
+    """
+
+    def estimate(self, index: TourIndex) -> int:
+        """
+        @brief Оценивает количество туров, проходящих условие
+        @param index Индекс туров
+        @return Оценка числа подходящих туров (по умолчанию — весь каталог)
+        """
+        return len(index)
+
+    def candidates(self, index: TourIndex) -> Iterator[int]:
+        """
+        @brief Выдаёт кандидатов для первого шага плана
+        @param index Индекс туров
+        @return Итератор идентификаторов туров, проходящих условие
+        """
+        return self.apply(index, index.iter_ids())
+
+    def matches(self, index: TourIndex, tour_id: int) -> bool:
+        """
+        @brief Проверяет условие для одного тура
+        @param index Индекс туров
+        @param tour_id Идентификатор тура в индексе
+        @return True, если тур проходит условие
+        """
+        raise NotImplementedError
+
+    def apply(self, index: TourIndex, tour_ids: Iterable[int]) -> Iterator[int]:
+        """
+        @brief Лениво фильтрует поток идентификаторов
+        @param index Индекс туров
+        @param tour_ids Идентификаторы, прошедшие предыдущие шаги
+        @return Генератор идентификаторов, проходящих условие
+        """
+        return (tour_id for tour_id in tour_ids if self.matches(index, tour_id))
+
+
+class BudgetPredicate(TourPredicate):
+    """
+    @brief Условие: цена тура лежит в диапазоне бюджета
+    """
+
+    def __init__(self, min_price: float, max_price: float):
+        """
+        @brief Конструктор условия
+        @param min_price Нижняя граница цены (включительно)
+        @param max_price Верхняя граница цены (включительно)
+        """
+        self.min_price = min_price
+        self.max_price = max_price
+
+    def estimate(self, index: TourIndex) -> int:
+        """@brief Оценка числа подходящих туров по индексу"""
+        return index.count_by_price(self.min_price, self.max_price)
+
+    def candidates(self, index: TourIndex) -> Iterator[int]:
+        """@brief Кандидаты первого шага, взятые из индекса"""
+        return index.iter_by_price(self.min_price, self.max_price)
+
+    def matches(self, index: TourIndex, tour_id: int) -> bool:
+        """@brief Проверка условия для одного тура"""
+        return self.min_price <= index.price_of(tour_id) <= self.max_price
+
+
+class CountryPredicate(TourPredicate):
+    """
+    @brief Условие: тур ведёт в заданную страну
+    @details Название страны один раз переводится в geo_id через реестр географии,
+    после чего проверки — сравнения целых чисел с колонкой стран индекса.
+    """
+
+    def __init__(self, country: Union[str, Country], registry: GeoRegistry = None):
+        """
+        @brief Конструктор условия
+        @param country Название страны назначения или объект Country
+        @param registry Реестр для поиска страны по названию (по умолчанию GEO_REGISTRY)
+        """
+        self.country = country
+        if isinstance(country, Country):
+            self.geo_ids: Tuple[int, ...] = (country.geo_id,)
+        else:
+            self.geo_ids = (GEO_REGISTRY if registry is None else registry).country_ids(country)
+
+    def estimate(self, index: TourIndex) -> int:
+        """@brief Оценка числа подходящих туров по индексу"""
+        return index.count_by_country(self.geo_ids)
+
+    def candidates(self, index: TourIndex) -> Iterator[int]:
+        """@brief Кандидаты первого шага, взятые из индекса"""
+        return iter(index.ids_by_country(self.geo_ids))
+
+    def matches(self, index: TourIndex, tour_id: int) -> bool:
+        """@brief Проверка условия для одного тура"""
+        return index.country_id_of(tour_id) in self.geo_ids
+
+
+class DatePredicate(TourPredicate):
+    """
+    @brief Условие: тур целиком лежит в интервале дат
+    """
+
+    def __init__(self, start_date: date, end_date: date):
+        """
+        @brief Конструктор условия
+        @param start_date Самая ранняя допустимая дата начала
+        @param end_date Самая поздняя допустимая дата окончания
+        """
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def estimate(self, index: TourIndex) -> int:
+        """@brief Оценка числа подходящих туров по индексу"""
+        return index.count_by_date(self.start_date, self.end_date)
+
+    def candidates(self, index: TourIndex) -> Iterator[int]:
+        """@brief Кандидаты первого шага, взятые из индекса"""
+        return index.iter_by_date(self.start_date, self.end_date)
+
+    def matches(self, index: TourIndex, tour_id: int) -> bool:
+        """@brief Проверка условия для одного тура"""
+        start_date, end_date = index.dates_of(tour_id)
+        return start_date >= self.start_date and end_date <= self.end_date
+
+
+class VisaPredicate(TourPredicate):
+    """
+    @brief Условие: виза клиента совместима с туром (как в Tour.check_visa)
+    @details Пригодность визы (активна, есть въезды, не просрочена) проверяется один раз
+    при создании условия. Кандидаты берутся из меньшей выборки индекса — туров в страну
+    визы или туров внутри срока её действия — и проверяются по второму признаку.
+    """
+
+    def __init__(self, visa: Optional[Visa], registry: GeoRegistry = None):
+        """
+        @brief Конструктор условия
+        @param visa Виза клиента (None — ни один тур не подходит)
+        @param registry Реестр для поиска страны визы по названию (по умолчанию GEO_REGISTRY)
+        """
+        self.visa = visa if visa is not None and visa.is_valid() else None
+        self.geo_ids: Tuple[int, ...] = ()
+        if self.visa is not None:
+            self.geo_ids = (GEO_REGISTRY if registry is None else registry).country_ids(self.visa.country)
+
+    def estimate(self, index: TourIndex) -> int:
+        """@brief Оценка числа подходящих туров по индексу"""
+        if self.visa is None:
+            return 0
+        return min(index.count_by_country(self.geo_ids),
+                   index.count_by_date(self.visa.issue_date, self.visa.expiration_date))
+
+    def candidates(self, index: TourIndex) -> Iterator[int]:
+        """@brief Кандидаты первого шага, взятые из индекса"""
+        if self.visa is None:
+            return iter(())
+        if index.count_by_country(self.geo_ids) <= index.count_by_date(self.visa.issue_date,
+                                                                     self.visa.expiration_date):
+            return self.apply(index, index.ids_by_country(self.geo_ids))
+        return (tour_id for tour_id in index.iter_by_date(self.visa.issue_date, self.visa.expiration_date)
+                if index.country_id_of(tour_id) in self.geo_ids)
+
+    def matches(self, index: TourIndex, tour_id: int) -> bool:
+        """@brief Проверка условия для одного тура"""
+        if self.visa is None:
+            return False
+        start_date, end_date = index.dates_of(tour_id)
+        return (index.country_id_of(tour_id) in self.geo_ids
+                and start_date >= self.visa.issue_date and end_date <= self.visa.expiration_date)
+
+
+class TransportPredicate(TourPredicate):
+    """
+    @brief Условие: тур не использует указанные виды транспорта
+    @details Индекс не хранит обратных списков по транспорту, поэтому условие
+    оценивается как наименее селективное и проверяется по битовым маскам.
+    @note Сравнение идёт по классу транспорта: переданный объект (например, один рейс)
+    исключает все туры с транспортом того же класса, а не только туры с этим объектом
+    """
+
+    def __init__(self, except_transport: Iterable):
+        """
+        @brief Конструктор условия
+        @param except_transport Исключаемые виды транспорта (классы или объекты транспорта)
+        """
+        self.except_transport = list(except_transport)
+
+    def apply(self, index: TourIndex, tour_ids: Iterable[int]) -> Iterator[int]:
+        """@brief Ленивая фильтрация по битовым маскам транспорта"""
+        mask = index.transport_mask(self.except_transport)
+        return (tour_id for tour_id in tour_ids if not index.transport_bits_of(tour_id) & mask)
+
+    def matches(self, index: TourIndex, tour_id: int) -> bool:
+        """@brief Проверка условия для одного тура"""
+        return not index.transport_bits_of(tour_id) & index.transport_mask(self.except_transport)
+
+
+class TourQuery:
+    """
+    @brief Запрос к каталогу туров в виде плана из цепочки условий
+    @details Условия упорядочиваются по оценённой селективности: самое селективное
+    выдаёт кандидатов из индекса, остальные лениво фильтруют только выживших
+    на предыдущем шаге. Если оценка первого шага равна нулю, план не выполняется.
+    """
+
+    def __init__(self, index: TourIndex):
+        """
+        @brief Конструктор запроса
+        @param index Индекс туров, по которому выполняется запрос
+        """
+        self.index = index
+        self.predicates: List[TourPredicate] = []
+
+    def where(self, predicate: TourPredicate) -> 'TourQuery':
+        """
+        @brief Добавляет условие в запрос
+        @param predicate Объект TourPredicate
+        @return Этот же запрос (для цепочки вызовов)
+        """
+        self.predicates.append(predicate)
+        return self
+
+    def budget(self, min_price: float, max_price: float) -> 'TourQuery':
+        """@brief Добавляет условие по бюджету"""
+        return self.where(BudgetPredicate(min_price, max_price))
+
+    def country(self, country: Union[str, Country]) -> 'TourQuery':
+        """@brief Добавляет условие по стране назначения"""
+        return self.where(CountryPredicate(country))
+
+    def dates(self, start_date: date, end_date: date) -> 'TourQuery':
+        """@brief Добавляет условие по интервалу дат"""
+        return self.where(DatePredicate(start_date, end_date))
+
+    def eligible_for(self, visa: Optional[Visa]) -> 'TourQuery':
+        """@brief Добавляет условие по совместимости с визой клиента"""
+        return self.where(VisaPredicate(visa))
+
+    def without_transport(self, except_transport: Iterable) -> 'TourQuery':
+        """@brief Добавляет условие по исключаемым видам транспорта"""
+        return self.where(TransportPredicate(except_transport))
+
+    def plan(self) -> List[TourPredicate]:
+        """
+        @brief Строит план выполнения
+        @return Условия, упорядоченные по возрастанию оценки числа подходящих туров
+        """
+        return sorted(self.predicates, key=lambda predicate: predicate.estimate(self.index))
+
+    def __run(self, plan: List[TourPredicate], price_rise: bool = True,
+              after: Optional[Tuple[float, int]] = None) -> Iterator[int]:
+        """
+        @brief Лениво выполняет готовый план
+        @param plan Непустой список условий, упорядоченный по селективности
+        @param price_rise Направление обхода, если первым шагом стоит бюджет
+        @param after Ключ курсора, с которого продолжается обход по цене
+        @return Генератор идентификаторов туров, проходящих все условия
+        """
+        first = plan[0]
+        if first.estimate(self.index) == 0:
+            return iter(())
+        if isinstance(first, BudgetPredicate):
+            tour_ids = self.index.iter_by_price(first.min_price, first.max_price, price_rise, after)
+        else:
+            tour_ids = first.candidates(self.index)
+        for predicate in plan[1:]:
+            tour_ids = predicate.apply(self.index, tour_ids)
+        return tour_ids
+
+    def iter_ids(self) -> Iterator[int]:
+        """
+        @brief Лениво выполняет запрос
+        @return Итератор идентификаторов туров, проходящих все условия
+        """
+        plan = self.plan()
+        if not plan:
+            return self.index.iter_ids()
+        return self.__run(plan)
+
+    def execute(self, price_rise: bool = True) -> List[Tour]:
+        """
+        @brief Выполняет запрос и упорядочивает результат по цене
+        @details Если запрос без условий или первым шагом стоит бюджет, идентификаторы
+        уже идут в порядке цены и повторная сортировка не выполняется.
+        @param price_rise True — по возрастанию цены, False — по убыванию
+        @return Список подходящих туров
+        """
+        plan = self.plan()
+        if not plan:
+            return self.index.sorted_by_price(price_rise)
+        tour_ids = self.__run(plan, price_rise)
+        if isinstance(plan[0], BudgetPredicate):
+            return [self.index.get_tour(tour_id) for tour_id in tour_ids]
+        return self.index.order_by_price(tour_ids, price_rise)
+
+    def page(self, limit: int = 20, offset: int = 0, cursor: Optional[Tuple[float, int]] = None,
+             price_rise: bool = True) -> 'TourPage':
+        """
+        @brief Возвращает одну страницу результатов, упорядоченных по цене
+        @details Если план начинается с бюджета (или пуст), туры читаются из ценового массива
+        индекса начиная с курсора, и сортировка не выполняется вовсе. Иначе из выживших
+        туров отбираются первые offset + limit через кучу — O(n log k) вместо полной сортировки.
+        @param limit Размер страницы
+        @param offset Количество пропускаемых туров (от курсора, если он задан)
+        @param cursor Ключ последнего тура предыдущей страницы (TourPage.next_cursor)
+        @param price_rise True — по возрастанию цены, False — по убыванию
+        @return Объект TourPage
+        """
+        plan = self.plan()
+        count = offset + limit + 1
+        if not plan or isinstance(plan[0], BudgetPredicate):
+            if plan:
+                tour_ids = self.__run(plan, price_rise, cursor)
+            else:
+                tour_ids = self.index.iter_by_price(rise=price_rise, after=cursor)
+            selected = list(islice(tour_ids, offset, count))
+        else:
+            tour_ids = self.__run(plan)
+            key = self.index.price_key
+            if cursor is not None:
+                if price_rise:
+                    tour_ids = (tour_id for tour_id in tour_ids if key(tour_id) > cursor)
+                else:
+                    tour_ids = (tour_id for tour_id in tour_ids if key(tour_id) < cursor)
+            select = nsmallest if price_rise else nlargest
+            selected = select(count, tour_ids, key=key)[offset:]
+
+        next_cursor = None
+        if len(selected) > limit:
+            selected = selected[:limit]
+            next_cursor = self.index.price_key(selected[-1])
+        return TourPage([self.index.get_tour(tour_id) for tour_id in selected], next_cursor)
+
+
+class TourPage:
+    """
+    @brief Страница результатов поиска туров
+    @details Курсор next_cursor передаётся в следующий запрос, чтобы продолжить
+    выдачу с места остановки, не перебирая уже показанные туры.
+    """
+
+    def __init__(self, tours: List[Tour], next_cursor: Optional[Tuple[float, int]] = None):
+        """
+        @brief Конструктор страницы
+        @param tours Туры на странице, упорядоченные по цене
+        @param next_cursor Курсор следующей страницы (None, если страница последняя)
+        """
+        self.tours = tours
+        self.next_cursor = next_cursor
+
+    def has_next(self) -> bool:
+        """
+        @brief Проверяет, есть ли следующая страница
+        @return True, если после этой страницы остались туры
+        """
+        return self.next_cursor is not None
+
+    def __len__(self) -> int:
+        """
+        @brief Количество туров на странице
+        @return Длина списка tours
+        """
+        return len(self.tours)
@@ -1,10 +1,15 @@
-from datetime import date
+from datetime import date, datetime
 from .tour import Tour
 from models.people.person import Person
-from models.people.staff import Guide, Manager, TravelAgent
-from typing import List, Optional
+from models.people.staff import Guide, Manager, TravelAgent, EmployeeIsUnavailable
+from models.people.scheduler import StaffScheduler, NoEligibleEmployee
+from models.people.guide_assignment import GuideAssignmentOptimizer
+from typing import Dict, List, Optional, Tuple
 import random
 from .transport import Transport
+from .tour_index import TourIndex
+from .tour_query import TourQuery, TourPage
+from .pricing import CatalogPricing
 from services.bank_account import BankAccount
 
 
@@ -71,15 +76,17 @@ class WorkWithClient:
     бронирование и назначение гида (если есть достопримечательности).
     """
 
-    def __init__(self, agency: TouristAgency, client: Person):
+    def __init__(self, agency: TouristAgency, client: Person, at: Optional[datetime] = None):
         """
         @brief Конструктор взаимодействия с клиентом
         @param agency Туристическое агентство
         @param client Клиент (Person)
+        @param at Момент обращения для проверки графиков работы (None — без проверки)
         @exception WorkWithClientFailed При любой ошибке в процессе обработки
         """
         self.agency = agency
         self.client = client
+        self.at = at
         try: 
             self.__interact_with_person()
         except Exception:
@@ -89,25 +96,121 @@ class WorkWithClient:
         """
         @brief Выполняет полный цикл обслуживания клиента
         @details Последовательно:
-            - Выбирает случайного агента и менеджера
+            - Планировщик назначает наименее загруженных агента и менеджера
             - Менеджер предлагает доступные туры
             - Клиент (случайно) выбирает тур
             - Агент бронирует тур
-            - Если в туре есть достопримечательности — назначается гид
+            - Если в туре есть достопримечательности — назначается гид города тура,
+              свободный в дни тура (нагрузка гида — число его назначенных туров)
         @exception WorkWithClientFailed При ошибке бронирования или отсутствии персонала
         """
-        travel_agent = ProcessClientChoice(self.agency.travel_agents).selected
-        manager = ProcessClientChoice(self.agency.managers).selected
-        available_tours = self.agency.get_avaiable_tours()
-        manager.offer_tours_to_client(available_tours)
-        picked_tour = ProcessClientChoice(available_tours).selected
-        try: 
-            travel_agent.book_tour_for_client(self.client, picked_tour, self.agency.bank_account)
-        except Exception:
-            raise WorkWithClientFailed()
+        scheduler = self.agency.scheduler
+        travel_agent = scheduler.acquire_agent(self.at)
+        try:
+            manager = scheduler.acquire_manager(self.at)
+            try:
+                available_tours = self.agency.get_avaiable_tours()
+                manager.offer_tours_to_client(available_tours)
+                picked_tour = ProcessClientChoice(available_tours).selected
+            finally:
+                scheduler.release(manager)
+            try:
+                travel_agent.book_tour_for_client(self.client, picked_tour, self.agency.bank_account)
+            except Exception:
+                raise WorkWithClientFailed()
+        finally:
+            scheduler.release(travel_agent)
         if len(picked_tour.sights) >= 1:
-            guide = ProcessClientChoice(self.agency.guides).selected
-            guide.go_to_tour(picked_tour)
+            try:
+                guide = scheduler.acquire_guide(picked_tour.destination, at=self.at,
+                                                eligible=lambda candidate: candidate.is_free_for(picked_tour))
+            except NoEligibleEmployee:
+                raise EmployeeIsUnavailable()
+            try:
+                guide.go_to_tour(picked_tour)
+            except EmployeeIsUnavailable:
+                scheduler.release(guide)
+                raise
+
+
+class _StaffList(list):
+    """
+    @brief Список сотрудников агентства, согласованный с планировщиком
+    @details Любое изменение списка (append, remove, clear, срезы и т. д.) регистрирует
+    добавленных сотрудников в StaffScheduler и снимает с учёта удалённых, поэтому
+    планировщик назначает только тех, кто числится в публичных списках агентства.
+    """
+
+    def __init__(self, scheduler: StaffScheduler):
+        """
+        @brief Конструктор пустого списка
+        @param scheduler Планировщик агентства
+        """
+        super().__init__()
+        self.__scheduler = scheduler
+
+    def __sync(self, before: List):
+        """
+        @brief Приводит планировщик в соответствие со списком после изменения
+        @param before Содержимое списка до изменения
+        """
+        present = {id(employee) for employee in self}
+        for employee in before:
+            if id(employee) not in present:
+                self.__scheduler.remove(employee)
+        for employee in self:
+            self.__scheduler.add(employee)
+
+    def append(self, employee):
+        """@brief Добавляет сотрудника в конец списка и в планировщик"""
+        super().append(employee)
+        self.__scheduler.add(employee)
+
+    def insert(self, index: int, employee):
+        """@brief Вставляет сотрудника и регистрирует его в планировщике"""
+        super().insert(index, employee)
+        self.__scheduler.add(employee)
+
+    def extend(self, employees):
+        """@brief Добавляет сотрудников и регистрирует их в планировщике"""
+        for employee in employees:
+            self.append(employee)
+
+    def __iadd__(self, employees):
+        """@brief Оператор += (то же, что extend)"""
+        self.extend(employees)
+        return self
+
+    def remove(self, employee):
+        """@brief Удаляет сотрудника из списка и из планировщика"""
+        before = list(self)
+        super().remove(employee)
+        self.__sync(before)
+
+    def pop(self, index: int = -1):
+        """@brief Удаляет и возвращает сотрудника, снимая его с учёта в планировщике"""
+        before = list(self)
+        employee = super().pop(index)
+        self.__sync(before)
+        return employee
+
+    def clear(self):
+        """@brief Очищает список и снимает всех сотрудников с учёта"""
+        before = list(self)
+        super().clear()
+        self.__sync(before)
+
+    def __delitem__(self, index):
+        """@brief Удаляет элемент или срез, снимая удалённых с учёта"""
+        before = list(self)
+        super().__delitem__(index)
+        self.__sync(before)
+
+    def __setitem__(self, index, value):
+        """@brief Заменяет элемент или срез, синхронизируя планировщик"""
+        before = list(self)
+        super().__setitem__(index, value)
+        self.__sync(before)
 
 
 class Route:
@@ -157,21 +260,68 @@ class TouristAgency:
         self.bank_account = bank_account
         self.name = name
         self.__available_tours: List[Tour] = []
-        self.managers: List[Manager] = []
-        self.travel_agents: List[TravelAgent] = []
-        self.guides: List[Guide] = []
+        self.__tour_index = TourIndex()
+        self.__pricing = CatalogPricing()
+        self.scheduler = StaffScheduler()
+        self.managers: List[Manager] = _StaffList(self.scheduler)
+        self.travel_agents: List[TravelAgent] = _StaffList(self.scheduler)
+        self.guides: List[Guide] = _StaffList(self.scheduler)
 
     def add_tour(self, tour: Tour):
         """
         @brief Добавляет тур в список доступных
         @param tour Объект Tour для добавления
+        @exception TourAlreadyPriced Если тур продаёт другое агентство
+        @note Тур сразу попадает в индекс и ценовые колонки каталога агентства
+        (строка колонок совпадает с идентификатором тура в индексе)
         """
+        self.__pricing.check([tour])
         self.__available_tours.append(tour)
+        self.__pricing.add(tour, self.__tour_index.add(tour))
+
+    def add_tours(self, tours: List[Tour]):
+        """
+        @brief Добавляет много туров за один проход
+        @param tours Объекты Tour для добавления
+        @exception TourAlreadyPriced Если один из туров продаёт другое агентство
+        @note Индекс каталога перестраивается один раз (TourIndex.add_many)
+        """
+        tours = list(tours)
+        self.__pricing.check(tours)
+        self.__available_tours.extend(tours)
+        self.__tour_index.add_many(tours)
+        for tour in tours:
+            self.__pricing.add(tour, self.__tour_index.id_of(tour))
+
+    def remove_tour(self, tour: Tour):
+        """
+        @brief Снимает тур с продажи
+        @param tour Объект Tour
+        @exception TourNotFound Если тура нет среди доступных
+        @note Тур удаляется и из индекса, и из ценовых колонок каталога агентства
+        """
+        if tour not in self.__tour_index:
+            raise TourNotFound()
+        self.__available_tours.remove(tour)
+        self.__tour_index.remove(tour)
+        self.__pricing.remove(tour)
+
+    def refresh_tour(self, tour: Tour):
+        """
+        @brief Обновляет записи тура после изменений, о которых тур не сообщает
+        @param tour Объект Tour (например, после прямого присваивания дат или base_cost)
+        @exception TourNotFound Если тура нет среди доступных
+        """
+        if tour not in self.__tour_index:
+            raise TourNotFound()
+        self.__tour_index.update(tour)
+        self.__pricing.refresh(tour)
 
     def add_guide(self, guide: Guide):
         """
         @brief Добавляет гида в штат агентства
         @param guide Объект Guide для добавления
+        @note Гид также регистрируется в планировщике агентства
         """
         self.guides.append(guide)
 
@@ -179,6 +329,7 @@ class TouristAgency:
         """
         @brief Добавляет туристического агента в штат
         @param agent Объект TravelAgent для добавления
+        @note Агент также регистрируется в планировщике агентства
         """
         self.travel_agents.append(agent)
 
@@ -186,9 +337,37 @@ class TouristAgency:
         """
         @brief Добавляет менеджера в штат агентства
         @param manager Объект Manager для добавления
+        @note Менеджер также регистрируется в планировщике агентства
         """
         self.managers.append(manager)
 
+    def remove_guide(self, guide: Guide):
+        """
+        @brief Увольняет гида
+        @param guide Объект Guide
+        @exception ValueError Если гида нет в штате
+        @note Гид снимается с учёта в планировщике и больше не назначается
+        """
+        self.guides.remove(guide)
+
+    def remove_agent(self, agent: TravelAgent):
+        """
+        @brief Увольняет туристического агента
+        @param agent Объект TravelAgent
+        @exception ValueError Если агента нет в штате
+        @note Агент снимается с учёта в планировщике и больше не назначается
+        """
+        self.travel_agents.remove(agent)
+
+    def remove_manager(self, manager: Manager):
+        """
+        @brief Увольняет менеджера
+        @param manager Объект Manager
+        @exception ValueError Если менеджера нет в штате
+        @note Менеджер снимается с учёта в планировщике и больше не назначается
+        """
+        self.managers.remove(manager)
+
     def get_tour_by_index(self, index: int) -> Tour:
         """
         @brief Возвращает тур по индексу
@@ -208,99 +387,154 @@ class TouristAgency:
         """
         return self.__available_tours
 
-    def interact_with_person(self, person: Person):
+    def get_tour_index(self) -> TourIndex:
+        """
+        @brief Возвращает индекс каталога туров агентства
+        @return Объект TourIndex
+        """
+        return self.__tour_index
+
+    def reprice_tours(self, commission_rate: Optional[float] = None,
+                      fuel_surcharge: Optional[float] = None) -> List[float]:
+        """
+        @brief Пакетно пересчитывает цены всех туров агентства
+        @details Цены рассчитываются одним векторным проходом по постоянным ценовым
+        колонкам агентства (CatalogPricing) и записываются столбцом: туры читают цену
+        из колонок, а индекс каталога получает тот же столбец (TourIndex.set_prices).
+        @param commission_rate Новая комиссия для всех туров (None — без изменений)
+        @param fuel_surcharge Новая топливная надбавка к транспорту (None — без изменений)
+        @return Список новых цен в порядке get_avaiable_tours()
+        """
+        self.__tour_index.set_prices(self.__pricing.reprice(commission_rate, fuel_surcharge))
+        return [tour.price for tour in self.__available_tours]
+
+    def get_tour_filtration(self, client: Person = None) -> 'TourFiltration':
+        """
+        @brief Создаёт фильтрацию туров поверх индекса агентства
+        @param client Клиент, для которого подбираются туры
+        @return Объект TourFiltration, использующий индекс без перестроения
+        @exception EmptyStaffListOrTours Если в агентстве нет туров
+        """
+        return TourFiltration(self.__available_tours, client, self.__tour_index)
+
+    def assign_guides(self, tours: Optional[List[Tour]] = None,
+                      languages: Optional[Dict[Tour, str]] = None) -> Dict[Tour, Guide]:
+        """
+        @brief Пакетно назначает гидов агентства на туры
+        @param tours Туры (по умолчанию — все ещё не начавшиеся туры агентства)
+        @param languages Требуемый язык для отдельных туров
+        @return Словарь {тур: гид} для туров, получивших гида
+        @note Каждое назначение увеличивает нагрузку гида в планировщике
+        """
+        if tours is None:
+            today = date.today()
+            tours = [tour for tour in self.__available_tours if tour.start_date > today]
+        assigned = GuideAssignmentOptimizer(self.guides).assign(tours, languages)
+        for guide in assigned.values():
+            self.scheduler.assign(guide)
+        return assigned
+
+    def release_guide(self, guide: Guide, tour: Tour) -> bool:
+        """
+        @brief Снимает гида с тура (например, после его окончания или отмены)
+        @param guide Назначенный гид
+        @param tour Тур
+        @return True, если назначение было и снято
+        """
+        released = guide.release(tour)
+        if released:
+            self.scheduler.release(guide)
+        return released
+
+    def interact_with_person(self, person: Person, at: Optional[datetime] = None):
         """
         @brief Инициирует автоматизированное взаимодействие с клиентом
         @param person Клиент (Person)
+        @param at Момент обращения для проверки графиков работы (None — без проверки)
         @exception WorkWithClientFailed При сбое в процессе обслуживания
         @note Создаётся объект WorkWithClient, который выполняет полный цикл бронирования
         """
-        WorkWithClient(self, person)
+        WorkWithClient(self, person, at)
 
 class TourFiltration:
-    def __init__(self, tours: List[Tour] = None, client: Person = None):
+    """
+    @brief Фильтрация и сортировка туров по критериям клиента
+    @details Критерии собираются в запрос TourQuery: самый селективный критерий берёт
+    кандидатов из индекса TourIndex, остальные лениво проверяют только оставшиеся туры.
+    Результат возвращается упорядоченным по цене.
+    """
+
+    def __init__(self, tours: List[Tour] = None, client: Person = None, index: TourIndex = None):
         """
         @brief Конструктор фильтрации туров
         @details Инициализирует список туров и клиента для фильтрации
         @param tours Список туров для фильтрации
+        @param client Клиент, для которого подбираются туры
+        @param index Готовый индекс туров (по умолчанию строится по списку tours)
         """
         if tours is None or len(tours) == 0:
             raise EmptyStaffListOrTours()
         self.tours = tours
         self.client = client
-    
-    def __filter_tours_by_budget(self, min_price = float, max_price = float) -> List[Tour]:
-        """
-        @brief Фильтрует туры по бюджету клиента
-        @return Список туров, стоимость которых не превышает бюджет клиента
-        """
-        filtered_tours = [tour for tour in self.tours if min_price <= tour.price <= max_price]
-        if len(filtered_tours) == 0:
-            raise TourNotFound()
-        return filtered_tours
-    
-    def __filter_tours_by_country(self,country: str) -> List[Tour]:
-        """
-        @brief Фильтрует туры по стране назначения
-        @return Список туров, соответствующих заданной стране
-        """
-        filtered_tours = [tour for tour in self.tours if tour.destination_country == country]
-        if len(filtered_tours) == 0:
-            raise TourNotFound()
-        return filtered_tours
-    
-    def __filter_tours_by_transport(self, except_transport: List[Transport]) -> List[Tour]:
-        """
-        @brief Фильтрует туры по виду транспорта
-        @return Список туров, не включающих указанные виды транспорта
-        """
-        filtered_tours = [tour for tour in self.tours if all(t not in except_transport for t in tour.transports)]
-        if len(filtered_tours) == 0:
-            raise TourNotFound()
-        return filtered_tours
-    
-    def __filter_tours_by_date(self,start_date: date, end_date: date) -> List[Tour]:
-        """
-        @brief Фильтрует туры по дате начала и окончания
-        @return Список туров, начинающихся и заканчивающихся в указанные даты
-        """
-        filtered_tours = [tour for tour in self.tours if tour.start_date >= start_date and tour.end_date <= end_date]
-        if len(filtered_tours) == 0:
-            raise TourNotFound()
-        return filtered_tours
-    
-    def __filter_tours_by_price(self,rise: bool = True) ->List[Tour]:
-        """
-        @brief Сортирует туры по цене
-        @return Список туров, отсортированных по цене
-        """
-        filtered_tours = sorted(self.tours, key=lambda tour: tour.price, reverse = not rise)
-        if len(filtered_tours) == 0:
-            raise TourNotFound()
-        return filtered_tours
+        self.index = index if index is not None else TourIndex(tours)
+
+    def query(self, start_date: date = None, end_date: date = None,
+              min_price: float = None, max_price: float = None,
+              country: str = None, except_transport: List[Transport] = None,
+              eligible_only: bool = False) -> TourQuery:
+        """
+        @brief Собирает запрос по заданным критериям
+        @param except_transport Исключаемые виды транспорта (классы или объекты транспорта)
+        @param eligible_only Оставить только туры, совместимые с визой клиента
+        @return Объект TourQuery (ещё не выполненный)
+        @note except_transport сравнивается по классу: объект транспорта исключает все туры
+        с транспортом того же вида (раньше исключались только туры с равным объектом)
+        """
+        query = TourQuery(self.index)
+        if min_price is not None and max_price is not None:
+            query.budget(min_price, max_price)
+        if country is not None:
+            query.country(country)
+        if except_transport is not None:
+            query.without_transport(except_transport)
+        if eligible_only:
+            query.eligible_for(self.client.passport.visa if self.client is not None else None)
+        if start_date is not None and end_date is not None:
+            query.dates(start_date, end_date)
+        return query
     
     def filter(self,start_date: date=None,end_date: date=None,
                min_price: float=None,max_price: float=None,
                country: str=None,except_transport: List[Transport]=None,
-               price_rise: bool=True) -> List[Tour]:
+               price_rise: bool=True, eligible_only: bool=False) -> List[Tour]:
         """
         @brief Выполняет фильтрацию туров по заданным критериям
+        @param eligible_only Оставить только туры, совместимые с визой клиента
         @return Список туров, соответствующих всем заданным критериям
+        @exception TourNotFound Если ни один тур не подходит
         """
-        filtered_tours = self.tours
-        
-        if min_price is not None and max_price is not None:
-            filtered_tours = self.__filter_tours_by_budget(min_price, max_price)
-        
-        if country is not None:
-            filtered_tours = self.__filter_tours_by_country(country)
-        
-        if except_transport is not None:
-            filtered_tours = self.__filter_tours_by_transport(except_transport)
-        
-        if start_date is not None and end_date is not None:
-            filtered_tours = self.__filter_tours_by_date(start_date, end_date)
-        
-        filtered_tours = self.__filter_tours_by_price(price_rise)
-        
-        return filtered_tours
\ No newline at end of file
+        filtered_tours = self.query(start_date, end_date, min_price, max_price,
+                                    country, except_transport, eligible_only).execute(price_rise)
+        if len(filtered_tours) == 0:
+            raise TourNotFound()
+        return filtered_tours
+
+    def page(self, limit: int = 20, offset: int = 0, cursor: Optional[Tuple[float, int]] = None,
+             start_date: date = None, end_date: date = None,
+             min_price: float = None, max_price: float = None,
+             country: str = None, except_transport: List[Transport] = None,
+             price_rise: bool = True, eligible_only: bool = False) -> TourPage:
+        """
+        @brief Выполняет постраничный поиск туров
+        @param limit Размер страницы
+        @param offset Количество пропускаемых туров
+        @param cursor Курсор, полученный с предыдущей страницы
+        @param eligible_only Оставить только туры, совместимые с визой клиента
+        @return Объект TourPage с турами и курсором следующей страницы
+        @exception TourNotFound Если по критериям не найдено ни одного тура
+        """
+        tour_page = self.query(start_date, end_date, min_price, max_price,
+                               country, except_transport, eligible_only).page(limit, offset, cursor, price_rise)
+        if len(tour_page) == 0 and offset == 0 and cursor is None:
+            raise TourNotFound()
+        return tour_page
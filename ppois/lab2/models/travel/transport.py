@@ -3,6 +3,8 @@ from typing import Optional
 from .geography import City
 from models.people.person import Person
 from services.bank_account import BankAccount, Transaction, NotEnoughMoney
+from services.capacity import CapacityCounter
+from services.events import emit
 from random import randint
 
 
@@ -20,7 +22,8 @@ class Transport:
         start_time: datetime,
         end_time: datetime,
         price_for_hour: float,
-        company_bank_account: Optional[BankAccount] = None
+        company_bank_account: Optional[BankAccount] = None,
+        seats: Optional[int] = None
     ):
         """
         @brief Конструктор транспорта
@@ -30,6 +33,7 @@ class Transport:
         @param end_time Время прибытия
         @param price_for_hour Стоимость за час использования транспорта
         @param company_bank_account Банковский счёт компании-перевозчика (по умолчанию — общий счёт)
+        @param seats Количество мест (по умолчанию None — без ограничения)
         """
         if company_bank_account is None:
             company_bank_account = BankAccount(0, "common_bank_account")
@@ -39,22 +43,63 @@ class Transport:
         self.end_time = end_time
         self.price_for_hour = price_for_hour
         self.bank_account = company_bank_account
+        self.seats = None if seats is None else CapacityCounter(seats)
+
+    def remaining_seats(self) -> Optional[int]:
+        """
+        @brief Возвращает количество свободных мест
+        @return Число свободных мест или None, если количество мест не ограничено
+        """
+        return None if self.seats is None else self.seats.remaining()
 
     def book(self, person: Person) -> bool:
         """
         @brief Бронирует транспорт для клиента с оплатой
         @param person Клиент, бронирующий транспорт
-        @return True, если оплата прошла успешно; False в случае нехватки средств
-        @note Стоимость рассчитывается как: price_for_hour * продолжительность (в часах)
+        @return True, если место есть и оплата прошла успешно; False, если мест нет или не хватает средств
+        @note Стоимость рассчитывается как: price_for_hour * продолжительность (в часах).
+        Место резервируется до оплаты и освобождается, если оплата не прошла
         """
+        if self.seats is not None and not self.seats.try_reserve():
+            emit("transport_sold_out", transport=self)
+            return False
         duration_hours = (self.end_time - self.start_time).total_seconds() / 3600.0
         total_price = self.price_for_hour * duration_hours
         try:
             Transaction(person.bank_account, self.bank_account, total_price)
             return True
         except NotEnoughMoney:
-            print("not enough money to book transport")
+            self.release_seat()
+            emit("transport_not_enough_money", transport=self)
+            return False
+
+    async def book_async(self, person: Person) -> bool:
+        """
+        @brief Асинхронно бронирует транспорт для клиента с оплатой
+        @details Резервирование места выполняется сразу (короткая блокировка счётчика),
+        ожидание блокировок счетов при оплате не блокирует цикл событий.
+        @param person Клиент, бронирующий транспорт
+        @return True, если место есть и оплата прошла успешно; иначе False
+        """
+        if self.seats is not None and not self.seats.try_reserve():
+            emit("transport_sold_out", transport=self)
             return False
+        duration_hours = (self.end_time - self.start_time).total_seconds() / 3600.0
+        try:
+            await Transaction.create_async(person.bank_account, self.bank_account, self.price_for_hour * duration_hours)
+            return True
+        except NotEnoughMoney:
+            self.release_seat()
+            emit("transport_not_enough_money", transport=self)
+            return False
+
+    def release_seat(self):
+        """
+        @brief Освобождает одно место (например, при отмене бронирования)
+        @note Для транспорта без ограничения мест ничего не делает
+        """
+        if self.seats is not None:
+            self.seats.release()
 
     def __str__(self) -> str:
         """
@@ -80,7 +125,8 @@ class Flight(Transport):
         end_time: datetime,
         price: float,
         flight_number: str,
-        class_type: int
+        class_type: int,
+        seats: Optional[int] = None
     ):
         """
         @brief Конструктор авиаперелёта
@@ -91,13 +137,15 @@ class Flight(Transport):
         @param price Базовая стоимость билета
         @param flight_number Номер рейса (например, "AF1234")
         @param class_type Множитель цены за класс (1 = эконом, 2 = бизнес и т.д.)
+        @param seats Количество мест (по умолчанию None — без ограничения)
         """
         super().__init__(
             start_point,
             end_point,
             start_time,
             end_time,
-            price * class_type
+            price * class_type,
+            seats=seats
         )
         self.flight_number = flight_number
 
@@ -126,7 +174,8 @@ class Train(Transport):
         end_time: datetime,
         price: float,
         train_number: str,
-        class_type: int
+        class_type: int,
+        seats: Optional[int] = None
     ):
         """
         @brief Конструктор поезда
@@ -137,13 +186,15 @@ class Train(Transport):
         @param price Базовая стоимость билета
         @param train_number Номер поезда (например, "TGV789")
         @param class_type Множитель цены за класс (1 = плацкарт, 2 = купе и т.д.)
+        @param seats Количество мест (по умолчанию None — без ограничения)
         """
         super().__init__(
             start_point,
             end_point,
             start_time,
             end_time,
-            price * class_type / 2
+            price * class_type / 2,
+            seats=seats
         )
         self.train_number = train_number
 
@@ -178,7 +229,8 @@ class Bus(Transport):
         end_time: datetime,
         price_for_hour: float,
         bus_number: str,
-        bus_company: int
+        bus_company: int,
+        seats: Optional[int] = None
     ):
         """
         @brief Конструктор автобуса
@@ -189,13 +241,15 @@ class Bus(Transport):
         @param price_for_hour Стоимость за час поездки
         @param bus_number Номер автобуса (например, "BUS-456")
         @param bus_company Идентификатор транспортной компании
+        @param seats Количество мест (по умолчанию None — без ограничения)
         """
         super().__init__(
             start_point,
             end_point,
             start_time,
             end_time,
-            price_for_hour
+            price_for_hour,
+            seats=seats
         )
         self.bus_number = bus_number
         self.bus_company = bus_company
@@ -266,16 +320,16 @@ class CarRental:
         @exception NotEnoughMoney Если на счёте клиента недостаточно средств
         """
         if self.is_rented:
-            print(f"{self.car_model} is already rented")
+            emit("car_already_rented", car_model=self.car_model)
             return False
         try:
             Transaction(person.bank_account, self.rental_service_bank_account, self.total_price)
         except NotEnoughMoney:
-            print("Not enough money")
+            emit("car_not_enough_money", car_model=self.car_model)
             return False
 
         self.is_rented = True
-        print(f"Car {self.car_model} rented in {self.city} for {self.total_price:.2f}")
+        emit("car_rented", car_model=self.car_model, city=self.city, price=self.total_price)
         return True
 
     def __str__(self) -> str:
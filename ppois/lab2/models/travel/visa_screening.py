@@ -0,0 +1,129 @@
+from array import array
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+from models.people.person import Person as Client
+from .tour import Tour
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+SCREENING_BLOCK = 1 << 22
+"""
+@brief Константа: предел размера блока «клиенты × туры», сравниваемого за один векторный шаг
+"""
+
+
+class VisaScreening:
+    """
+    @brief Колоночный снимок виз для пакетной проверки совместимости клиентов с турами
+    @details Один раз раскладывает визы клиентов по массивам: номер страны, порядковые
+    номера дат выдачи и окончания, оставшиеся въезды и флаг активности. Проверка даёт тот
+    же результат, что Tour.check_visa для каждой пары, но date.today() вычисляется один
+    раз на пакет, а клиенты заранее сгруппированы по стране визы, поэтому каждый тур
+    сравнивается только с клиентами своей страны. С NumPy сравнение выполняется блоками
+    векторно; без NumPy используется тот же алгоритм на модуле array.
+    Клиенты без паспорта или визы в снимок не попадают и ни одному туру не подходят.
+    """
+
+    def __init__(self, clients: Sequence[Client]):
+        """
+        @brief Конструктор снимка
+        @param clients Клиенты (Person) для проверки
+        @note Снимок не следит за изменениями виз: после use_entry() или deactivate()
+        его нужно построить заново
+        """
+        self.clients = list(clients)
+        self.__country_ids: Dict[str, int] = {}
+        self.positions = array("q")
+        self.countries = array("q")
+        self.issue_ordinals = array("q")
+        self.expiration_ordinals = array("q")
+        self.remaining_entries = array("q")
+        self.active = array("b")
+
+        for position, client in enumerate(self.clients):
+            passport = getattr(client, "passport", None)
+            visa = passport.visa if passport is not None else None
+            if visa is None:
+                continue
+            self.positions.append(position)
+            self.countries.append(self.__country_ids.setdefault(visa.country, len(self.__country_ids)))
+            self.issue_ordinals.append(visa.issue_date.toordinal())
+            self.expiration_ordinals.append(visa.expiration_date.toordinal())
+            self.remaining_entries.append(visa.entry_count - visa.used_entries)
+            self.active.append(visa.is_active)
+
+    def __len__(self) -> int:
+        """
+        @brief Количество виз в снимке
+        @return Число клиентов с визой
+        """
+        return len(self.positions)
+
+    def __groups(self, today: int) -> Dict[int, List[int]]:
+        """
+        @brief Группирует действующие визы по стране
+        @param today Порядковый номер текущей даты
+        @return Словарь {номер страны: строки снимка с действующей визой}
+        """
+        groups: Dict[int, List[int]] = {}
+        for row in range(len(self.positions)):
+            if self.active[row] and self.remaining_entries[row] > 0 and self.expiration_ordinals[row] >= today:
+                groups.setdefault(self.countries[row], []).append(row)
+        return groups
+
+    def screen_positions(self, tours: Sequence[Tour], today: Optional[date] = None) -> List[Tuple[int, int]]:
+        """
+        @brief Находит совместимые пары «клиент — тур» по номерам
+        @param tours Туры для проверки
+        @param today Дата проверки (по умолчанию date.today(), вычисляется один раз)
+        @return Список пар (номер клиента в self.clients, номер тура в tours),
+        упорядоченный по туру, затем по клиенту
+        """
+        today = (today or date.today()).toordinal()
+        groups = self.__groups(today)
+        by_country: Dict[int, List[int]] = {}
+        for tour_position, tour in enumerate(tours):
+            country = self.__country_ids.get(tour.destination.country.name)
+            if country in groups:
+                by_country.setdefault(country, []).append(tour_position)
+
+        starts = [tour.start_date.toordinal() for tour in tours]
+        ends = [tour.end_date.toordinal() for tour in tours]
+        pairs: List[Tuple[int, int]] = []
+        for country, tour_positions in by_country.items():
+            rows = groups[country]
+            if np is not None:
+                issued = np.array([self.issue_ordinals[row] for row in rows], dtype=np.int64)
+                expires = np.array([self.expiration_ordinals[row] for row in rows], dtype=np.int64)
+                clients = np.array([self.positions[row] for row in rows], dtype=np.int64)
+                columns = np.array(tour_positions, dtype=np.int64)
+                block = max(1, SCREENING_BLOCK // len(rows))
+                for offset in range(0, len(columns), block):
+                    chunk = columns[offset:offset + block]
+                    chunk_starts = np.array([starts[position] for position in chunk], dtype=np.int64)
+                    chunk_ends = np.array([ends[position] for position in chunk], dtype=np.int64)
+                    mask = (issued[:, None] <= chunk_starts[None, :]) & (expires[:, None] >= chunk_ends[None, :])
+                    client_rows, tour_columns = np.nonzero(mask)
+                    pairs.extend(zip(clients[client_rows].tolist(), chunk[tour_columns].tolist()))
+                continue
+
+            for tour_position in tour_positions:
+                start, end = starts[tour_position], ends[tour_position]
+                pairs.extend((self.positions[row], tour_position) for row in rows
+                             if self.issue_ordinals[row] <= start and self.expiration_ordinals[row] >= end)
+        pairs.sort(key=lambda pair: (pair[1], pair[0]))
+        return pairs
+
+    def screen(self, tours: Sequence[Tour], today: Optional[date] = None) -> List[Tuple[Client, Tour]]:
+        """
+        @brief Находит совместимые пары «клиент — тур»
+        @param tours Туры для проверки
+        @param today Дата проверки (по умолчанию date.today(), вычисляется один раз)
+        @return Список пар (клиент, тур), упорядоченный по туру, затем по клиенту
+        """
+        tours = list(tours)
+        return [(self.clients[client], tours[tour]) for client, tour in self.screen_positions(tours, today)]
@@ -1,4 +1,22 @@
-from datetime import datetime
+import asyncio
+from threading import RLock
+from typing import Dict, List, Tuple
+from .journal import STATUS_COMMITTED, STATUS_FAILED
+from .ids import next_id
+from .events import emit
+
+
+TRANSACTION_FEE = 0.03
+"""
+@brief Константа: комиссия банка за перевод
+@details Списывается с отправителя сверх суммы перевода (3%).
+"""
+
+ASYNC_LOCK_BACKOFF = (0.0005, 0.05)
+"""
+@brief Константа: начальная и наибольшая пауза (в секундах) асинхронного ожидания занятого счёта
+@details Пауза удваивается после каждой неудачной попытки захватить блокировки.
+"""
 
 class NotEnoughMoney(Exception):
     """
@@ -15,43 +33,64 @@ class Transaction:
     """
     @brief Представляет банковскую транзакцию между двумя счетами
     @details Автоматически обрабатывает перевод средств с комиссией 3%.
-    Генерирует уникальный номер транзакции на основе ID счетов и времени.
+    Генерирует уникальный номер транзакции на основе ID счетов и генератора services.ids.
     """
 
-    def __init__(self, bank_sender, bank_receiver, price: float):
+    __slots__ = ("price", "sender", "receiver", "ledger", "transaction_number")
+
+    def __init__(self, bank_sender, bank_receiver, price: float, ledger: 'Ledger' = None):
         """
         @brief Конструктор транзакции
         @param bank_sender Счёт-отправитель средств
         @param bank_receiver Счёт-получатель средств
         @param price Сумма перевода (до удержания комиссии)
+        @param ledger Реестр, проводящий перевод (по умолчанию общий DEFAULT_LEDGER)
         @exception NotEnoughMoney Если на счёте отправителя недостаточно средств
         с учётом комиссии 3%
         """
+        self.__setup(bank_sender, bank_receiver, price, ledger)
+        self.process_transaction()
+
+    def __setup(self, bank_sender, bank_receiver, price: float, ledger: 'Ledger'):
+        """
+        @brief Заполняет поля транзакции (без проведения перевода)
+        """
         self.price = price
         self.sender = bank_sender
         self.receiver = bank_receiver
-        self.transaction_number = (
-            bank_sender.id + "_" + bank_receiver.id + "_" + 
-            datetime.now().strftime("%Y%m%d%H%M%S")
-        )
-        self.process_transaction()
+        self.ledger = ledger or DEFAULT_LEDGER
+        self.transaction_number = f"{bank_sender.id}_{bank_receiver.id}_{next_id()}"
+
+    @classmethod
+    async def create_async(cls, bank_sender, bank_receiver, price: float, ledger: 'Ledger' = None) -> 'Transaction':
+        """
+        @brief Асинхронно создаёт и проводит транзакцию
+        @details Ожидание блокировок счетов не блокирует цикл событий (см. Ledger.transfer_async).
+        @param bank_sender Счёт-отправитель средств
+        @param bank_receiver Счёт-получатель средств
+        @param price Сумма перевода (до удержания комиссии)
+        @param ledger Реестр, проводящий перевод (по умолчанию общий DEFAULT_LEDGER)
+        @return Проведённая транзакция
+        @exception NotEnoughMoney Если на счёте отправителя недостаточно средств с учётом комиссии
+        """
+        transaction = cls.__new__(cls)
+        transaction.__setup(bank_sender, bank_receiver, price, ledger)
+        await transaction.ledger.transfer_async(bank_sender, bank_receiver, price)
+        return transaction
 
     def process_transaction(self):
         """
         @brief Выполняет обработку транзакции
         @details Списывает сумму + 3% комиссии с отправителя и зачисляет сумму получателю.
+        Проверка баланса и оба изменения выполняются в реестре под блокировками обоих счетов.
         @exception NotEnoughMoney Если средств недостаточно для покрытия суммы и комиссии
         """
-        if (self.sender.sum - self.price * 1.03 < 0):
-            raise NotEnoughMoney()
-        
-        self.sender.withdraw(self.price * 1.03) 
-        self.receiver.transfer(self.price)
+        self.ledger.transfer(self.sender, self.receiver, self.price)
 
     def get_transaction_number(self) -> str:
         """
         @brief Возвращает уникальный номер транзакции
-        @return Строка в формате: "senderID_receiverID_YYYYMMDDHHMMSS"
+        @return Строка в формате: "senderID_receiverID_<уникальный номер>"
         """
         return self.transaction_number
 
@@ -70,6 +109,8 @@ class BankAccount:
     Используется для оплаты туристических услуг.
     """
 
+    __slots__ = ("sum", "id", "lock", "transaction")
+
     def __init__(self, sum: float, id: str):
         """
         @brief Конструктор банковского счёта
@@ -78,6 +119,7 @@ class BankAccount:
         """
         self.sum = sum
         self.id = id
+        self.lock = RLock()
 
     def make_transaction(self, other, price: float):
         """
@@ -89,29 +131,236 @@ class BankAccount:
         """
         try:
             self.transaction = Transaction(self, other, price)
-            print(f"transaction {self.transaction.transaction_number} has successfully processed")
+            emit("transaction_processed", number=self.transaction.transaction_number)
         except NotEnoughMoney:
             raise NotEnoughMoney()
 
+    async def make_transaction_async(self, other, price: float):
+        """
+        @brief Асинхронно инициирует транзакцию на другой счёт
+        @param other Счёт получателя
+        @param price Сумма перевода
+        @exception NotEnoughMoney Если средств недостаточно для перевода с комиссией
+        @note При успешной транзакции объект Transaction сохраняется в self.transaction
+        """
+        self.transaction = await Transaction.create_async(self, other, price)
+        emit("transaction_processed", number=self.transaction.transaction_number)
+
     def withdraw(self, price: float):
         """
         @brief Списывает сумму со счёта
         @param price Сумма для снятия
         @note Операция выполняется только если остаток остаётся положительным
         """
-        if self.sum - price > 0:
-            self.sum -= price
+        with self.lock:
+            if self.sum - price > 0:
+                self.sum -= price
 
     def transfer(self, price: float):
         """
         @brief Пополняет счёт на указанную сумму
         @param price Сумма пополнения
         """
-        self.sum += price
+        with self.lock:
+            self.sum += price
 
     def get_sum(self) -> float:
         """
         @brief Возвращает текущий баланс счёта
         @return Текущая сумма на счёте
         """
-        return self.sum
\ No newline at end of file
+        return self.sum
+
+
+class Ledger:
+    """
+    @brief Реестр переводов между банковскими счетами
+    @details Защищает перевод блокировками обоих счетов. Блокировки берутся в детерминированном
+    порядке (по id счёта, затем по идентичности объекта), поэтому встречные переводы
+    A -> B и B -> A не взаимоблокируются, переводы между непересекающимися парами
+    счетов идут параллельно, а переводы с участием одного счёта выполняются по очереди.
+    Если задан журнал, каждая попытка перевода записывается в него со своим статусом.
+    """
+
+    def __init__(self, journal=None):
+        """
+        @brief Конструктор реестра
+        @param journal Журнал TransactionJournal для аудита и восстановления (по умолчанию не ведётся)
+        """
+        self.journal = journal
+
+    def __encode(self, sender: BankAccount, receiver: BankAccount, price: float, fee: float,
+                 committed: bool) -> List[bytes]:
+        """
+        @brief Кодирует запись журнала о попытке перевода, если журнал подключён
+        @details Вызывается до изменения балансов, чтобы ошибка кодирования (например,
+        слишком длинный id счёта) не оставила журнал и балансы рассогласованными.
+        @return Список из одной записи или пустой список без журнала
+        @exception ValueError Если запись нельзя закодировать
+        """
+        if self.journal is None:
+            return []
+        return [self.journal.encode(sender.id, receiver.id, price, fee,
+                                    STATUS_COMMITTED if committed else STATUS_FAILED)]
+
+    def __write(self, records: List[bytes]):
+        """
+        @brief Добавляет закодированные записи в журнал, если он подключён
+        @param records Записи, полученные из __encode()
+        """
+        if self.journal is not None and records:
+            self.journal.append_encoded(records)
+
+    @staticmethod
+    def lock_order(*accounts: BankAccount) -> List[BankAccount]:
+        """
+        @brief Возвращает счета в порядке захвата блокировок
+        @param accounts Участвующие счета (повторы допускаются)
+        @return Список уникальных счетов, упорядоченный детерминированно
+        """
+        unique = {id(account): account for account in accounts}
+        return sorted(unique.values(), key=lambda account: (account.id, id(account)))
+
+    def __acquire(self, accounts: List[BankAccount]):
+        """
+        @brief Захватывает блокировки счетов в порядке lock_order
+        @param accounts Счета, уже упорядоченные методом lock_order
+        """
+        for account in accounts:
+            account.lock.acquire()
+
+    def __release(self, accounts: List[BankAccount]):
+        """
+        @brief Освобождает блокировки счетов в обратном порядке
+        @param accounts Счета, переданные ранее в __acquire
+        """
+        for account in reversed(accounts):
+            account.lock.release()
+
+    def __apply(self, sender: BankAccount, receiver: BankAccount, price: float,
+                fee_rate: float) -> Tuple[List[bytes], bool]:
+        """
+        @brief Проверяет покрытие и меняет балансы (вызывается под блокировками обоих счетов)
+        @details Балансы меняются напрямую, как в settle_batch(): перевод, списывающий
+        баланс ровно до нуля, проходит (BankAccount.withdraw() такое списание пропустил бы).
+        @return Пара (записи журнала, успех перевода)
+        @exception ValueError Если запись журнала нельзя закодировать (балансы не меняются)
+        """
+        charge = price * (1 + fee_rate)
+        if sender.sum - charge < 0:
+            return self.__encode(sender, receiver, price, price * fee_rate, False), False
+        records = self.__encode(sender, receiver, price, price * fee_rate, True)
+        sender.sum -= charge
+        receiver.sum += price
+        return records, True
+
+    def transfer(self, sender: BankAccount, receiver: BankAccount, price: float, fee_rate: float = TRANSACTION_FEE):
+        """
+        @brief Атомарно переводит сумму между счетами
+        @param sender Счёт-отправитель
+        @param receiver Счёт-получатель
+        @param price Сумма перевода
+        @param fee_rate Комиссия, списываемая с отправителя сверх суммы
+        @exception NotEnoughMoney Если средств отправителя не хватает на сумму с комиссией
+        @exception ValueError Если запись журнала нельзя закодировать (балансы не меняются)
+        @note Запись журнала добавляется до освобождения блокировок счетов
+        """
+        accounts = self.lock_order(sender, receiver)
+        self.__acquire(accounts)
+        try:
+            records, committed = self.__apply(sender, receiver, price, fee_rate)
+            self.__write(records)
+        finally:
+            self.__release(accounts)
+        if not committed:
+            raise NotEnoughMoney()
+
+    async def transfer_async(self, sender: BankAccount, receiver: BankAccount, price: float,
+                             fee_rate: float = TRANSACTION_FEE):
+        """
+        @brief Асинхронно и атомарно переводит сумму между счетами
+        @details Блокировки счетов (те же, что у transfer()) захватываются в порядке lock_order
+        без ожидания. Если какая-то занята — например, переводом из другого потока, — уже
+        захваченные освобождаются, и корутина засыпает (asyncio.sleep) перед новой попыткой;
+        пауза растёт от ASYNC_LOCK_BACKOFF[0] до ASYNC_LOCK_BACKOFF[1], поэтому ожидание
+        не блокирует цикл событий и не загружает его холостыми проверками.
+        Балансы меняются под блокировками, а запись журнала (с возможным сбросом на диск)
+        выполняется после их освобождения в пуле потоков цикла (run_in_executor).
+        @param sender Счёт-отправитель
+        @param receiver Счёт-получатель
+        @param price Сумма перевода
+        @param fee_rate Комиссия, списываемая с отправителя сверх суммы
+        @exception NotEnoughMoney Если средств отправителя не хватает на сумму с комиссией
+        @exception ValueError Если запись журнала нельзя закодировать (балансы не меняются)
+        @note Порядок записей журнала у параллельных асинхронных переводов может отличаться
+        от порядка изменения балансов; сумма изменений по каждому счёту при этом совпадает
+        """
+        accounts = self.lock_order(sender, receiver)
+        delay, longest = ASYNC_LOCK_BACKOFF
+        while True:
+            acquired = []
+            for account in accounts:
+                if not account.lock.acquire(blocking=False):
+                    break
+                acquired.append(account)
+            if len(acquired) == len(accounts):
+                break
+            self.__release(acquired)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, longest)
+        try:
+            records, committed = self.__apply(sender, receiver, price, fee_rate)
+        finally:
+            self.__release(acquired)
+        if self.journal is not None and records:
+            await asyncio.get_running_loop().run_in_executor(None, self.__write, records)
+        if not committed:
+            raise NotEnoughMoney()
+
+    def settle_batch(self, transfers: List[Tuple[BankAccount, BankAccount, float]],
+                     fee_rate: float = TRANSACTION_FEE) -> List[bool]:
+        """
+        @brief Проводит пакет переводов одной атомарной операцией
+        @details За один проход проверяет покрытие каждого перевода текущим балансом
+        отправителя (за вычетом уже принятых переводов этого же отправителя), суммирует
+        списания по отправителям и зачисления по получателям и применяет итог к каждому
+        счёту одним изменением под блокировками всех участников. Горячий счёт получателя
+        блокируется один раз на весь пакет, а не на каждый перевод.
+        @param transfers Список кортежей (отправитель, получатель, сумма) в порядке приоритета
+        @param fee_rate Комиссия, списываемая с отправителя сверх суммы
+        @return Список флагов успеха в порядке transfers
+        @exception ValueError Если запись журнала нельзя закодировать (балансы не меняются)
+        @note Зачисления внутри пакета не покрывают списания этого же пакета
+        """
+        accounts = self.lock_order(*(account for sender, receiver, _ in transfers
+                                     for account in (sender, receiver)))
+        self.__acquire(accounts)
+        try:
+            available: Dict[int, float] = {}
+            net: Dict[int, float] = {}
+            results = []
+            records: List[bytes] = []
+            for sender, receiver, price in transfers:
+                charge = price * (1 + fee_rate)
+                balance = available.get(id(sender), sender.sum)
+                if balance - charge < 0:
+                    records += self.__encode(sender, receiver, price, price * fee_rate, False)
+                    results.append(False)
+                    continue
+                records += self.__encode(sender, receiver, price, price * fee_rate, True)
+                available[id(sender)] = balance - charge
+                net[id(sender)] = net.get(id(sender), 0.0) - charge
+                net[id(receiver)] = net.get(id(receiver), 0.0) + price
+                results.append(True)
+            for account in accounts:
+                account.sum += net.get(id(account), 0.0)
+            self.__write(records)
+            return results
+        finally:
+            self.__release(accounts)
+
+
+DEFAULT_LEDGER = Ledger()
+"""
+@brief Общий реестр переводов, используемый транзакциями по умолчанию
+"""
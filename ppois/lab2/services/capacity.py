@@ -0,0 +1,96 @@
+from itertools import count
+from threading import Lock
+from typing import List
+
+
+LOCK_STRIPES = 64
+"""
+@brief Константа: количество блокировок, между которыми распределяются счётчики ёмкости
+"""
+
+_STRIPES: List[Lock] = [Lock() for _ in range(LOCK_STRIPES)]
+_next_stripe = count()
+
+
+class CapacityExhausted(Exception):
+    """
+    @brief Исключение: свободных мест не осталось
+    @details Выбрасывается, если запрошено больше мест, чем осталось в счётчике.
+    """
+    def __init__(self, requested: int, remaining: int):
+        """
+        @brief Конструктор исключения
+        @param requested Запрошенное количество мест
+        @param remaining Оставшееся количество мест
+        """
+        super().__init__(f"Requested {requested} places, only {remaining} left")
+
+
+class CapacityCounter:
+    """
+    @brief Счётчик мест (кресел, коек) с атомарным резервированием
+    @details Резервирование и освобождение выполняются под блокировкой, но блокировки
+    не принадлежат счётчикам: каждый счётчик берёт одну из LOCK_STRIPES общих блокировок
+    по кругу (lock striping). Так миллион счётчиков не создаёт миллион блокировок,
+    а бронирования разных рейсов почти никогда не ждут друг друга.
+    Чтение остатка выполняется без блокировки.
+    """
+
+    __slots__ = ("capacity", "__reserved", "__lock")
+
+    def __init__(self, capacity: int):
+        """
+        @brief Конструктор счётчика
+        @param capacity Общее количество мест
+        @exception ValueError Если capacity отрицательно
+        """
+        if capacity < 0:
+            raise ValueError("capacity must not be negative")
+        self.capacity = capacity
+        self.__reserved = 0
+        self.__lock = _STRIPES[next(_next_stripe) % LOCK_STRIPES]
+
+    def remaining(self) -> int:
+        """
+        @brief Возвращает количество свободных мест
+        @return capacity минус зарезервированные места
+        """
+        return self.capacity - self.__reserved
+
+    def try_reserve(self, places: int = 1) -> bool:
+        """
+        @brief Пытается зарезервировать места
+        @param places Количество мест
+        @return True, если места зарезервированы; False, если их не хватает
+        @exception ValueError Если places < 1
+        """
+        if places < 1:
+            raise ValueError("places must be positive")
+        with self.__lock:
+            if self.__reserved + places > self.capacity:
+                return False
+            self.__reserved += places
+            return True
+
+    def reserve(self, places: int = 1):
+        """
+        @brief Резервирует места
+        @param places Количество мест
+        @exception CapacityExhausted Если свободных мест меньше, чем places
+        @exception ValueError Если places < 1
+        """
+        if not self.try_reserve(places):
+            raise CapacityExhausted(places, self.remaining())
+
+    def release(self, places: int = 1):
+        """
+        @brief Освобождает ранее зарезервированные места
+        @param places Количество мест
+        @exception ValueError Если places < 1 или освобождается больше, чем зарезервировано
+        """
+        if places < 1:
+            raise ValueError("places must be positive")
+        with self.__lock:
+            if places > self.__reserved:
+                raise ValueError("cannot release more places than reserved")
+            self.__reserved -= places
@@ -0,0 +1,203 @@
+import json
+import time
+from collections import deque
+from queue import SimpleQueue
+from threading import Thread
+from typing import Callable, Dict, List, Tuple, Union
+
+
+MESSAGES: Dict[str, Union[str, Callable[[dict], str]]] = {
+    "attribute_missing": "attribute {name} not found",
+    "sight_outside_destination": "Sight is not in the tour destination: {destination}",
+    "sight_visited": "{info}",
+    "tour_visa_incompatible": "{error}",
+    "tour_not_enough_money": "Not enough money to book the tour.",
+    "tour_booked": "Tour to {destination} booked successfully for {price:.2f}!",
+    "tours_offered": lambda fields: " ".join(str(tour) for tour in fields["tours"]),
+    "agent_booked_tour": "Tour booked by agent {agent} for {client}. Commission: {commission:.2f}",
+    "transaction_processed": "transaction {number} has successfully processed",
+    "booking_confirmed": "Booking {booking_id} confirmed.",
+    "booking_not_confirmed": "Booking is not confirmed yet.",
+    "booking_cancelled": "Booking {booking_id} cancelled.",
+    "transport_sold_out": "no seats left on {transport}",
+    "transport_not_enough_money": "not enough money to book transport",
+    "accommodation_unavailable": "{accommodation} is not available from {start_date} to {end_date}",
+    "car_already_rented": "{car_model} is already rented",
+    "car_not_enough_money": "Not enough money",
+    "car_rented": "Car {car_model} rented in {city} for {price:.2f}",
+    "service_booked": "Service '{service}' booked for {client}",
+    "service_not_enough_money": "Not enough money to book service",
+    "invoice_sent": "Invoice {invoice_id} sent to {recipient}",
+    "payment_processed": "Payment {payment_id} processed for {amount}",
+    "payment_failed": "Payment failed: not enough money",
+    "order_placed": "Order {order_id} placed, invoice {invoice_id} created",
+    "order_cancelled": "Order {order_id} cancelled",
+    "mood_sad": "you are now sad, go make some activities",
+    "mood_fine": "you feel yourself fine",
+    "mood_great": "you feel very well",
+}
+"""
+@brief Шаблоны текстовых сообщений для событий
+@details Значение — строка для str.format по полям события либо функция от словаря полей.
+Форматирование выполняется только приёмником, который выводит текст.
+"""
+
+
+def format_event(event: str, fields: dict) -> str:
+    """
+    @brief Форматирует событие в текстовое сообщение
+    @param event Имя события
+    @param fields Поля события
+    @return Текст сообщения (для неизвестных событий — имя и поля)
+    """
+    template = MESSAGES.get(event)
+    if template is None:
+        return f"{event}: {fields}"
+    if callable(template):
+        return template(fields)
+    return template.format(**fields)
+
+
+class EventSink:
+    """
+    @brief Базовый приёмник структурированных событий
+    @details Вызывающий код передаёт имя события и сырые поля (объекты, числа);
+    превращение в текст, если оно нужно, выполняет приёмник.
+    """
+
+    enabled = True
+
+    def emit(self, event: str, fields: dict):
+        """
+        @brief Принимает событие
+        @param event Имя события (ключ MESSAGES)
+        @param fields Поля события
+        """
+        raise NotImplementedError
+
+
+class NullSink(EventSink):
+    """
+    @brief Приёмник, отбрасывающий все события
+    @details Отключён (enabled = False), поэтому emit() возвращается, не передавая ему поля.
+    """
+
+    enabled = False
+
+    def emit(self, event: str, fields: dict):
+        """@brief Ничего не делает"""
+
+
+class ConsoleSink(EventSink):
+    """
+    @brief Приёмник, печатающий события в консоль
+    @details Повторяет прежний вывод print() в моделях.
+    """
+
+    def emit(self, event: str, fields: dict):
+        """@brief Форматирует событие и печатает его"""
+        print(format_event(event, fields))
+
+
+class RingBufferSink(EventSink):
+    """
+    @brief Приёмник, хранящий последние события в памяти
+    @details Кольцевой буфер фиксированного размера без форматирования;
+    подходит для тестов и для просмотра недавней истории под нагрузкой.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        @brief Конструктор буфера
+        @param capacity Максимальное количество хранимых событий
+        """
+        self.events: deque = deque(maxlen=capacity)
+
+    def emit(self, event: str, fields: dict):
+        """@brief Сохраняет событие с отметкой времени"""
+        self.events.append((time.time(), event, fields))
+
+    def names(self) -> List[str]:
+        """
+        @brief Возвращает имена сохранённых событий
+        @return Список имён событий в порядке поступления
+        """
+        return [event for _, event, _ in self.events]
+
+
+class AsyncFileSink(EventSink):
+    """
+    @brief Приёмник, записывающий события в файл в фоновом потоке
+    @details emit() только кладёт событие в очередь; сериализация в JSON Lines
+    и запись в файл выполняются отдельным потоком.
+    """
+
+    def __init__(self, path: str):
+        """
+        @brief Конструктор приёмника
+        @param path Путь к файлу журнала событий (дописывается)
+        """
+        self.path = path
+        self.__queue: SimpleQueue = SimpleQueue()
+        self.__writer = Thread(target=self.__write_loop, daemon=True)
+        self.__writer.start()
+
+    def emit(self, event: str, fields: dict):
+        """@brief Ставит событие в очередь записи"""
+        self.__queue.put((time.time(), event, fields))
+
+    def __write_loop(self):
+        """
+        @brief Цикл фонового потока: записывает события, пока не получит None
+        """
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                item: Tuple[float, str, dict] = self.__queue.get()
+                if item is None:
+                    break
+                timestamp, event, fields = item
+                file.write(json.dumps({"time": timestamp, "event": event, **fields}, default=str))
+                file.write("\n")
+                if self.__queue.empty():
+                    file.flush()
+
+    def close(self):
+        """
+        @brief Дожидается записи всех событий и останавливает фоновый поток
+        """
+        self.__queue.put(None)
+        self.__writer.join()
+
+
+_sink: EventSink = ConsoleSink()
+
+
+def set_event_sink(sink: EventSink) -> EventSink:
+    """
+    @brief Устанавливает приёмник событий процесса
+    @param sink Новый приёмник (например, NullSink() для тихого режима)
+    @return Предыдущий приёмник
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def get_event_sink() -> EventSink:
+    """
+    @brief Возвращает текущий приёмник событий
+    @return Объект EventSink
+    """
+    return _sink
+
+
+def emit(event: str, **fields):
+    """
+    @brief Отправляет событие текущему приёмнику
+    @details Если приёмник отключён, событие отбрасывается без какого-либо форматирования.
+    @param event Имя события
+    @param fields Поля события
+    """
+    sink = _sink
+    if sink.enabled:
+        sink.emit(event, fields)
@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+import weakref
+from typing import List, Optional, Tuple
+
+
+ID_EPOCH_MS = 1704067200000
+"""
+@brief Константа: начало отсчёта времени идентификаторов (2024-01-01 UTC, в миллисекундах)
+"""
+
+NODE_BITS = 10
+"""
+@brief Константа: число бит номера узла (процесса)
+"""
+
+THREAD_BITS = 10
+"""
+@brief Константа: число бит номера потока внутри процесса
+"""
+
+SEQUENCE_BITS = 12
+"""
+@brief Константа: число бит счётчика внутри одной миллисекунды
+"""
+
+NODE_ENV = "ID_NODE"
+"""
+@brief Константа: переменная окружения с номером узла (индексом рабочего процесса)
+"""
+
+
+_GENERATORS: 'weakref.WeakSet[IdGenerator]' = weakref.WeakSet()
+"""
+@brief Живые генераторы процесса, состояние которых сбрасывается в дочернем процессе после fork
+"""
+
+
+class IdGeneratorExhausted(Exception):
+    """
+    @brief Исключение: закончились номера потоков генератора
+    @details Выбрасывается, если одновременно живых потоков больше, чем 2^THREAD_BITS.
+    """
+    def __init__(self):
+        """@brief Конструктор исключения"""
+        super().__init__("No free thread slots left in id generator")
+
+
+class NodeIdRequired(Exception):
+    """
+    @brief Исключение: у процесса нет номера узла
+    @details Выбрасывается в дочернем процессе после fork, если номер узла ни разу не был
+    задан явно (ни параметром, ни ID_NODE, ни set_node_id()), пока процессу не назначат
+    собственный номер: номер родителя по умолчанию привёл бы к совпадению идентификаторов.
+    """
+    def __init__(self):
+        """@brief Конструктор исключения"""
+        super().__init__("Id generator needs an explicit node_id in this process (call set_node_id)")
+
+
+class _ThreadSlot:
+    """
+    @brief Состояние генератора для одного потока
+    @details Возвращает свой номер в пул генератора, когда поток завершается
+    и его thread-local хранилище уничтожается.
+    """
+
+    def __init__(self, generator: 'IdGenerator', slot: int, generation: int):
+        """
+        @brief Конструктор состояния потока
+        @param generator Генератор-владелец
+        @param slot Номер потока в генераторе
+        @param generation Поколение пула номеров, из которого выделен slot
+        """
+        self.generator = generator
+        self.slot = slot
+        self.generation = generation
+        self.last_ms = -1
+        self.sequence = 0
+
+    def __del__(self):
+        """@brief Возвращает номер потока в пул"""
+        self.generator._release_slot(self)
+
+
+class IdGenerator:
+    """
+    @brief Генератор уникальных идентификаторов в стиле Snowflake
+    @details Идентификатор — целое число из полей: миллисекунды от ID_EPOCH_MS,
+    номер узла, номер потока и счётчик внутри миллисекунды. У каждого потока свой
+    номер и свой счётчик, поэтому выдача не требует блокировок. Время берётся
+    с монотонных часов; при переполнении счётчика поток занимает следующую
+    миллисекунду, не дожидаясь её. Разные процессы различаются номером узла, который
+    задаётся явно: параметром node_id, переменной окружения ID_NODE (индекс рабочего
+    процесса) или set_node_id(). Без него генератор рассчитан на один процесс (узел 0).
+    @note После fork дочерний процесс заново читает ID_NODE. Явно заданный номер узла
+    сохраняется (различать рабочие процессы — забота того, кто их запускает, например
+    через ID_NODE); если же номер не задавался явно, next_id() выбрасывает NodeIdRequired,
+    пока процессу не назначат свой номер через set_node_id()
+    """
+
+    def __init__(self, node_id: int = None):
+        """
+        @brief Конструктор генератора
+        @param node_id Номер узла 0..2^NODE_BITS-1 (по умолчанию — из ID_NODE, иначе 0)
+        @exception ValueError Если node_id вне допустимого диапазона
+        """
+        self.__explicit = node_id is not None
+        if node_id is None:
+            node_id = self.__environment_node()
+            self.__explicit = node_id is not None
+        node_id = node_id or 0
+        self.__check_node(node_id)
+        self.node_id: Optional[int] = node_id
+        self.__slots_lock = threading.Lock()
+        self.__reset()
+        _GENERATORS.add(self)
+
+    @classmethod
+    def __environment_node(cls) -> Optional[int]:
+        """
+        @brief Читает номер узла из переменной окружения ID_NODE
+        @return Номер узла или None, если переменная не задана
+        @exception ValueError Если номер вне допустимого диапазона
+        """
+        value = os.environ.get(NODE_ENV)
+        if value is None:
+            return None
+        cls.__check_node(int(value))
+        return int(value)
+
+    @staticmethod
+    def __check_node(node_id: int):
+        """
+        @brief Проверяет номер узла
+        @param node_id Номер узла
+        @exception ValueError Если node_id вне допустимого диапазона
+        """
+        if not 0 <= node_id < (1 << NODE_BITS):
+            raise ValueError(f"node_id must be in [0, {1 << NODE_BITS})")
+
+    def set_node_id(self, node_id: int):
+        """
+        @brief Назначает процессу номер узла (например, индекс рабочего процесса)
+        @param node_id Номер узла 0..2^NODE_BITS-1, уникальный среди процессов
+        @exception ValueError Если node_id вне допустимого диапазона
+        """
+        self.__check_node(node_id)
+        self.node_id = node_id
+        self.__explicit = True
+
+    def _after_fork(self):
+        """
+        @brief Сбрасывает состояние в дочернем процессе после fork
+        @details Блокировка пула создаётся заново (fork мог произойти, пока её держал
+        другой поток). Номер узла берётся из ID_NODE, если переменная задана; явно заданный
+        номер сохраняется, а номер по умолчанию снимается до вызова set_node_id().
+        """
+        self.__slots_lock = threading.Lock()
+        node_id = self.__environment_node()
+        if node_id is not None:
+            self.node_id, self.__explicit = node_id, True
+        elif not self.__explicit:
+            self.node_id = None
+        self.__reset()
+
+    def __reset(self):
+        """
+        @brief Сбрасывает часы и пул номеров потоков (при создании и после fork)
+        """
+        self.__wall_ms = time.time_ns() // 1_000_000 - ID_EPOCH_MS
+        self.__mono_ns = time.monotonic_ns()
+        self.__generation = getattr(self, "_IdGenerator__generation", -1) + 1
+        self.__free_slots: List[int] = list(range((1 << THREAD_BITS) - 1, -1, -1))
+        self.__slot_clocks: List[Tuple[int, int]] = [(-1, 0)] * (1 << THREAD_BITS)
+        self.__local = threading.local()
+
+    def _release_slot(self, state: _ThreadSlot):
+        """
+        @brief Возвращает номер потока в пул
+        @details Вместе с номером сохраняются последняя миллисекунда и счётчик потока,
+        чтобы следующий поток с этим номером не выдал уже использованные значения.
+        @param state Состояние завершившегося потока
+        @note Номера, выданные до fork, в пул дочернего процесса не возвращаются
+        """
+        with self.__slots_lock:
+            if state.generation == self.__generation:
+                self.__slot_clocks[state.slot] = (state.last_ms, state.sequence)
+                self.__free_slots.append(state.slot)
+
+    def __thread_slot(self) -> _ThreadSlot:
+        """
+        @brief Возвращает состояние текущего потока, выделяя номер при первом обращении
+        @return Объект _ThreadSlot
+        @exception IdGeneratorExhausted Если свободных номеров нет
+        """
+        state = getattr(self.__local, "state", None)
+        if state is None:
+            with self.__slots_lock:
+                if not self.__free_slots:
+                    raise IdGeneratorExhausted()
+                slot = self.__free_slots.pop()
+                last_ms, sequence = self.__slot_clocks[slot]
+            state = _ThreadSlot(self, slot, self.__generation)
+            state.last_ms, state.sequence = last_ms, sequence
+            self.__local.state = state
+        return state
+
+    def next_id(self) -> int:
+        """
+        @brief Выдаёт следующий идентификатор
+        @return Уникальное целое число, монотонно растущее в пределах потока
+        @exception NodeIdRequired Если после fork процессу не назначен номер узла
+        """
+        if self.node_id is None:
+            raise NodeIdRequired()
+        state = self.__thread_slot()
+        now_ms = self.__wall_ms + (time.monotonic_ns() - self.__mono_ns) // 1_000_000
+        if now_ms > state.last_ms:
+            state.last_ms = now_ms
+            state.sequence = 0
+        else:
+            state.sequence += 1
+            if state.sequence >> SEQUENCE_BITS:
+                state.last_ms += 1
+                state.sequence = 0
+        return ((((state.last_ms << NODE_BITS) | self.node_id) << THREAD_BITS | state.slot)
+                << SEQUENCE_BITS | state.sequence)
+
+
+def _reset_after_fork():
+    """
+    @brief Сбрасывает все живые генераторы в дочернем процессе после fork
+    @details Регистрируется в os.register_at_fork один раз на модуль; генераторы хранятся
+    в WeakSet, поэтому регистрация не продлевает им жизнь.
+    """
+    for generator in list(_GENERATORS):
+        generator._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+DEFAULT_ID_GENERATOR = IdGenerator()
+"""
+@brief Общий генератор идентификаторов процесса
+"""
+
+
+def next_id() -> int:
+    """
+    @brief Выдаёт идентификатор из общего генератора процесса
+    @return Уникальное целое число
+    """
+    return DEFAULT_ID_GENERATOR.next_id()
+
+
+def set_node_id(node_id: int):
+    """
+    @brief Назначает номер узла общему генератору процесса
+    @param node_id Номер узла, уникальный среди процессов
+    """
+    DEFAULT_ID_GENERATOR.set_node_id(node_id)
@@ -0,0 +1,240 @@
+import mmap
+import os
+import struct
+import time
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+JOURNAL_MAGIC = b"TXJRNL01"
+"""
+@brief Константа: сигнатура файла журнала транзакций
+"""
+
+STATUS_FAILED = 0
+"""
+@brief Константа: статус отклонённой транзакции (недостаточно средств)
+"""
+
+STATUS_COMMITTED = 1
+"""
+@brief Константа: статус проведённой транзакции
+"""
+
+_HEADER = struct.Struct("<8sQ")
+_RECORD = struct.Struct("<32s32sdddB7x")
+
+
+class JournalCorrupted(Exception):
+    """
+    @brief Исключение: файл журнала повреждён или имеет чужой формат
+    @details Выбрасывается при открытии файла с неверной сигнатурой или длиной.
+    """
+    def __init__(self, path: str):
+        """
+        @brief Конструктор исключения
+        @param path Путь к файлу журнала
+        """
+        super().__init__(f"Transaction journal {path} is corrupted")
+
+
+class TransactionJournal:
+    """
+    @brief Журнал транзакций только на дозапись
+    @details Хранит записи фиксированной длины (96 байт: id отправителя, id получателя,
+    сумма, комиссия, время, статус) в файле, отображённом в память. Записи копятся
+    в буфере и сбрасываются группой (group commit): одна запись заголовка и один flush
+    на group_size транзакций. Воспроизведение читает записи прямо из отображения.
+    @note При group_size > 1 запись подтверждается до сброса на диск: при аварии процесса
+    теряются записи последней несброшенной группы. Вызывающим, которым нужна надёжность
+    каждого перевода, следует открывать журнал с group_size=1 (синхронная фиксация:
+    сброс на каждую запись) или вызывать commit() перед подтверждением.
+    """
+
+    def __init__(self, path: str, group_size: int = 64, grow_records: int = 4096):
+        """
+        @brief Открывает (или создаёт) журнал
+        @param path Путь к файлу журнала
+        @param group_size Количество записей, после которого буфер сбрасывается на диск
+        (1 — синхронная фиксация каждой записи)
+        @param grow_records На сколько записей расширяется файл при заполнении
+        @exception ValueError Если group_size или grow_records меньше 1
+        @exception JournalCorrupted Если файл существует, но не является журналом
+        """
+        if group_size < 1:
+            raise ValueError("group_size must be at least 1")
+        if grow_records < 1:
+            raise ValueError("grow_records must be at least 1")
+        self.path = path
+        self.group_size = group_size
+        self.grow_records = grow_records
+        self.__lock = Lock()
+        self.__pending: List[bytes] = []
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.__file = open(path, "w+b" if is_new else "r+b")
+        if is_new:
+            self.__file.write(_HEADER.pack(JOURNAL_MAGIC, 0))
+            self.__file.truncate(_HEADER.size + _RECORD.size * grow_records)
+            self.__file.flush()
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+        magic, self.__count = _HEADER.unpack_from(self.__map, 0)
+        if magic != JOURNAL_MAGIC or self.__capacity() < self.__count:
+            self.__map.close()
+            self.__file.close()
+            raise JournalCorrupted(path)
+
+    def __capacity(self) -> int:
+        """
+        @brief Возвращает число записей, помещающихся в текущий файл
+        @return Ёмкость отображения в записях
+        """
+        return (len(self.__map) - _HEADER.size) // _RECORD.size
+
+    def __grow(self, records: int):
+        """
+        @brief Расширяет файл и переоткрывает отображение
+        @param records Минимальное количество записей, которое должно поместиться
+        """
+        capacity = self.__capacity()
+        while capacity < records:
+            capacity += self.grow_records
+        self.__map.flush()
+        self.__map.close()
+        self.__file.truncate(_HEADER.size + _RECORD.size * capacity)
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+
+    @staticmethod
+    def __encode_id(account_id: str) -> bytes:
+        """
+        @brief Кодирует id счёта в поле фиксированной длины
+        @param account_id Идентификатор счёта
+        @return Байтовая строка не длиннее 32 байт
+        @exception ValueError Если id длиннее 32 байт в UTF-8
+        """
+        encoded = account_id.encode("utf-8")
+        if len(encoded) > 32:
+            raise ValueError(f"account id {account_id} is longer than 32 bytes")
+        return encoded
+
+    def encode(self, sender_id: str, receiver_id: str, amount: float, fee: float,
+               status: int = STATUS_COMMITTED, timestamp: float = None) -> bytes:
+        """
+        @brief Кодирует и проверяет запись о транзакции, не добавляя её в журнал
+        @details Позволяет проверить запись до изменения балансов и добавить её
+        методом append_encoded() после.
+        @param sender_id Идентификатор счёта-отправителя
+        @param receiver_id Идентификатор счёта-получателя
+        @param amount Сумма перевода
+        @param fee Комиссия, списанная с отправителя
+        @param status STATUS_COMMITTED или STATUS_FAILED
+        @param timestamp Время в секундах эпохи (по умолчанию текущее)
+        @return Запись фиксированной длины
+        @exception ValueError Если id счёта длиннее 32 байт в UTF-8
+        """
+        return _RECORD.pack(self.__encode_id(sender_id), self.__encode_id(receiver_id),
+                            amount, fee, time.time() if timestamp is None else timestamp, status)
+
+    def append_encoded(self, records: List[bytes]):
+        """
+        @brief Добавляет заранее закодированные записи (см. encode())
+        @param records Записи в порядке добавления
+        @note Записи попадают на диск при следующем групповом сбросе или вызове commit()
+        """
+        with self.__lock:
+            self.__pending.extend(records)
+            if len(self.__pending) >= self.group_size:
+                self.__commit()
+
+    def append(self, sender_id: str, receiver_id: str, amount: float, fee: float,
+               status: int = STATUS_COMMITTED, timestamp: float = None):
+        """
+        @brief Добавляет запись о транзакции
+        @param sender_id Идентификатор счёта-отправителя
+        @param receiver_id Идентификатор счёта-получателя
+        @param amount Сумма перевода
+        @param fee Комиссия, списанная с отправителя
+        @param status STATUS_COMMITTED или STATUS_FAILED
+        @param timestamp Время в секундах эпохи (по умолчанию текущее)
+        @exception ValueError Если id счёта длиннее 32 байт в UTF-8
+        @note Запись попадает на диск при следующем групповом сбросе или вызове commit()
+        """
+        self.append_encoded([self.encode(sender_id, receiver_id, amount, fee, status, timestamp)])
+
+    def __commit(self):
+        """
+        @brief Сбрасывает буфер в отображение и на диск (вызывается под блокировкой)
+        """
+        if not self.__pending:
+            return
+        total = self.__count + len(self.__pending)
+        if total > self.__capacity():
+            self.__grow(total)
+        offset = _HEADER.size + _RECORD.size * self.__count
+        chunk = b"".join(self.__pending)
+        self.__map[offset:offset + len(chunk)] = chunk
+        self.__map.flush()
+        _HEADER.pack_into(self.__map, 0, JOURNAL_MAGIC, total)
+        self.__map.flush()
+        self.__count = total
+        self.__pending = []
+
+    def commit(self):
+        """
+        @brief Принудительно сбрасывает накопленные записи на диск
+        """
+        with self.__lock:
+            self.__commit()
+
+    def __len__(self) -> int:
+        """
+        @brief Количество записей в журнале (включая ещё не сброшенные)
+        @return Число записей
+        """
+        return self.__count + len(self.__pending)
+
+    def records(self) -> Iterator[Tuple[str, str, float, float, float, int]]:
+        """
+        @brief Перечисляет сброшенные на диск записи
+        @return Итератор кортежей (sender_id, receiver_id, amount, fee, timestamp, status)
+        """
+        end = _HEADER.size + _RECORD.size * self.__count
+        for sender, receiver, amount, fee, timestamp, status in _RECORD.iter_unpack(self.__map[_HEADER.size:end]):
+            yield (sender.rstrip(b"\0").decode("utf-8"), receiver.rstrip(b"\0").decode("utf-8"),
+                   amount, fee, timestamp, status)
+
+    def replay(self) -> Dict[str, float]:
+        """
+        @brief Вычисляет итоговые изменения балансов по журналу
+        @details Учитываются только проведённые транзакции: отправитель теряет сумму
+        с комиссией, получатель получает сумму.
+        @return Словарь {id счёта: изменение баланса}
+        """
+        self.commit()
+        deltas: Dict[str, float] = {}
+        end = _HEADER.size + _RECORD.size * self.__count
+        for sender, receiver, amount, fee, _, status in _RECORD.iter_unpack(self.__map[_HEADER.size:end]):
+            if status != STATUS_COMMITTED:
+                continue
+            deltas[sender] = deltas.get(sender, 0.0) - amount - fee
+            deltas[receiver] = deltas.get(receiver, 0.0) + amount
+        return {account_id.rstrip(b"\0").decode("utf-8"): delta for account_id, delta in deltas.items()}
+
+    def restore(self, accounts: Iterable) -> None:
+        """
+        @brief Восстанавливает балансы счетов при запуске
+        @param accounts Счета BankAccount с начальными (открывающими) балансами
+        @note К балансу каждого счёта прибавляется его итоговое изменение по журналу
+        """
+        deltas = self.replay()
+        for account in accounts:
+            with account.lock:
+                account.sum += deltas.get(account.id, 0.0)
+
+    def close(self):
+        """
+        @brief Сбрасывает буфер и закрывает файл журнала
+        """
+        with self.__lock:
+            self.__commit()
+            self.__map.close()
+            self.__file.close()
@@ -1,5 +1,6 @@
 from models.people.person import Person
 from .bank_account import BankAccount, Transaction, NotEnoughMoney
+from .events import emit
 from models.travel.geography import City
 
 
@@ -32,10 +33,10 @@ class Service:
                 BankAccount(10000, f"SERVICE_{self.name}"),
                 self.price
             )
-            print(f"Service '{self.name}' booked for {client.passport.name}")
+            emit("service_booked", service=self.name, client=client.passport.name)
             return True
         except NotEnoughMoney:
-            print("Not enough money to book service")
+            emit("service_not_enough_money", service=self.name)
             return False
 
 
@@ -1,20 +1,44 @@
 import unittest
+import asyncio
+import threading
+import tempfile
 import sys
 import os
+import gc
+import time
+import weakref
+from unittest import mock
 from datetime import date, datetime, timedelta
-from models.travel.geography import Country, City
+from models.travel.geography import Country, City, Sight, GeoRegistry, GEO_REGISTRY
 from models.docs.passport import Passport,PassportIsExpired
 from models.docs.visa import Visa,VisaNotAvailable,VisaNoEnabledEntries,VisaInvalidDate
-from services.bank_account import BankAccount
+from models.docs.visa_index import VisaIndex
+from services.bank_account import BankAccount, Transaction, Ledger, DEFAULT_LEDGER, NotEnoughMoney, TRANSACTION_FEE
+from services.journal import TransactionJournal
+from services.ids import IdGenerator, NodeIdRequired, NODE_ENV
+from services.capacity import CapacityCounter
+from services.events import RingBufferSink, NullSink, AsyncFileSink, set_event_sink, format_event
 from models.people.person import Person, ContactInfo
 from models.travel.accomodation import Hotel,Hostel,Apartment,StartAndEndDateError,AccomodationNotFoundOrExpired,Accomodation
 from models.travel.transport import Flight,Bus,Train,CarRental
 from services.services import Insurance,LuggageService,VisaSupportService
 from models.travel.tour import Tour, TourAndVisaIncompatible, EndAndStartDateError
-from models.travel.tourist_agency import TouristAgency, Route
-from models.people.staff import Guide,TravelAgent,Manager
-from models.travel.booking import AccomodationBooking, FlightBooking
-from models.people.billing import Address,Order,Payment,Review, BookingPolicy, CancellationPolicy
+from models.travel.tourist_agency import TouristAgency, Route, TourNotFound, TourFiltration, WorkWithClientFailed
+from models.travel.client_processing import ClientProcessingEngine
+from models.travel import pricing as pricing_module, visa_screening
+from models.travel.pricing import CatalogPricing, TourAlreadyPriced
+from models.travel.visa_screening import VisaScreening
+from models.travel.snapshot import AgencySnapshot, SnapshotCorrupted
+from models.travel.feed_import import FeedImporter, FeedKeys, FeedRowError
+from models.travel.catalog import TourCatalog, ChangeFeed, ChangeFeedGap, CatalogItemNotFound
+from models.travel.tour_query import BudgetPredicate
+from models.travel.tour_index import TourIndex
+from models.travel.route_planner import RoutePlanner, RouteNotFound
+from models.travel.availability import AccommodationInventory
+from models.people.staff import Guide,TravelAgent,Manager,WorkSchedule,EmployeeIsUnavailable
+from models.people.scheduler import StaffScheduler, NoEligibleEmployee
+from models.travel.booking import AccomodationBooking, FlightBooking, Booking
+from models.people.billing import Address,Order,Payment,Review, BookingPolicy, CancellationPolicy, Invoice
 
 
 
@@ -25,7 +49,7 @@ class TestTour(unittest.TestCase):
     def setUp(self):
         self.country = Country("France", "FR")
         self.city = City("Paris", self.country)
-        self.visa = Visa("V123", "France", date(2025, 1, 1), date(2025, 12, 31), 2)
+        self.visa = Visa("V123", "France", date(2025, 1, 1), date(2035, 12, 31), 2)
         self.passport = Passport("P987", "Alice", "Smith", date(2030, 1, 1))
         self.passport.set_visa(self.visa)
         self.bank = BankAccount(10000.0, "ALICE123")
@@ -361,6 +385,1026 @@ class TestTour(unittest.TestCase):
         penalty = cp.calculate_penalty(booking)
         self.assertIsInstance(penalty, float)
 
+    def test_tour_index_filtration(self):
+        germany = Country("Germany", "DE")
+        berlin = City("Berlin", germany)
+        agency = TouristAgency("indexed", BankAccount(1000, "INDEXED"))
+        cheap = Tour(100.0, date(2030, 5, 1), date(2030, 5, 5), self.city)
+        middle = Tour(300.0, date(2030, 6, 1), date(2030, 6, 10), berlin)
+        expensive = Tour(900.0, date(2030, 5, 2), date(2030, 5, 4), self.city)
+        expensive.add_transport(Bus(self.city, berlin, datetime(2030, 5, 2, 8), datetime(2030, 5, 2, 10),
+                                    10.0, "B1", 1))
+        for tour in (expensive, middle, cheap):
+            agency.add_tour(tour)
+
+        filtration = agency.get_tour_filtration(self.client)
+        self.assertEqual(filtration.filter(), [cheap, middle, expensive])
+        self.assertEqual(filtration.filter(price_rise=False), [expensive, middle, cheap])
+        self.assertEqual(filtration.filter(country="France"), [cheap, expensive])
+        self.assertEqual(filtration.filter(country="France", except_transport=[Bus]), [cheap])
+        self.assertEqual(filtration.filter(min_price=200, max_price=2000), [middle, expensive])
+        self.assertEqual(filtration.filter(start_date=date(2030, 5, 1), end_date=date(2030, 5, 31)),
+                         [cheap, expensive])
+        with self.assertRaises(TourNotFound):
+            filtration.filter(country="Spain")
+
+    def test_tour_query_plan(self):
+        germany = Country("Germany", "DE")
+        berlin = City("Berlin", germany)
+        tours = [Tour(100.0 * (i + 1), date(2030, 5, 1), date(2030, 5, 5), self.city) for i in range(5)]
+        tours.append(Tour(50.0, date(2030, 5, 1), date(2030, 5, 5), berlin))
+        filtration = TourFiltration(tours)
+
+        query = filtration.query(min_price=0, max_price=10000, country="Germany")
+        plan = query.plan()
+        self.assertEqual([type(predicate).__name__ for predicate in plan],
+                         ["CountryPredicate", "BudgetPredicate"])
+        self.assertEqual(query.execute(), [tours[-1]])
+
+        query = filtration.query(min_price=150, max_price=350, country="France")
+        self.assertIsInstance(query.plan()[0], BudgetPredicate)
+        self.assertEqual(query.execute(price_rise=False), [tours[2], tours[1]])
+        self.assertEqual(list(filtration.query(country="Spain", min_price=0, max_price=1).iter_ids()), [])
+
+    def test_tour_filtration_pages(self):
+        germany = Country("Germany", "DE")
+        berlin = City("Berlin", germany)
+        tours = [Tour(float(price), date(2030, 5, 1), date(2030, 5, 5), self.city)
+                 for price in (500, 100, 300, 200, 400)]
+        tours.append(Tour(50.0, date(2030, 5, 1), date(2030, 5, 5), berlin))
+        filtration = TourFiltration(tours)
+
+        first = filtration.page(limit=2, min_price=0, max_price=1000)
+        self.assertEqual([tour.base_cost for tour in first.tours], [50.0, 100.0])
+        second = filtration.page(limit=2, cursor=first.next_cursor, min_price=0, max_price=1000)
+        self.assertEqual([tour.base_cost for tour in second.tours], [200.0, 300.0])
+
+        first = filtration.page(limit=3, country="France", price_rise=False)
+        self.assertEqual([tour.base_cost for tour in first.tours], [500.0, 400.0, 300.0])
+        last = filtration.page(limit=3, cursor=first.next_cursor, country="France", price_rise=False)
+        self.assertEqual([tour.base_cost for tour in last.tours], [200.0, 100.0])
+        self.assertFalse(last.has_next())
+        self.assertEqual(len(filtration.page(limit=2, offset=4)), 2)
+
+    def test_tour_incremental_price(self):
+        tour = Tour(
+            base_cost=1000.0,
+            start_date=date(2030, 7, 10),
+            end_date=date(2030, 7, 20),
+            destination=self.city
+        )
+        insurance = Insurance("Health", 100.0)
+        bus = Bus(self.city, self.city, datetime(2030, 7, 10, 8), datetime(2030, 7, 10, 12), 25.0, "B7", 1)
+        tour.add_service(insurance)
+        tour.add_transport(bus)
+        self.assertAlmostEqual(tour.price, 1200 * 1.05, places=2)
+
+        breakdown = tour.get_price_breakdown()
+        self.assertAlmostEqual(breakdown["transport"], 100.0)
+        self.assertAlmostEqual(breakdown["services"], 100.0)
+        self.assertAlmostEqual(breakdown["commission"], 60.0)
+
+        tour.remove_transport(bus)
+        tour.set_commission_rate(0.1)
+        self.assertAlmostEqual(tour.price, 1100 * 1.1, places=2)
+        tour.remove_service(insurance)
+        self.assertAlmostEqual(tour.price, 1100.0, places=2)
+        with self.assertRaises(ValueError):
+            tour.remove_service(insurance)
+
+    def test_agency_bulk_reprice(self):
+        agency = TouristAgency("bulk", BankAccount(1000, "BULK"))
+        plain = Tour(1000.0, date(2030, 7, 10), date(2030, 7, 20), self.city)
+        with_bus = Tour(500.0, date(2030, 7, 10), date(2030, 7, 20), self.city)
+        with_bus.add_transport(Bus(self.city, self.city, datetime(2030, 7, 10, 8), datetime(2030, 7, 10, 12),
+                                   25.0, "B7", 1))
+        agency.add_tour(plain)
+        agency.add_tour(with_bus)
+
+        prices = agency.reprice_tours(commission_rate=0.1, fuel_surcharge=0.5)
+        self.assertAlmostEqual(plain.price, 1100.0)
+        self.assertAlmostEqual(with_bus.price, (500 + 100 * 1.5) * 1.1)
+        self.assertEqual(prices, [plain.price, with_bus.price])
+        self.assertEqual(agency.get_tour_filtration().filter(), [with_bus, plain])
+
+        with_bus.add_service(Insurance("Health", 10.0))
+        self.assertAlmostEqual(with_bus.price, (510 + 100 * 1.5) * 1.1)
+
+        bus = with_bus.transports[0]
+        bus.price_for_hour = 1000.0
+        with mock.patch.object(Tour, "set_pricing", side_effect=AssertionError), \
+                mock.patch.object(TourIndex, "rebuild", side_effect=AssertionError):
+            prices = agency.reprice_tours(commission_rate=0.2)
+        self.assertAlmostEqual(with_bus.price, (510 + 100 * 1.5) * 1.2)
+        self.assertEqual(prices, [plain.price, with_bus.price])
+        with_bus.refresh_transport(bus)
+        agency.reprice_tours()
+        self.assertAlmostEqual(with_bus.price, (510 + 4000 * 1.5) * 1.2)
+        self.assertEqual(agency.get_tour_filtration().filter(), [plain, with_bus])
+        self.assertEqual(agency.get_tour_filtration().filter(min_price=1300, max_price=10000), [with_bus])
+
+        rival = TouristAgency("rival", BankAccount(0.0, "RIVAL"))
+        with self.assertRaises(TourAlreadyPriced):
+            rival.add_tour(plain)
+        agency.remove_tour(plain)
+        agency.reprice_tours(commission_rate=0.0)
+        self.assertAlmostEqual(plain.price, 1200.0)
+        rival.add_tour(plain)
+        self.assertEqual(rival.reprice_tours(fuel_surcharge=0.0), [1200.0])
+        agency.add_tour(Tour(10.0, date(2030, 7, 10), date(2030, 7, 20), self.city))
+        self.assertEqual(len(agency.reprice_tours()), 2)
+
+    def test_ledger_concurrent_transfers(self):
+        agency_account = BankAccount(0.0, "AGENCY")
+        clients = [BankAccount(10300.0, f"CLIENT{i}") for i in range(4)]
+
+        def book_many(account):
+            for _ in range(100):
+                Transaction(account, agency_account, 100.0)
+                Transaction(agency_account, account, 1.0)
+
+        workers = [threading.Thread(target=book_many, args=(account,)) for account in clients]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertAlmostEqual(agency_account.get_sum(), 4 * 100 * (100.0 - 1.03))
+        for account in clients:
+            self.assertAlmostEqual(account.get_sum(), 10300.0 - 100 * 103.0 + 100 * 1.0)
+        self.assertEqual(Ledger.lock_order(clients[1], clients[0], clients[1]), [clients[0], clients[1]])
+
+        exact, payee = BankAccount(103.0, "EXACT"), BankAccount(0.0, "EXACT_PAYEE")
+        Ledger().transfer(exact, payee, 100.0)
+        self.assertEqual((exact.get_sum(), payee.get_sum()), (0.0, 100.0))
+        batch_exact, batch_payee = BankAccount(103.0, "EXACT_BATCH"), BankAccount(0.0, "EXACT_BATCH_PAYEE")
+        self.assertEqual(Ledger().settle_batch([(batch_exact, batch_payee, 100.0)]), [True])
+        self.assertEqual((batch_exact.get_sum(), batch_payee.get_sum()), (exact.get_sum(), payee.get_sum()))
+
+    def test_ledger_batch_settlement(self):
+        agency_account = BankAccount(0.0, "AGENCY")
+        carrier = BankAccount(50.0, "CARRIER")
+        rich = BankAccount(1000.0, "RICH")
+        poor = BankAccount(100.0, "POOR")
+        results = DEFAULT_LEDGER.settle_batch([
+            (rich, agency_account, 500.0),
+            (poor, agency_account, 100.0),
+            (rich, carrier, 500.0),
+            (poor, carrier, 50.0),
+        ])
+        self.assertEqual(results, [True, False, False, True])
+        self.assertAlmostEqual(agency_account.get_sum(), 500.0)
+        self.assertAlmostEqual(carrier.get_sum(), 100.0)
+        self.assertAlmostEqual(rich.get_sum(), 1000.0 - 515.0)
+        self.assertAlmostEqual(poor.get_sum(), 100.0 - 51.5)
+
+    def test_transaction_journal_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "transactions.journal")
+            journal = TransactionJournal(path, group_size=2, grow_records=1)
+            ledger = Ledger(journal)
+            client = BankAccount(1000.0, "CLIENT")
+            agency_account = BankAccount(0.0, "AGENCY")
+            Transaction(client, agency_account, 100.0, ledger)
+            Transaction(client, agency_account, 200.0, ledger)
+            with self.assertRaises(NotEnoughMoney):
+                Transaction(client, agency_account, 5000.0, ledger)
+            ledger.settle_batch([(client, agency_account, 50.0)])
+            journal.close()
+
+            reopened = TransactionJournal(path)
+            self.assertEqual(len(reopened), 4)
+            self.assertEqual([record[5] for record in reopened.records()], [1, 1, 0, 1])
+            restored_client = BankAccount(1000.0, "CLIENT")
+            restored_agency = BankAccount(0.0, "AGENCY")
+            reopened.restore([restored_client, restored_agency])
+            reopened.close()
+            self.assertAlmostEqual(restored_client.get_sum(), client.get_sum())
+            self.assertAlmostEqual(restored_agency.get_sum(), agency_account.get_sum())
+
+    def test_booking_and_transaction_ids_unique(self):
+        bookings = [AccomodationBooking(self.client, Accomodation(
+            start_date=date.today() + timedelta(days=2),
+            end_date=date.today() + timedelta(days=4),
+            location=self.city,
+            price_per_night=10.0
+        )) for _ in range(50)]
+        self.assertEqual(len({booking.booking_id for booking in bookings}), 50)
+        receiver = BankAccount(0.0, "RECV")
+        numbers = {Transaction(self.bank, receiver, 1.0).get_transaction_number() for _ in range(50)}
+        self.assertEqual(len(numbers), 50)
+
+        generator = IdGenerator(node_id=3)
+        collected = []
+        workers = [threading.Thread(target=lambda: collected.extend(generator.next_id() for _ in range(2000)))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(set(collected)), 8000)
+
+    def test_event_sinks(self):
+        ring = RingBufferSink(capacity=2)
+        previous = set_event_sink(ring)
+        try:
+            tour = Tour(100.0, date(2030, 7, 10), date(2030, 7, 20), self.city)
+            Manager("m1", "Manager", date(2020, 1, 1)).offer_tours_to_client([tour])
+            self.client.change_mood(100)
+            tour.book(self.client, BankAccount(0.0, "AGENCY_EVENTS"))
+            self.assertEqual(len(ring.events), 2)
+            self.assertEqual(ring.names()[0], "mood_great")
+
+            set_event_sink(NullSink())
+            tour.book(self.client, BankAccount(0.0, "AGENCY_EVENTS"))
+            self.assertEqual(len(ring.events), 2)
+        finally:
+            set_event_sink(previous)
+        self.assertIn("booked successfully for 105.00", format_event("tour_booked", {"destination": self.city, "price": 105.0}))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "events.jsonl")
+            sink = AsyncFileSink(path)
+            sink.emit("order_cancelled", {"order_id": "ORDER_1"})
+            sink.close()
+            with open(path, encoding="utf-8") as file:
+                self.assertIn('"order_id": "ORDER_1"', file.read())
+
+    def test_domain_objects_use_slots(self):
+        booking = FlightBooking(self.client, Flight(self.city, self.city, date(2030, 1, 1), date(2030, 1, 2), 10.0, "AF1", 1))
+        payer = BankAccount(100.0, "SLOTS_PAYER")
+        transaction = Transaction(payer, self.bank, 10.0)
+        for obj in (self.client, self.passport, self.visa, self.bank, booking, transaction, self.city):
+            self.assertFalse(hasattr(obj, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.client.nickname = "alice"
+
+    def test_geo_registry_interning(self):
+        registry = GeoRegistry()
+        france = registry.country("France", "FR")
+        self.assertIs(registry.country("France", "FR"), france)
+        paris = registry.city("Paris", france)
+        self.assertIs(registry.city("Paris", france), paris)
+        self.assertIs(registry.get(paris.geo_id), paris)
+        self.assertEqual(len(registry), 2)
+
+        other_paris = City("Paris", Country("France", "FR"))
+        self.assertEqual(other_paris, self.city)
+        self.assertEqual(hash(other_paris), hash(self.city))
+        self.assertTrue(other_paris.compare(self.city))
+        self.assertNotEqual(City("Paris", Country("USA", "US")), self.city)
+
+        tour = Tour(100.0, date(2030, 7, 10), date(2030, 7, 20), self.city)
+        tour.add_sight(Sight("Louvre", self.country, other_paris))
+        self.assertEqual(len(tour.sights), 1)
+
+    def test_route_planner_queries(self):
+        moscow = City("Moscow", Country("Russia", "RU"))
+        berlin = City("Berlin", Country("Germany", "DE"))
+        day = datetime(2030, 5, 1)
+        direct = Flight(self.city, moscow, day.replace(hour=8), day.replace(hour=20), 100.0, "SU1", 1)
+        first = Train(self.city, berlin, day.replace(hour=8), day.replace(hour=12), 20.0, "ICE1", 1)
+        tight = Bus(berlin, moscow, day.replace(hour=12, minute=10), day.replace(hour=18), 10.0, "B1", 1)
+        second = Bus(berlin, moscow, day.replace(hour=13), day.replace(hour=19), 10.0, "B2", 1)
+        planner = RoutePlanner([direct, tight, first])
+        planner.add(second)
+
+        earliest = planner.earliest_arrival(self.city, moscow, day)
+        self.assertEqual(earliest.transports, [first, second])
+        self.assertEqual(earliest.arrival, day.replace(hour=19))
+        self.assertEqual(planner.fewest_legs(self.city, moscow, day).transports, [direct])
+        cheapest = planner.cheapest(self.city, moscow, day)
+        self.assertEqual(cheapest.transports, [first, second])
+        self.assertAlmostEqual(cheapest.cost, 100.0)
+        with self.assertRaises(RouteNotFound):
+            planner.cheapest(self.city, moscow, day, arrive_by=day.replace(hour=18))
+
+        planner.min_connection = timedelta(0)
+        self.assertEqual(planner.earliest_arrival(self.city, moscow, day).transports, [first, tight])
+        with self.assertRaises(RouteNotFound):
+            planner.earliest_arrival(moscow, self.city, day)
+        planner.remove(tight)
+        self.assertEqual(planner.earliest_arrival(self.city, moscow, day).transports, [first, second])
+        planner.remove(second)
+        planner.remove(first)
+        self.assertEqual(planner.earliest_arrival(self.city, moscow, day).transports, [direct])
+        planner.add(first)
+        self.assertEqual((len(planner), planner.fewest_legs(self.city, berlin, day).transports), (2, [first]))
+
+    def test_accommodation_calendar_and_inventory(self):
+        owner = BankAccount(0.0, "HOTEL_CALENDAR")
+        hotel = Hotel(date(2030, 6, 1), date(2030, 6, 5), self.city, 100.0, owner, stars=4)
+        hostel = Hostel(date(2030, 6, 1), date(2030, 6, 5), self.city, 20.0, owner)
+        inventory = AccommodationInventory([hotel, hostel])
+
+        self.assertTrue(hotel.book(self.bank))
+        self.assertEqual(owner.sum, 400.0)
+        self.assertFalse(hotel.book(self.bank, date(2030, 6, 4), date(2030, 6, 6)))
+        self.assertTrue(hotel.book(self.bank, date(2030, 6, 5), date(2030, 6, 7)))
+        self.assertEqual(list(hotel.calendar.reservations()),
+                         [(date(2030, 6, 1), date(2030, 6, 5)), (date(2030, 6, 5), date(2030, 6, 7))])
+
+        self.assertEqual(inventory.find_free(City("Paris", self.country), date(2030, 6, 2), date(2030, 6, 3)), [hostel])
+        self.assertEqual(inventory.find_free(self.city, date(2030, 6, 7), date(2030, 6, 9), kind=Hotel), [hotel])
+        self.assertTrue(hotel.release(date(2030, 6, 5), date(2030, 6, 7)))
+        self.assertTrue(hotel.is_free(date(2030, 6, 5), date(2030, 6, 7)))
+        self.assertFalse(Hotel(date(2030, 6, 1), date(2030, 6, 5), self.city, 10**9, owner).book(self.bank))
+
+    def test_transport_and_hostel_capacity(self):
+        flight = Flight(self.city, self.city, datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 12), 10.0, "AF2", 1, seats=2)
+        first = FlightBooking(self.client, flight)
+        FlightBooking(self.client, flight)
+        self.assertEqual(flight.remaining_seats(), 0)
+        self.assertFalse(FlightBooking(self.client, flight).is_confirmed)
+        self.assertTrue(first.cancel())
+        self.assertEqual(flight.remaining_seats(), 1)
+        self.assertIsNone(Bus(self.city, self.city, datetime(2030, 1, 1), datetime(2030, 1, 2), 1.0, "B", 1).remaining_seats())
+
+        hostel = Hostel(date(2030, 6, 1), date(2030, 6, 3), self.city, 10.0, BankAccount(0.0, "HOSTEL_BEDS"),
+                        persons_for_room=2, rooms=1)
+        bookings = [AccomodationBooking(self.client, hostel) for _ in range(3)]
+        self.assertEqual([booking.confirm() for booking in bookings], [True, True, False])
+        self.assertFalse(bookings[2].is_available())
+        self.assertTrue(hostel.book(self.bank, date(2030, 6, 3), date(2030, 6, 4)))
+        self.assertTrue(bookings[0].cancel())
+        self.assertEqual(hostel.remaining_beds(), 1)
+        self.assertFalse(hostel.release(date(2030, 6, 10), date(2030, 6, 12)))
+
+        shared = Hostel(date(2030, 6, 1), date(2030, 6, 5), self.city, 10.0, None, persons_for_room=1, rooms=1)
+        self.assertTrue(shared.reserve())
+        results = []
+        racers = [threading.Thread(target=lambda: results.append(shared.release())) for _ in range(8)]
+        for racer in racers:
+            racer.start()
+        for racer in racers:
+            racer.join()
+        self.assertEqual(sorted(results), [False] * 7 + [True])
+        self.assertEqual(shared.remaining_beds(), 1)
+
+        counter = CapacityCounter(1000)
+        for places in (0, -1):
+            with self.assertRaises(ValueError):
+                counter.try_reserve(places)
+            with self.assertRaises(ValueError):
+                counter.release(places)
+        workers = [threading.Thread(target=lambda: [counter.try_reserve() for _ in range(300)]) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(counter.remaining(), 0)
+
+    def test_client_processing_engine(self):
+        previous = set_event_sink(NullSink())
+        try:
+            agency = TouristAgency("Engine", BankAccount(0.0, "ENGINE_AGENCY"))
+            agency.add_tour(Tour(100.0, date(2030, 7, 10), date(2030, 7, 20), self.city))
+            agency.add_manager(Manager("m1", "Manager", date(2020, 1, 1)))
+            agent = TravelAgent("a1", "Agent", date(2020, 1, 1))
+            agency.add_agent(agent)
+            passport = Passport("P_ENGINE", "Eve", "Engine", date(2035, 1, 1))
+            passport.set_visa(Visa("V_ENGINE", "France", date(2026, 1, 1), date(2031, 1, 1), 2))
+            clients = [Person(passport, BankAccount(1000.0, f"ENGINE_{i}")) for i in range(200)]
+            report = ClientProcessingEngine(agency, workers=8, max_pending=16).process(iter(clients))
+            self.assertEqual(len(report), 200)
+            self.assertEqual(len(report.succeeded()), 200)
+            self.assertEqual(agent.bookings_handled, 200)
+            paid = 105.0 * (1 + TRANSACTION_FEE)
+            self.assertTrue(all(abs(client.bank_account.get_sum() - (1000.0 - paid)) < 1e-9 for client in clients))
+            self.assertAlmostEqual(agency.bank_account.get_sum(), 200 * 105.0)
+
+            expired = Passport("P_EXPIRED", "Sam", "Late", date(2035, 1, 1))
+            expired.set_visa(Visa("V_EXPIRED", "France", date(2024, 1, 1), date(2025, 1, 1), 2))
+            refused = Person(expired, BankAccount(1000.0, "ENGINE_REFUSED"))
+            report = ClientProcessingEngine(agency, workers=2).process([refused])
+            self.assertIsInstance(report.failed()[0].error, WorkWithClientFailed)
+            self.assertEqual(refused.bank_account.get_sum(), 1000.0)
+            self.assertEqual(agent.bookings_handled, 200)
+            self.assertGreater(report.throughput(), 0)
+            self.assertLessEqual(report.percentile(50), report.percentile(99))
+
+            agency.travel_agents.clear()
+            failed = ClientProcessingEngine(agency, workers=2).process([self.client])
+            self.assertIsInstance(failed.failed()[0].error, WorkWithClientFailed)
+        finally:
+            set_event_sink(previous)
+
+    def test_async_booking_path(self):
+        previous = set_event_sink(NullSink())
+        try:
+            visa = Visa("V_ASYNC", "France", date.today(), date(2031, 1, 1), 5)
+            passport = Passport("P_ASYNC", "Bob", "Smith", date(2035, 1, 1))
+            passport.set_visa(visa)
+            client = Person(passport, BankAccount(10000.0, "ASYNC_CLIENT"))
+            agency_account = BankAccount(0.0, "ASYNC_AGENCY")
+            tour = Tour(100.0, date(2030, 7, 10), date(2030, 7, 20), self.city, commission_rate=0.0)
+            flight = Flight(self.city, self.city, datetime(2030, 7, 10, 8), datetime(2030, 7, 10, 10), 5.0, "AF3", 1, seats=10)
+            invoice = Invoice(Booking(client), agency_account, 50.0)
+
+            async def sessions():
+                booked = await asyncio.gather(*(tour.book_async(client, agency_account) for _ in range(20)))
+                seats = await asyncio.gather(*(flight.book_async(client) for _ in range(30)))
+                paid = await Payment(invoice, client.bank_account, agency_account).process_async()
+                await client.bank_account.make_transaction_async(agency_account, 1.0)
+                return booked, seats, paid
+
+            booked, seats, paid = asyncio.run(sessions())
+            self.assertTrue(all(booked))
+            self.assertEqual(sum(seats), 10)
+            self.assertTrue(paid)
+            self.assertAlmostEqual(agency_account.sum, 20 * 100.0 + 50.0 + 1.0)
+            self.assertAlmostEqual(flight.bank_account.sum, 10 * 10.0)
+            self.assertAlmostEqual(client.bank_account.sum, 10000.0 - (2000.0 + 100.0 + 50.0 + 1.0) * 1.03)
+        finally:
+            set_event_sink(previous)
+
+    def test_staff_scheduler(self):
+        scheduler = StaffScheduler()
+        first = TravelAgent("a1", "First", date(2020, 1, 1))
+        second = TravelAgent("a2", "Second", date(2020, 1, 1))
+        second.work_schedule = WorkSchedule(second, "9.00", "18.00", ["Sat"])
+        for agent in (first, second):
+            scheduler.add(agent)
+        self.assertIs(scheduler.acquire_agent(), first)
+        self.assertIs(scheduler.acquire_agent(), second)
+        self.assertIs(scheduler.acquire_agent(datetime(2030, 1, 5, 10)), second)
+        self.assertIs(scheduler.acquire_agent(datetime(2030, 1, 7, 10)), first)
+        self.assertEqual(scheduler.load_of(first), 2)
+        with self.assertRaises(NoEligibleEmployee):
+            scheduler.acquire_agent(datetime(2030, 1, 7, 20))
+        scheduler.release(first)
+        self.assertEqual(scheduler.load_of(first), 1)
+
+        berlin = City("Berlin", Country("Germany", "DE"))
+        local = Guide("g1", "Local", date(2020, 1, 1), ["French"], self.city)
+        other = Guide("g2", "Other", date(2020, 1, 1), ["German"], berlin)
+        agency = TouristAgency("Scheduled", BankAccount(0.0, "SCHEDULED_AGENCY"))
+        for guide in (other, local):
+            agency.add_guide(guide)
+        self.assertIs(agency.scheduler.acquire_guide(self.city, "French"), local)
+        with self.assertRaises(NoEligibleEmployee):
+            agency.scheduler.acquire_guide(self.city, "German")
+
+    def test_guide_windows_and_batch_assignment(self):
+        previous = set_event_sink(NullSink())
+        try:
+            agency = TouristAgency("Guides", BankAccount(0.0, "GUIDES_AGENCY"))
+            bilingual = Guide("g1", "Bilingual", date(2020, 1, 1), ["French", "English"], self.city)
+            french = Guide("g2", "French", date(2020, 1, 1), ["French"], self.city)
+            agency.add_guide(french)
+            agency.add_guide(bilingual)
+            english_tour = Tour(100.0, date(2030, 7, 1), date(2030, 7, 5), self.city)
+            same_days = Tour(100.0, date(2030, 7, 1), date(2030, 7, 5), self.city)
+            overlapping = Tour(100.0, date(2030, 7, 3), date(2030, 7, 8), self.city)
+            later = Tour(100.0, date(2030, 7, 10), date(2030, 7, 12), self.city)
+            assigned = agency.assign_guides([same_days, overlapping, later, english_tour], {english_tour: "English"})
+            self.assertEqual(len(assigned), 3)
+            self.assertIs(assigned[english_tour], bilingual)
+            self.assertIs(assigned[same_days], french)
+            self.assertNotIn(overlapping, assigned)
+            self.assertEqual(agency.scheduler.load_of(bilingual) + agency.scheduler.load_of(french), 3)
+
+            with self.assertRaises(EmployeeIsUnavailable):
+                french.go_to_tour(overlapping)
+            self.assertTrue(agency.release_guide(french, same_days))
+            french.go_to_tour(overlapping)
+            self.assertFalse(french.is_free_for(Tour(100.0, date(2030, 7, 8), date(2030, 7, 9), self.city)))
+        finally:
+            set_event_sink(previous)
+
+    def test_batch_visa_screening(self):
+        germany = City("Berlin", Country("Germany", "DE"))
+        clients = []
+        for number, (country, issued, expires, entries) in enumerate([
+                ("France", date(2026, 1, 1), date(2031, 1, 1), 2),
+                ("France", date(2030, 7, 5), date(2031, 1, 1), 1),
+                ("Germany", date(2026, 1, 1), date(2031, 1, 1), 1),
+                ("France", date(2026, 1, 1), date(2030, 7, 15), 1)]):
+            passport = Passport(f"PS{number}", "Client", str(number), date(2035, 1, 1))
+            passport.set_visa(Visa(f"VS{number}", country, issued, expires, entries))
+            clients.append(Person(passport, BankAccount(0.0, f"SCREEN{number}")))
+        clients[3].passport.visa.use_entry()
+        clients.append(Person(Passport("PS9", "No", "Visa", date(2035, 1, 1)), BankAccount(0.0, "SCREEN9")))
+        tours = [Tour(100.0, date(2030, 7, 1), date(2030, 7, 10), self.city),
+                 Tour(100.0, date(2030, 8, 1), date(2030, 8, 10), self.city),
+                 Tour(100.0, date(2030, 7, 1), date(2030, 7, 10), germany)]
+
+        expected = []
+        for tour_position, tour in enumerate(tours):
+            for client_position, client in enumerate(clients[:4]):
+                try:
+                    tour.check_visa(client)
+                    expected.append((client_position, tour_position))
+                except TourAndVisaIncompatible:
+                    pass
+        screening = VisaScreening(clients)
+        self.assertEqual(len(screening), 4)
+        self.assertEqual(screening.screen_positions(tours), expected)
+        self.assertEqual(expected, [(0, 0), (0, 1), (1, 1), (2, 2)])
+        self.assertIs(screening.screen(tours)[-1][0], clients[2])
+        self.assertEqual(screening.screen_positions(tours, today=date(2031, 2, 1)), [])
+
+    def test_visa_index_by_country(self):
+        index = VisaIndex()
+        passports = [Passport(f"PI{number}", "Holder", str(number), date(2035, 1, 1)) for number in range(3)]
+        short = Visa("VI0", "France", date(2026, 1, 1), date(2030, 7, 20), 1)
+        long = Visa("VI1", "France", date(2026, 1, 1), date(2031, 1, 1), 2)
+        spain = Visa("VI2", "Spain", date(2026, 1, 1), date(2031, 1, 1), 1)
+        for passport, visa in zip(passports, [short, long, spain]):
+            passport.set_visa(visa, index)
+        self.assertEqual(index.holders("France", date(2030, 7, 1)), [passports[0], passports[1]])
+        self.assertEqual(index.holders("France", date(2030, 8, 31)), [passports[1]])
+        self.assertEqual(index.count("France", date(2030, 8, 31)), 1)
+
+        short.deactivate()
+        self.assertEqual(index.count("France", date(2030, 7, 1)), 1)
+        short.activate()
+        short.use_entry()
+        self.assertIsNone(index.visa_of(passports[0]))
+        passports[0].set_visa(Visa("VI3", "Spain", date(2026, 1, 1), date(2032, 1, 1), 1), index)
+        self.assertEqual(index.holders("Spain", date(2031, 1, 1)), [passports[2], passports[0]])
+        self.assertEqual(len(index), 3)
+
+        tour = Tour(100.0, date(2030, 9, 1), date(2030, 9, 5), self.city)
+        self.assertEqual(index.holders_for(tour), [passports[1]])
+
+    def test_tour_filtration_by_visa(self):
+        spain = City("Madrid", Country("Spain", "ES"))
+        inside = Tour(100.0, date(2030, 7, 1), date(2030, 7, 10), self.city)
+        outside = Tour(90.0, date(2031, 7, 1), date(2031, 7, 10), self.city)
+        elsewhere = Tour(80.0, date(2030, 7, 1), date(2030, 7, 10), spain)
+        passport = Passport("PF1", "Eve", "Doe", date(2035, 1, 1),
+                            Visa("VF1", "France", date(2026, 1, 1), date(2031, 1, 1), 1))
+        client = Person(passport, BankAccount(0.0, "FILTER_VISA"))
+        filtration = TourFiltration([inside, outside, elsewhere], client)
+        self.assertEqual(filtration.filter(eligible_only=True), [inside])
+        passport.visa.deactivate()
+        with self.assertRaises(TourNotFound):
+            filtration.filter(eligible_only=True)
+
+    def test_agency_snapshot_round_trip(self):
+        previous = set_event_sink(NullSink())
+        try:
+            berlin = City("Berlin", Country("Germany", "DE"))
+            shared = BankAccount(500.0, "SNAP_SHARED")
+            agency = TouristAgency("Snapshot", BankAccount(1000.0, "SNAP_AGENCY"))
+            flight = Flight(berlin, self.city, datetime(2030, 7, 1, 10), datetime(2030, 7, 1, 12), 100.0, "SN1", 2, seats=3)
+            train = Train(self.city, berlin, datetime(2030, 7, 9, 8), datetime(2030, 7, 9, 16), 30.0, "TGV1", 1, seats=4)
+            hostel = Hostel(date(2030, 7, 1), date(2030, 7, 9), self.city, 20.0, shared, persons_for_room=2)
+            hostel.reserve(date(2030, 7, 2), date(2030, 7, 4))
+            hotel = Hotel(date(2030, 7, 1), date(2030, 7, 9), self.city, 80.0, shared, stars=4)
+            hotel.reserve(date(2030, 7, 1), date(2030, 7, 3))
+            tour = Tour(1000.0, date(2030, 7, 1), date(2030, 7, 9), self.city, 0.1, [hotel, hostel], [flight, train],
+                        [Insurance("full", 40.0), LuggageService(20, 15.0)])
+            tour.set_pricing(0.1, 0.2)
+            tour.add_sight(Sight("Louvre", self.country, self.city))
+            client = Person(Passport("PSN1", "Ann", "Lee", date(2035, 1, 1),
+                                     Visa("VSN1", "France", date(2026, 1, 1), date(2031, 1, 1), 2)),
+                            BankAccount(5000.0, "SNAP_CLIENT"), mood=7)
+            client.set_contact_info(ContactInfo("ann@example.com", "+100"))
+            tour.add_booking(FlightBooking(client, flight))
+            agency.add_tours([tour, Tour(300.0, date(2030, 8, 1), date(2030, 8, 3), berlin)])
+            guide = Guide("SG1", "Guide", date(2020, 1, 1), ["French"], self.city)
+            agency.add_guide(guide)
+            guide.go_to_tour(tour)
+            agency.add_agent(TravelAgent("SA1", "Agent", datetime(2021, 3, 1, 9, 30)))
+
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "agency.snap")
+                AgencySnapshot.save(path, agency, [client])
+                with AgencySnapshot(path) as snapshot:
+                    self.assertEqual(list(snapshot.column("tours.price")), [tour.price, agency.get_tour_by_index(1).price])
+                    restored, clients = snapshot.restore()
+
+            copy = restored.get_tour_by_index(0)
+            self.assertEqual(restored.name, "Snapshot")
+            self.assertEqual(len(restored.get_avaiable_tours()), 2)
+            self.assertEqual((copy.price, copy.fuel_surcharge, copy.destination), (tour.price, 0.2, self.city))
+            self.assertIs(copy.accommodations[0].bank_account, copy.accommodations[1].bank_account)
+            self.assertEqual(copy.transports[0].remaining_seats(), 2)
+            self.assertEqual(copy.transports[1].price_for_hour, train.price_for_hour)
+            self.assertEqual(copy.transports[1].remaining_seats(), 4)
+            self.assertEqual(copy.accommodations[1].occupancy(), hostel.occupancy())
+            self.assertFalse(copy.accommodations[0].is_free(date(2030, 7, 2), date(2030, 7, 4)))
+            self.assertEqual([service.price for service in copy.services], [40.0, 15.0])
+            self.assertEqual(copy.sights[0].name, "Louvre")
+            booking = copy.bookings[0]
+            self.assertIs(booking.flight, copy.transports[0])
+            self.assertIs(booking.person, clients[0])
+            self.assertTrue(booking.is_confirmed)
+            self.assertEqual(clients[0].bank_account.sum, client.bank_account.sum)
+            self.assertEqual(clients[0].get_mood(), 7)
+            self.assertEqual(clients[0].passport.visa.visa_number, "VSN1")
+            self.assertEqual(clients[0].contact_info.formatted(), "ann@example.com / +100")
+            self.assertFalse(restored.guides[0].is_free_for(copy))
+            self.assertEqual(restored.scheduler.load_of(restored.guides[0]), 1)
+            self.assertEqual(restored.travel_agents[0].hire_date, datetime(2021, 3, 1, 9, 30))
+            self.assertEqual(restored.get_tour_filtration().filter(country="Germany")[0].base_cost, 300.0)
+
+            expired = Passport.restore("PSN2", "Old", "Doc", date(2001, 1, 1))
+            self.assertEqual((expired.get_passport_num(), expired.visa), ("PSN2", None))
+            past = Hostel.restore(date(2001, 1, 1), date(2001, 1, 5), self.city, 10.0, shared, 1, 1)
+            self.assertEqual(past.price, 40.0)
+            self.assertTrue(past.reserve(date(2001, 1, 2), date(2001, 1, 3)))
+            self.assertFalse(past.reserve(date(2001, 1, 2), date(2001, 1, 4)))
+        finally:
+            set_event_sink(previous)
+
+    def test_agency_snapshot_rejects_foreign_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "broken.snap")
+            with open(path, "wb") as file:
+                file.write(b"NOTASNAPSHOT" * 4)
+            with self.assertRaises(SnapshotCorrupted):
+                AgencySnapshot(path)
+
+    def test_feed_import_streams_rows(self):
+        previous = set_event_sink(NullSink())
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                transports = os.path.join(directory, "transports.csv")
+                with open(transports, "w", encoding="utf-8") as file:
+                    file.write("number,from_city,from_country,from_code,to_city,to_country,to_code,departure,arrival,price\n"
+                               "FX1,Minsk,Belarus,BY,Paris,France,FR,2030-06-01T08:00,2030-06-01T11:00,200\n"
+                               "FX2,Minsk,Belarus,BY,Paris,France,FR,2030-06-01T12:00,2030-06-01T10:00,200\n")
+                tours = os.path.join(directory, "tours.jsonl")
+                with open(tours, "w", encoding="utf-8") as file:
+                    file.write('{"type": "hotel", "key": "H1", "city": "Paris", "country": "France", "code": "FR",'
+                               ' "check_in": "2030-06-01", "check_out": "2030-06-05", "price_per_night": 80, "stars": 4}\n'
+                               '{"type": "tour", "city": "Paris", "country": "France", "code": "FR", "start": "2030-06-01",'
+                               ' "end": "2030-06-05", "base_cost": 300, "transports": ["FX1"], "accommodations": "H1"}\n'
+                               '{"type": "tour", "city": "Paris", "country": "France", "code": "FR", "start": "2030-06-05",'
+                               ' "end": "2030-06-01", "base_cost": 300}\n'
+                               'not json\n')
+                agency = TouristAgency("Feed", BankAccount(0.0, "FEED"))
+                planner = RoutePlanner()
+                progress = []
+                keys = FeedKeys()
+                importer = FeedImporter(agency, planner, chunk_size=1, progress=progress.append, keys=keys)
+                report = importer.import_file(transports, kind="flight")
+                self.assertEqual(report.imported, {"flight": 1})
+                self.assertEqual([error.line for error in report.errors], [3])
+                report = importer.import_file(tours)
+                self.assertEqual(report.imported, {"hotel": 1, "tour": 1})
+                self.assertEqual([error.line for error in report.errors], [3, 4])
+                self.assertEqual(len(progress), 8)
+                tour = agency.get_avaiable_tours()[0]
+                self.assertIs(tour.transports[0], keys.transports["FX1"])
+                self.assertIs(tour.destination, keys.transports["FX1"].end_point)
+                self.assertEqual(len(planner), 1)
+                with self.assertRaises(FeedRowError):
+                    FeedImporter(agency, strict=True).import_file(tours)
+                scoped = FeedImporter(TouristAgency("Scoped", BankAccount(0.0, "SCOPED")))
+                scoped.import_file(transports, kind="flight")
+                report = scoped.import_file(tours)
+                self.assertEqual(report.imported, {"hotel": 1})
+                self.assertIn("unknown transport 'FX1'", str(report.errors[0]))
+        finally:
+            set_event_sink(previous)
+
+    def test_catalog_upserts_in_place_with_change_feed(self):
+        france = Country("France", "FR")
+        paris, nice = City("Paris", france), City("Nice", france)
+        agency = TouristAgency("Catalog", BankAccount(0.0, "CATALOG"))
+        planner = RoutePlanner()
+        catalog = TourCatalog(agency, planner, ChangeFeed(capacity=8))
+        received = []
+        catalog.feed.subscribe(received.append)
+
+        def daily_feed(price_for_hour):
+            flight = Flight(paris, nice, datetime(2030, 5, 1, 8), datetime(2030, 5, 1, 10), price_for_hour, "CF1", 1)
+            hotel = Hotel(date(2030, 5, 1), date(2030, 5, 4), nice, 50.0, None, 3)
+            return Tour(100.0, date(2030, 5, 1), date(2030, 5, 4), nice, 0.0, [hotel], [flight])
+
+        tour = catalog.upsert_tour("T1", daily_feed(20.0))
+        self.assertEqual([repr(event) for event in received], ["#1 added transport CF1", "#2 added tour T1"])
+        self.assertEqual(tour.price, 100.0 + 40.0 + 150.0)
+        self.assertIs(catalog.upsert_tour("T1", daily_feed(20.0)), tour)
+        self.assertEqual(catalog.feed.last_sequence(), 2)
+
+        flight = catalog.transport("CF1")
+        catalog.upsert_tour("T1", daily_feed(30.0))
+        self.assertIs(tour.transports[0], flight)
+        self.assertEqual(flight.price_for_hour, 30.0)
+        self.assertEqual(tour.price, 310.0)
+        self.assertEqual(agency.get_tour_index().count_by_price(300.0, 320.0), 1)
+        self.assertEqual([repr(event) for event in catalog.feed.since(2)],
+                         ["#3 changed transport CF1 (price_for_hour)", "#4 changed tour T1 (transports, price)"])
+
+        catalog.delete_transport("CF1")
+        self.assertEqual(tour.price, 250.0)
+        self.assertEqual(len(planner), 0)
+        catalog.delete_tour("T1")
+        self.assertEqual(agency.get_avaiable_tours(), [])
+        self.assertEqual([event.action for event in received[-3:]], ["changed", "removed", "removed"])
+        with self.assertRaises(CatalogItemNotFound):
+            catalog.delete_tour("T1")
+
+    def test_catalog_sync_prunes_missing_and_reports_gaps(self):
+        france = Country("France", "FR")
+        paris, nice = City("Paris", france), City("Nice", france)
+        agency = TouristAgency("Catalog", BankAccount(0.0, "CATALOG"))
+        catalog = TourCatalog(agency, feed=ChangeFeed(capacity=2))
+        tours = {f"T{number}": Tour(100.0 + number, date(2030, 6, 1), date(2030, 6, 3), nice)
+                 for number in range(3)}
+        bus = Bus(paris, nice, datetime(2030, 6, 1, 6), datetime(2030, 6, 1, 14), 5.0, "B7", 1)
+        self.assertEqual(catalog.sync(tours, [bus]), (1, 4))
+        self.assertEqual(catalog.sync(dict(tours)), (5, 5))
+        self.assertEqual(catalog.transport_keys(), [])
+        self.assertEqual(catalog.sync(dict(tours)), (6, 5))
+        del tours["T0"]
+        catalog.sync(tours)
+        self.assertEqual(sorted(catalog.tour_keys()), ["T1", "T2"])
+        self.assertEqual(len(agency.get_tour_index()), 2)
+        with self.assertRaises(ChangeFeedGap):
+            catalog.feed.since(3)
+
+    def test_geo_ids_are_unique_across_registries(self):
+        france = GeoRegistry().country("France", "FR")
+        germany = Country("Germany", "DE")
+        self.assertNotEqual(france, germany)
+        self.assertEqual(len({france, germany}), 2)
+        index = TourIndex([Tour(100.0, date(2030, 1, 1), date(2030, 1, 5), City("Berlin", germany))])
+        self.assertEqual(index.country_id_of(0), germany.geo_id)
+        self.assertEqual(index.count_by_country(GEO_REGISTRY.country_ids("Germany")), 1)
+        self.assertEqual(index.count_by_country([france.geo_id]), 0)
+        self.assertEqual(index.country_of(0), germany)
+
+        twin = Country("Germany", "XG")
+        index.add(Tour(200.0, date(2030, 1, 1), date(2030, 1, 5), City("Bonn", twin)))
+        self.assertEqual(index.count_by_country([germany.geo_id]), 1)
+        self.assertEqual(TourFiltration([index.get_tour(0)], index=index).filter(country=twin), [index.get_tour(1)])
+        self.assertEqual(len(TourFiltration([index.get_tour(0)], index=index).filter(country="Germany")), 2)
+        ring = RingBufferSink()
+        previous = set_event_sink(ring)
+        try:
+            with self.assertRaises(AttributeError):
+                twin.capital
+        finally:
+            set_event_sink(previous)
+        self.assertEqual(ring.names(), ["attribute_missing"])
+        twin.name = "Twinland"
+        self.assertEqual(TourFiltration([index.get_tour(0)], index=index).filter(country="Twinland"),
+                         [index.get_tour(1)])
+
+    def test_async_transfer_yields_while_account_is_busy(self):
+        sender, receiver = BankAccount(100.0, "ASYNC_BUSY_A"), BankAccount(0.0, "ASYNC_BUSY_B")
+        ledger = Ledger()
+        loop_ran = threading.Event()
+        holding = threading.Event()
+
+        attempts = []
+
+        class CountingLock:
+            def __init__(self):
+                self.lock = threading.RLock()
+
+            def acquire(self, blocking=True):
+                attempts.append(blocking)
+                return self.lock.acquire(blocking)
+
+            def release(self):
+                self.lock.release()
+
+            __enter__ = acquire
+
+            def __exit__(self, *args):
+                self.release()
+
+        sender.lock = CountingLock()
+
+        def hold_sender():
+            with sender.lock:
+                holding.set()
+                loop_ran.wait(timeout=5)
+                time.sleep(0.2)
+
+        holder = threading.Thread(target=hold_sender)
+        holder.start()
+        holding.wait(timeout=5)
+
+        async def session():
+            async def mark():
+                loop_ran.set()
+            await asyncio.gather(ledger.transfer_async(sender, receiver, 10.0, 0.0), mark())
+
+        asyncio.run(session())
+        holder.join()
+        self.assertTrue(loop_ran.is_set())
+        self.assertLess(len(attempts), 40)
+        with tempfile.TemporaryDirectory() as directory:
+            journal = TransactionJournal(os.path.join(directory, "async.journal"), group_size=1)
+            asyncio.run(Ledger(journal).transfer_async(sender, receiver, 10.0, 0.0))
+            self.assertEqual([record[:3] for record in journal.records()], [("ASYNC_BUSY_A", "ASYNC_BUSY_B", 10.0)])
+            journal.close()
+        self.assertEqual((sender.get_sum(), receiver.get_sum()), (80.0, 20.0))
+
+    def test_tour_index_updates_rows_in_place(self):
+        nice = City("Nice", Country("France", "FR"))
+        agency = TouristAgency("Rows", BankAccount(0.0, "ROWS"))
+        catalog = TourCatalog(agency)
+        for price in range(1000):
+            catalog.upsert_tour("T1", Tour(100.0 + price, date(2030, 6, 1), date(2030, 6, 3), nice))
+        index = agency.get_tour_index()
+        self.assertEqual((len(index), index.rows()), (1, 1))
+        self.assertEqual(index.price_of(0), catalog.tour("T1").price)
+        self.assertEqual(index.count_by_price(1099.0 * 1.05 - 1, 1099.0 * 1.05 + 1), 1)
+        catalog.delete_tour("T1")
+        catalog.upsert_tour("T2", Tour(50.0, date(2030, 6, 1), date(2030, 6, 3), nice))
+        self.assertEqual((len(index), index.rows()), (1, 1))
+
+    def test_visa_indexing_is_opt_in(self):
+        index = VisaIndex()
+        indexed = Passport("PO1", "In", "Dexed", date(2035, 1, 1),
+                           Visa("VO1", "France", date(2026, 1, 1), date(2031, 1, 1), 1), index)
+        plain = Passport("PO2", "Not", "Indexed", date(2035, 1, 1),
+                         Visa("VO2", "France", date(2026, 1, 1), date(2031, 1, 1), 1))
+        self.assertEqual(index.holders("France", date(2030, 1, 1), today=date(2026, 6, 1)), [indexed])
+        self.assertIsNone(plain.visa.index)
+        indexed.set_visa(Visa("VO3", "France", date(2026, 1, 1), date(2032, 1, 1), 1))
+        self.assertEqual(index.count("France", date(2031, 6, 1), today=date(2026, 6, 1)), 1)
+        indexed.set_visa(None)
+        self.assertEqual(len(index), 0)
+
+    def test_journal_is_validated_before_balances_move(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ledger.journal")
+            with self.assertRaises(ValueError):
+                TransactionJournal(path, grow_records=0)
+            journal = TransactionJournal(path, group_size=1)
+            ledger = Ledger(journal)
+            sender = BankAccount(100.0, "JOURNAL_SENDER")
+            long_named = BankAccount(0.0, "X" * 40)
+            with self.assertRaises(ValueError):
+                ledger.transfer(sender, long_named, 10.0, 0.0)
+            with self.assertRaises(ValueError):
+                ledger.settle_batch([(sender, BankAccount(0.0, "JOURNAL_OK"), 5.0), (sender, long_named, 5.0)], 0.0)
+            self.assertEqual((sender.get_sum(), long_named.get_sum(), len(journal)), (100.0, 0.0, 0))
+            ledger.transfer(sender, BankAccount(0.0, "JOURNAL_OK"), 10.0, 0.0)
+            self.assertEqual(len(list(journal.records())), 1)
+            journal.close()
+
+    def test_staff_removal_reaches_scheduler(self):
+        agency = TouristAgency("Roster", BankAccount(0.0, "ROSTER"))
+        first, second = TravelAgent("r1", "First", date(2020, 1, 1)), TravelAgent("r2", "Second", date(2020, 1, 1))
+        agency.add_agent(first)
+        agency.add_agent(second)
+        busy = agency.scheduler.acquire_agent()
+        agency.remove_agent(busy)
+        agency.scheduler.release(busy)
+        self.assertNotIn(busy, agency.scheduler)
+        self.assertIsNot(agency.scheduler.acquire_agent(), busy)
+        agency.travel_agents[:] = [busy]
+        self.assertIs(agency.scheduler.acquire_agent(), busy)
+        agency.travel_agents.pop()
+        with self.assertRaises(NoEligibleEmployee):
+            agency.scheduler.acquire_agent()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_id_generator_requires_node_after_fork(self):
+        generator = IdGenerator(node_id=3)
+        generator.next_id()
+        with self.assertRaises(ValueError):
+            generator.set_node_id(1 << 10)
+        with mock.patch.dict(os.environ):
+            os.environ.pop(NODE_ENV, None)
+            implicit = IdGenerator()
+        implicit.next_id()
+        collected = weakref.ref(IdGenerator(node_id=5))
+        gc.collect()
+        self.assertIsNone(collected())
+
+        def node_of(source):
+            return (source.next_id() >> 22) & 1023
+
+        def run_child(check, environ):
+            reader, writer = os.pipe()
+            with mock.patch.dict(os.environ, environ):
+                if NODE_ENV not in environ:
+                    os.environ.pop(NODE_ENV, None)
+                pid = os.fork()
+                if pid == 0:
+                    status = 1
+                    try:
+                        status = 0 if check() else 2
+                    finally:
+                        os.write(writer, bytes([status]))
+                        os._exit(0)
+            os.close(writer)
+            os.waitpid(pid, 0)
+            status = os.read(reader, 1)
+            os.close(reader)
+            return status
+
+        def implicit_requires_node():
+            try:
+                implicit.next_id()
+            except NodeIdRequired:
+                implicit.set_node_id(4)
+                return node_of(implicit) == 4 and node_of(generator) == 3
+            return False
+
+        self.assertEqual(run_child(implicit_requires_node, {}), b"\x00")
+        self.assertEqual(run_child(lambda: node_of(implicit) == 7 and node_of(generator) == 7,
+                                   {NODE_ENV: "7"}), b"\x00")
+        self.assertEqual(node_of(generator), 3)
+        self.assertEqual(node_of(implicit), 0)
+
+    def test_tour_index_follows_tour_mutations(self):
+        nice = City("Nice", Country("France", "FR"))
+        agency = TouristAgency("Mutations", BankAccount(0.0, "MUTATIONS"))
+        cheap = Tour(100.0, date(2030, 6, 1), date(2030, 6, 3), nice)
+        dear = Tour(500.0, date(2030, 6, 1), date(2030, 6, 3), nice)
+        agency.add_tours([cheap, dear])
+        cheap.set_commission_rate(10.0)
+        self.assertEqual(agency.get_tour_filtration().filter(min_price=0, max_price=600), [dear])
+        cheap.add_transport(Flight(nice, nice, datetime(2030, 6, 1, 8), datetime(2030, 6, 1, 10), 1.0, "MF1", 1))
+        filtration = agency.get_tour_filtration()
+        self.assertEqual(filtration.filter(except_transport=[Flight]), [dear])
+        agency.remove_tour(cheap)
+        cheap.set_commission_rate(0.0)
+        self.assertEqual(len(agency.get_tour_index()), 1)
+        temporary = weakref.ref(TourFiltration([dear]).index)
+        gc.collect()
+        self.assertIsNone(temporary())
+        dear.set_commission_rate(0.1)
+        index = agency.get_tour_index()
+        self.assertEqual(index.price_of(next(index.iter_ids())), dear.price)
+
+    def _vectorised_results(self):
+        germany = Country("Germany", "DE")
+        berlin = City("Berlin", germany)
+        tours = []
+        for number in range(6):
+            tour = Tour(100.0 + number, date(2030, 7, 1) + timedelta(days=number * 20),
+                        date(2030, 7, 5) + timedelta(days=number * 20), self.city if number % 2 else berlin,
+                        0.05 * number)
+            if number % 3:
+                tour.add_transport(Bus(self.city, berlin, datetime(2030, 7, 1, 8), datetime(2030, 7, 1, 8 + number),
+                                       10.0, f"VB{number}", 1))
+            tours.append(tour)
+        clients = []
+        for number, (country, expires) in enumerate([("France", date(2030, 9, 1)), ("France", date(2031, 1, 1)),
+                                                     ("Germany", date(2031, 1, 1)), ("Germany", date(2030, 8, 1))]):
+            passport = Passport(f"PV{number}", "Vector", str(number), date(2035, 1, 1))
+            passport.set_visa(Visa(f"VV{number}", country, date(2026, 1, 1), expires, 2))
+            clients.append(Person(passport, BankAccount(0.0, f"VECTOR{number}")))
+        pricing = CatalogPricing(tours)
+        with mock.patch.object(visa_screening, "SCREENING_BLOCK", 2):
+            pairs = VisaScreening(clients).screen_positions(tours, today=date(2027, 1, 1))
+        return ([float(price) for price in pricing.compute()], [float(price) for price in pricing.compute(0.1, 0.5)],
+                pairs, [tour.price for tour in tours])
+
+    def test_vectorised_fallback_without_numpy(self):
+        with mock.patch.object(pricing_module, "np", None), mock.patch.object(visa_screening, "np", None):
+            own, uniform, pairs, prices = self._vectorised_results()
+        self.assertEqual(len(own), 6)
+        for computed, expected in zip(own, prices):
+            self.assertAlmostEqual(computed, expected)
+        self.assertAlmostEqual(uniform[1], (101.0 + 10.0 * 1 * 1.5) * 1.1)
+        self.assertEqual(pairs, [(2, 0), (3, 0), (0, 1), (1, 1), (2, 2), (1, 3), (2, 4), (1, 5)])
+
+    @unittest.skipIf(pricing_module.np is None, "numpy is not installed")
+    def test_vectorised_numpy_matches_fallback(self):
+        own, uniform, pairs, prices = self._vectorised_results()
+        with mock.patch.object(pricing_module, "np", None), mock.patch.object(visa_screening, "np", None):
+            expected = self._vectorised_results()
+        for computed, fallback in zip(own + uniform, expected[0] + expected[1]):
+            self.assertAlmostEqual(computed, fallback)
+        self.assertEqual(pairs, expected[2])
+
+    def test_country_query_survives_catalog_changes(self):
+        agency = TouristAgency("Live", BankAccount(0.0, "LIVE"))
+        agency.add_tours([Tour(100.0 + number, date(2030, 7, 1), date(2030, 7, 5), self.city) for number in range(4)])
+        client = Person(Passport("PL1", "Live", "Client", date(2035, 1, 1),
+                                 Visa("VL1", "France", date(2026, 1, 1), date(2031, 1, 1), 2)),
+                        BankAccount(0.0, "LIVE_CLIENT"))
+        filtration = agency.get_tour_filtration(client)
+        for query in (filtration.query(country="France"), filtration.query(eligible_only=True)):
+            seen = 0
+            for tour_id in query.iter_ids():
+                agency.add_tour(Tour(50.0, date(2030, 7, 1), date(2030, 7, 5), self.city))
+                agency.get_tour_index().get_tour(tour_id).set_commission_rate(0.2)
+                seen += 1
+            self.assertGreaterEqual(seen, 4)
+
+    def test_guide_assignment_prefers_short_overlapping_tours(self):
+        previous = set_event_sink(NullSink())
+        try:
+            agency = TouristAgency("Windows", BankAccount(0.0, "WINDOWS_AGENCY"))
+            guide = Guide("g3", "Solo", date(2020, 1, 1), ["French"], self.city)
+            agency.add_guide(guide)
+            long_tour = Tour(100.0, date(2030, 7, 1), date(2030, 7, 10), self.city)
+            first = Tour(100.0, date(2030, 7, 1), date(2030, 7, 3), self.city)
+            second = Tour(100.0, date(2030, 7, 5), date(2030, 7, 7), self.city)
+            separate = Tour(100.0, date(2030, 8, 1), date(2030, 8, 3), self.city)
+            # Жадный раунд по началу туров отдал бы гиду длинный тур и покрыл бы один тур окна из двух
+            assigned = agency.assign_guides([long_tour, first, second, separate])
+            self.assertEqual(set(assigned), {first, second, separate})
+            self.assertNotIn(long_tour, assigned)
+            self.assertEqual(agency.scheduler.load_of(guide), 3)
+        finally:
+            set_event_sink(previous)
+
         
 if __name__ == '__main__':
     unittest.main()